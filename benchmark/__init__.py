@@ -0,0 +1,3 @@
+"""
+Benchmarks for presenting consoles on terminals.
+"""
@@ -0,0 +1,388 @@
+"""
+Main for benchmarks.
+"""
+
+from typing import BinaryIO, Callable, Dict, List, Tuple, Union
+from pathlib import Path
+import argparse
+import sys
+from tcod_ansi_terminal.context import Presenter, NaivePresenter, SparsePresenter, \
+    AdaptivePresenter, ColourMode, PoolKind, read_recording
+from ._presenters import Density, make_console, bench_presenter
+from ._colours import make_colours, bench_colours
+from ._bands import bench_bands
+from ._memory import bench_memory
+from ._input import InputKind, make_input, bench_parse_input, bench_events_manager, \
+    bench_unix_input
+from ._replay import replay
+from ._results import Results
+from ._sinks import NullSink
+
+_presenters: Dict[str, Callable[..., Presenter]] = {
+    'naive': NaivePresenter,
+    'sparse': SparsePresenter,
+    'adaptive': AdaptivePresenter,
+}
+
+# Terminal padding around the console, and how the console is aligned in it.
+_alignments: Dict[str, Tuple[Tuple[int, int], Tuple[float, float]]] = {
+    'fill': ((0, 0), (0.5, 0.5)),
+    'centre': ((8, 4), (0.5, 0.5)),
+    'corner': ((8, 4), (0.0, 0.0)),
+}
+
+def _run_presenters(
+    presenter_names: List[str],
+    colour_modes: List[ColourMode],
+    sizes: List[Tuple[int, int]],
+    densities: List[Density],
+    alignments: List[str],
+    min_time: float,
+    results: Results,
+) -> None:
+    # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-nested-blocks
+    # pylint: disable=too-many-locals
+    print(
+        f"{'presenter':<10} {'colours':>7} {'size':>8} {'order':>5} {'density':>7}"
+        f" {'align':>6} {'frames/s':>10} {'bytes/frame':>12}"
+    )
+    for name in presenter_names:
+        for colours in colour_modes:
+            for size in sizes:
+                for order in ('C', 'F'):
+                    for density in densities:
+                        for alignment in alignments:
+                            padding, align = _alignments[alignment]
+                            result = bench_presenter(
+                                _presenters[name](colours=colours),
+                                make_console(size, order),
+                                term_dim=(size[0] + padding[0], size[1] + padding[1]),
+                                min_time=min_time,
+                                density=density,
+                                align=align,
+                            )
+                            print(
+                                f"{name:<10} {colours:>7} {size[0]:>4}x{size[1]:<3} {order:>5}"
+                                f" {density:>7} {alignment:>6}"
+                                f" {result.frames_per_sec:>10.1f} {result.bytes_per_frame:>12.0f}"
+                            )
+                            results.add(
+                                {
+                                    'suite': 'presenters',
+                                    'presenter': name,
+                                    'colours': colours,
+                                    'size': f"{size[0]}x{size[1]}",
+                                    'order': order,
+                                    'density': density,
+                                    'align': alignment,
+                                },
+                                result._asdict(),
+                            )
+
+def _run_memory(
+    presenter_names: List[str],
+    sizes: List[Tuple[int, int]],
+    results: Results,
+) -> None:
+    print(f"{'presenter':<10} {'size':>8} {'peak KiB/frame':>15} {'retained KiB':>13}")
+    for name in presenter_names:
+        for size in sizes:
+            result = bench_memory(
+                _presenters[name](),
+                make_console(size, 'C'),
+                term_dim=size,
+            )
+            print(
+                f"{name:<10} {size[0]:>4}x{size[1]:<3}"
+                f" {result.peak_bytes_per_frame / 1024:>15.1f}"
+                f" {result.retained_bytes / 1024:>13.1f}"
+            )
+            results.add(
+                {'suite': 'memory', 'presenter': name, 'size': f"{size[0]}x{size[1]}"},
+                result._asdict(),
+            )
+
+def _run_colours(sizes: List[Tuple[int, int]], min_time: float, results: Results) -> None:
+    print(
+        f"{'palette':>7} {'size':>8} {'formatter cells/s':>18}"
+        f" {'cache cells/s':>14} {'hit rate':>9}"
+    )
+    for palette_size in (16, 64, 4096):
+        for size in sizes:
+            result = bench_colours(
+                make_colours(size[0] * size[1], palette_size),
+                min_time=min_time,
+            )
+            print(
+                f"{palette_size:>7} {size[0]:>4}x{size[1]:<3}"
+                f" {result.formatter_cells_per_sec:>18.0f} {result.cache_cells_per_sec:>14.0f}"
+                f" {result.hit_rate:>9.3f}"
+            )
+            results.add(
+                {'suite': 'colours', 'palette': palette_size, 'size': f"{size[0]}x{size[1]}"},
+                result._asdict(),
+            )
+
+def _run_bands(
+    sizes: List[Tuple[int, int]],
+    worker_counts: List[int],
+    pools: List[PoolKind],
+    min_time: float,
+    results: Results,
+) -> None:
+    print(f"{'pool':>7} {'size':>8} {'workers':>7} {'frames/s':>10} {'speedup':>8}")
+    for pool in pools:
+        for size in sizes:
+            for result in bench_bands(
+                make_console(size, 'C'),
+                term_dim=size,
+                worker_counts=worker_counts,
+                pool=pool,
+                min_time=min_time,
+            ):
+                print(
+                    f"{pool:>7} {size[0]:>4}x{size[1]:<3} {result.workers:>7}"
+                    f" {result.frames_per_sec:>10.1f} {result.speedup:>8.2f}"
+                )
+                results.add(
+                    {
+                        'suite': 'bands',
+                        'pool': pool,
+                        'size': f"{size[0]}x{size[1]}",
+                        'workers': result.workers,
+                    },
+                    {'frames_per_sec': result.frames_per_sec, 'speedup': result.speedup},
+                )
+
+def _run_input(input_paths: List[Path], min_time: float, results: Results) -> None:
+    kinds: List[InputKind] = ['keys', 'special', 'mouse', 'sgr_mouse', 'mixed']
+    inputs = [(kind, make_input(kind, 10000)) for kind in kinds] \
+        + [(path.name, path.read_bytes()) for path in input_paths]
+    print(f"{'parser':<14} {'input':>12} {'events/s':>11} {'MB/s':>7}")
+    for parser, bench in (
+        ('parse_input', bench_parse_input),
+        ('events', bench_events_manager),
+    ):
+        for name, data in inputs:
+            result = bench(data, min_time=min_time)
+            print(
+                f"{parser:<14} {name:>12} {result.events_per_sec:>11.0f}"
+                f" {result.bytes_per_sec / 1e6:>7.2f}"
+            )
+            results.add({'suite': 'input', 'parser': parser, 'input': name}, result._asdict())
+    print()
+    print(f"{'platform':<14} {'input':>12} {'events/s':>11} {'MB/s':>7} {'syscalls/event':>15}")
+    for name, data in inputs:
+        unix_result = bench_unix_input(data, min_time=min_time)
+        print(
+            f"{'unix':<14} {name:>12} {unix_result.events_per_sec:>11.0f}"
+            f" {unix_result.bytes_per_sec / 1e6:>7.2f} {unix_result.syscalls_per_event:>15.3f}"
+        )
+        results.add({'suite': 'input', 'platform': 'unix', 'input': name}, unix_result._asdict())
+
+def _run_replay(
+    recording_paths: List[Path],
+    max_speed: bool,
+    to_terminal: bool,
+    results: Results,
+) -> None:
+    replayed = []
+    for path in recording_paths:
+        out_file: Union[BinaryIO, NullSink] = sys.stdout.buffer if to_terminal else NullSink()
+        replayed.append((path, replay(read_recording(path), out_file, max_speed=max_speed)))
+    print(
+        f"{'recording':<20} {'chunks':>7} {'bytes':>10} {'duration':>9}"
+        f" {'write time':>10} {'MB/s':>8}"
+    )
+    for path, result in replayed:
+        print(
+            f"{path.name:<20} {result.chunks:>7} {result.bytes:>10} {result.duration:>9.3f}"
+            f" {result.write_time:>10.3f} {result.bytes_per_sec / 1e6:>8.2f}"
+        )
+        results.add(
+            {
+                'suite': 'replay',
+                'recording': path.name,
+                'speed': 'max' if max_speed else 'original',
+                'sink': 'terminal' if to_terminal else 'null',
+            },
+            result._asdict(),
+        )
+
+def main() -> None:
+    # pylint: disable=too-many-statements
+    argparser = argparse.ArgumentParser(description="tcod terminal benchmarks")
+    argparser.add_argument(
+        'suite',
+        type=str,
+        nargs='?',
+        choices=('presenters', 'colours', 'bands', 'memory', 'input', 'replay'),
+        default='presenters',
+        help="Which benchmarks to run."
+    )
+    argparser.add_argument(
+        '--presenter',
+        '-p',
+        dest='presenters',
+        type=str,
+        action='append',
+        choices=set(_presenters),
+        default=None,
+        help="Presenter to benchmark (may be repeated; default is all)."
+    )
+    argparser.add_argument(
+        '--colours',
+        dest='colours',
+        type=str,
+        action='append',
+        choices=('true', '256', '16'),
+        default=None,
+        help="How presenters write colours (may be repeated; default is true colour)."
+    )
+    argparser.add_argument(
+        '--size',
+        dest='sizes',
+        type=lambda s: tuple(int(v) for v in s.split('x')),
+        action='append',
+        default=None,
+        help="Console size as COLUMNSxROWS (may be repeated)."
+    )
+    argparser.add_argument(
+        '--density',
+        dest='densities',
+        type=str,
+        action='append',
+        choices=('static', 'cursor', '10%', 'full'),
+        default=None,
+        help="How much of the console changes each frame (may be repeated; default is all)."
+    )
+    argparser.add_argument(
+        '--align',
+        dest='alignments',
+        type=str,
+        action='append',
+        choices=set(_alignments),
+        default=None,
+        help="Whether the console fills the terminal or is aligned within it"
+             " (may be repeated; default is all)."
+    )
+    argparser.add_argument(
+        '--workers',
+        dest='worker_counts',
+        type=int,
+        action='append',
+        default=None,
+        help="Number of band encoding workers (may be repeated; default is 1, 2, 4 and 8)."
+    )
+    argparser.add_argument(
+        '--pool',
+        dest='pools',
+        type=str,
+        action='append',
+        choices=('thread', 'process'),
+        default=None,
+        help="Kind of pool for band encoding (may be repeated; default is both)."
+    )
+    argparser.add_argument(
+        '--recording',
+        dest='recording_paths',
+        type=Path,
+        action='append',
+        default=None,
+        help="Output recording to replay (may be repeated; needed for replay)."
+    )
+    argparser.add_argument(
+        '--input',
+        dest='input_paths',
+        type=Path,
+        action='append',
+        default=None,
+        help="File of raw terminal input to parse as well as generated input, such as"
+             " captured with `stty raw; cat > FILE` (may be repeated)."
+    )
+    argparser.add_argument(
+        '--max-speed',
+        dest='max_speed',
+        default=False,
+        action='store_true',
+        help="Replay as fast as possible rather than at the recorded times."
+    )
+    argparser.add_argument(
+        '--terminal',
+        dest='to_terminal',
+        default=False,
+        action='store_true',
+        help="Replay into this terminal rather than discarding the output."
+    )
+    argparser.add_argument(
+        '--time',
+        dest='min_time',
+        type=float,
+        default=1.0,
+        help="Minimum time in seconds to run each benchmark."
+    )
+    argparser.add_argument(
+        '--save',
+        dest='save_path',
+        type=Path,
+        default=None,
+        help="Path to save results to as JSON."
+    )
+    argparser.add_argument(
+        '--compare',
+        dest='baseline_path',
+        type=Path,
+        default=None,
+        help="Path of saved results to compare against."
+    )
+    argparser.add_argument(
+        '--threshold',
+        dest='threshold',
+        type=float,
+        default=0.1,
+        help="Fractional change to mark when comparing (default 0.1)."
+    )
+    args = argparser.parse_args()
+
+    presenter_names = args.presenters or sorted(_presenters)
+    sizes = args.sizes or [(80, 25), (200, 60)]
+    results = Results()
+
+    if args.suite == 'colours':
+        _run_colours(sizes, args.min_time, results)
+    elif args.suite == 'memory':
+        _run_memory(presenter_names, sizes, results)
+    elif args.suite == 'input':
+        _run_input(args.input_paths or [], args.min_time, results)
+    elif args.suite == 'replay':
+        if not args.recording_paths:
+            argparser.error("replay needs at least one --recording")
+        _run_replay(args.recording_paths, args.max_speed, args.to_terminal, results)
+    elif args.suite == 'bands':
+        _run_bands(
+            args.sizes or [(200, 60), (400, 120)],
+            args.worker_counts or [1, 2, 4, 8],
+            args.pools or ['thread', 'process'],
+            args.min_time,
+            results,
+        )
+    else:
+        _run_presenters(
+            presenter_names,
+            args.colours or ['true'],
+            sizes,
+            args.densities or ['static', 'cursor', '10%', 'full'],
+            args.alignments or sorted(_alignments),
+            args.min_time,
+            results,
+        )
+
+    if args.save_path is not None:
+        results.save(args.save_path)
+    if args.baseline_path is not None:
+        print()
+        for line in results.compare(Results.load(args.baseline_path), args.threshold):
+            print(line)
+
+if __name__ == "__main__":
+    main()
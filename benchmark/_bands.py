@@ -0,0 +1,43 @@
+"""
+Benchmarking parallel band encoding.
+"""
+
+from typing import Iterator, NamedTuple, Sequence, Tuple
+from tcod.console import Console
+from tcod_ansi_terminal.context import NaivePresenter, BandEncoder, PoolKind
+from ._presenters import bench_presenter
+
+class BandsResult(NamedTuple):
+    workers: int
+    frames_per_sec: float
+    speedup: float
+
+def bench_bands(
+    console: Console,
+    *,
+    term_dim: Tuple[int, int],
+    worker_counts: Sequence[int],
+    pool: PoolKind,
+    min_time: float = 1.0,
+) -> Iterator[BandsResult]:
+    """
+    Present a console in full with each number of band encoding workers, for
+    at least `min_time` seconds each, comparing against encoding in one piece.
+    """
+    base = bench_presenter(NaivePresenter(), console, term_dim=term_dim, min_time=min_time)
+    for workers in worker_counts:
+        band_encoder = BandEncoder(workers, pool=pool)
+        try:
+            result = bench_presenter(
+                NaivePresenter(band_encoder=band_encoder),
+                console,
+                term_dim=term_dim,
+                min_time=min_time,
+            )
+        finally:
+            band_encoder.close()
+        yield BandsResult(
+            workers=workers,
+            frames_per_sec=result.frames_per_sec,
+            speedup=result.frames_per_sec / base.frames_per_sec,
+        )
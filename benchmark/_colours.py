@@ -0,0 +1,76 @@
+"""
+Benchmarking formatting of colour escape sequences.
+"""
+
+from typing import List, NamedTuple, Tuple
+import time
+import numpy
+from tcod_ansi_terminal._ansi import make_set_fg_true, make_set_bg_true
+from tcod_ansi_terminal._colours import ColourSequenceCache, pack_colour
+
+_Colour = Tuple[int, int, int, int]
+
+class ColoursResult(NamedTuple):
+    formatter_cells_per_sec: float
+    cache_cells_per_sec: float
+    hit_rate: float
+
+def make_colours(num_cells: int, palette_size: int, seed: int = 0) -> List[Tuple[_Colour, _Colour]]:
+    """
+    Make foreground and background colours for cells, drawn from a palette.
+    """
+    rng = numpy.random.default_rng(seed)
+    palette = [
+        (int(r), int(g), int(b), 255)
+        for r, g, b in rng.integers(0, 256, (palette_size, 3))
+    ]
+    indices = rng.integers(0, palette_size, (num_cells, 2))
+    return [(palette[fg], palette[bg]) for fg, bg in indices]
+
+def _time_formatter(colours: List[Tuple[_Colour, _Colour]], min_time: float) -> float:
+    num_cells = 0
+    start_time = time.perf_counter()
+    while True:
+        for fg, bg in colours:
+            make_set_fg_true(fg)
+            make_set_bg_true(bg)
+        num_cells += len(colours)
+        elapsed = time.perf_counter() - start_time
+        if elapsed >= min_time:
+            return num_cells / elapsed
+
+def _time_cache(
+    colours: List[Tuple[_Colour, _Colour]],
+    cache: ColourSequenceCache,
+    min_time: float,
+) -> float:
+    # Callers already have packed colours, to see whether they have changed.
+    packed = [(pack_colour(fg), pack_colour(bg)) for fg, bg in colours]
+    num_cells = 0
+    start_time = time.perf_counter()
+    while True:
+        for fg, bg in packed:
+            cache.fg(fg)
+            cache.bg(bg)
+        num_cells += len(colours)
+        elapsed = time.perf_counter() - start_time
+        if elapsed >= min_time:
+            return num_cells / elapsed
+
+def bench_colours(
+    colours: List[Tuple[_Colour, _Colour]],
+    *,
+    min_time: float = 1.0,
+) -> ColoursResult:
+    """
+    Compare formatting the colours for every cell with looking them up in a
+    cache, each for at least `min_time` seconds.
+    """
+    cache = ColourSequenceCache()
+    formatter_rate = _time_formatter(colours, min_time)
+    cache_rate = _time_cache(colours, cache, min_time)
+    return ColoursResult(
+        formatter_cells_per_sec=formatter_rate,
+        cache_cells_per_sec=cache_rate,
+        hit_rate=cache.hits / (cache.hits + cache.misses),
+    )
@@ -0,0 +1,174 @@
+"""
+Benchmarking parsing terminal input.
+"""
+
+from typing import Callable, Dict, Literal, NamedTuple, Optional
+import os
+import threading
+import time
+import numpy
+from tcod_ansi_terminal._ansi import escape, parse_input
+from tcod_ansi_terminal._input_buffer import InputBuffer, default_input_buffer_size
+from tcod_ansi_terminal._internal_event import EventsManager
+from ._sinks import NullSink
+
+InputKind = Literal['keys', 'special', 'mouse', 'sgr_mouse', 'mixed']
+
+_special_keys = (b"[A", b"[B", b"[C", b"[D", b"[H", b"[F", b"OP", b"[15~", b"[24~", b"[5~")
+
+class InputResult(NamedTuple):
+    events_per_sec: float
+    bytes_per_sec: float
+
+class SyscallResult(NamedTuple):
+    events_per_sec: float
+    bytes_per_sec: float
+    syscalls_per_event: float
+
+class ReplayPlatform:
+    """
+    Platform which gives the bytes of a stream of input in chunks, as reads
+    from a terminal would, and then nothing.
+    """
+
+    def __init__(self, data: bytes, chunk_size: int = default_input_buffer_size) -> None:
+        self._data = data
+        self._pos = 0
+        self._chunk_size = chunk_size
+        self.input_buffer = InputBuffer()
+
+    @property
+    def done(self) -> bool:
+        return self._pos >= len(self._data) and len(self.input_buffer) == 0
+
+    def open(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def read_input(self, timeout: Optional[float] = None, output_fd: Optional[int] = None) -> bool:
+        # pylint: disable=unused-argument
+        chunk = self._data[self._pos:self._pos + self._chunk_size]
+        self._pos += len(chunk)
+        self.input_buffer.write(chunk)
+        return len(chunk) > 0
+
+    def watch_resize(self, callback: Callable[[], None]) -> None:
+        pass
+
+    def watch_quit(self, callback: Callable[[], None]) -> None:
+        pass
+
+def _make_key(rng: numpy.random.Generator) -> bytes:
+    return bytes([int(rng.integers(ord('a'), ord('z') + 1))])
+
+def _make_special(rng: numpy.random.Generator) -> bytes:
+    return escape + _special_keys[int(rng.integers(len(_special_keys)))]
+
+def _make_mouse(rng: numpy.random.Generator) -> bytes:
+    x, y = rng.integers(0, 200, 2) + 33
+    return escape + b"[MC" + bytes([int(x), int(y)])
+
+def _make_sgr_mouse(rng: numpy.random.Generator) -> bytes:
+    x, y = rng.integers(1, 400, 2)
+    return escape + b"[<35;%i;%iM" % (x, y)
+
+_makers: Dict[str, Callable[[numpy.random.Generator], bytes]] = {
+    'keys': _make_key,
+    'special': _make_special,
+    'mouse': _make_mouse,
+    'sgr_mouse': _make_sgr_mouse,
+}
+
+def make_input(kind: InputKind, num_inputs: int, seed: int = 0) -> bytes:
+    """
+    Make a stream of terminal input: plain keys, special keys sent as escape
+    sequences, legacy or SGR mouse motion reports, or a mix of all of them.
+    """
+    rng = numpy.random.default_rng(seed)
+    makers = list(_makers.values()) if kind == 'mixed' else [_makers[kind]]
+    return b"".join(makers[int(rng.integers(len(makers)))](rng) for _ in range(num_inputs))
+
+def _count_parsed_inputs(data: bytes) -> int:
+    num_events = 0
+    pos = 0
+    while pos < len(data):
+        _, pos = parse_input(data, pos)
+        num_events += 1
+    return num_events
+
+def _count_events(data: bytes) -> int:
+    platform = ReplayPlatform(data)
+    manager = EventsManager(platform, NullSink(), lambda dim: None, threading.RLock()) # type: ignore
+    num_events = 0
+    while not platform.done:
+        for _ in manager.wait(0):
+            num_events += 1
+    return num_events
+
+def _bench(count: Callable[[bytes], int], data: bytes, min_time: float) -> InputResult:
+    num_events = 0
+    num_bytes = 0
+    start_time = time.perf_counter()
+    while True:
+        num_events += count(data)
+        num_bytes += len(data)
+        elapsed = time.perf_counter() - start_time
+        if elapsed >= min_time:
+            return InputResult(
+                events_per_sec=num_events / elapsed,
+                bytes_per_sec=num_bytes / elapsed,
+            )
+
+def bench_parse_input(data: bytes, *, min_time: float = 1.0) -> InputResult:
+    """
+    Parse a stream of input with `parse_input()` for at least `min_time`
+    seconds, counting each key or sequence as an event.
+    """
+    return _bench(_count_parsed_inputs, data, min_time)
+
+def bench_events_manager(data: bytes, *, min_time: float = 1.0) -> InputResult:
+    """
+    Turn a stream of input into TCOD events with an `EventsManager` for at
+    least `min_time` seconds.
+    """
+    return _bench(_count_events, data, min_time)
+
+def bench_unix_input(data: bytes, *, min_time: float = 1.0) -> SyscallResult:
+    """
+    Send a stream of input through a pipe and turn it into TCOD events with
+    an `EventsManager` on the Unix platform for at least `min_time` seconds,
+    counting the system calls made to read it.
+    """
+    # pylint: disable=import-outside-toplevel
+    from tcod_ansi_terminal._platform._unix import UnixPlatform
+    read_fd, write_fd = os.pipe()
+    with os.fdopen(read_fd, 'rb', buffering=0) as in_file:
+        platform = UnixPlatform(in_file)
+        manager = EventsManager(platform, NullSink(), lambda dim: None, threading.RLock()) # type: ignore
+        num_events = 0
+        num_bytes = 0
+        start_time = time.perf_counter()
+        try:
+            while True:
+                writer = threading.Thread(target=os.write, args=(write_fd, data))
+                writer.start()
+                while True:
+                    num_new_events = sum(1 for _ in manager.wait(0.01))
+                    num_events += num_new_events
+                    if num_new_events == 0 and not writer.is_alive():
+                        break
+                writer.join()
+                num_bytes += len(data)
+                elapsed = time.perf_counter() - start_time
+                if elapsed >= min_time:
+                    return SyscallResult(
+                        events_per_sec=num_events / elapsed,
+                        bytes_per_sec=num_bytes / elapsed,
+                        syscalls_per_event=(
+                            (platform.select_calls + platform.read_calls) / num_events
+                        ),
+                    )
+        finally:
+            os.close(write_fd)
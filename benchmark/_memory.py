@@ -0,0 +1,56 @@
+"""
+Measuring memory allocated by presenters.
+"""
+
+from typing import NamedTuple, Tuple
+import tracemalloc
+from tcod.console import Console
+from tcod_ansi_terminal.context import Presenter
+from ._sinks import NullSink
+
+class MemoryResult(NamedTuple):
+    peak_bytes_per_frame: float
+    retained_bytes: int
+
+def bench_memory(
+    presenter: Presenter,
+    console: Console,
+    *,
+    term_dim: Tuple[int, int],
+    num_frames: int = 20,
+) -> MemoryResult:
+    """
+    Present a console repeatedly, changing a row each frame, and measure
+    with `tracemalloc` how much memory each frame allocates at its peak and
+    how much is still held after all the frames.
+
+    A frame is presented first without measuring, so that anything the
+    presenter keeps between frames is already allocated.
+    """
+    sink = NullSink()
+    def present() -> None:
+        presenter.present(
+            console=console,
+            term_dim=term_dim,
+            out_file=sink, # type: ignore
+            clear_colour=(0, 0, 0),
+            align=(0.5, 0.5),
+        )
+    present()
+    tracemalloc.start()
+    try:
+        start_size, _ = tracemalloc.get_traced_memory()
+        total_peak = 0
+        for frame_num in range(num_frames):
+            console.ch[frame_num % console.height, :] = ord('a') + frame_num % 26
+            tracemalloc.reset_peak()
+            present()
+            _, peak = tracemalloc.get_traced_memory()
+            total_peak += peak - start_size
+        end_size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return MemoryResult(
+        peak_bytes_per_frame=total_peak / num_frames,
+        retained_bytes=end_size - start_size,
+    )
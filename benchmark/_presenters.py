@@ -0,0 +1,99 @@
+"""
+Benchmarking presenters.
+"""
+
+from typing import Callable, Literal, Tuple, NamedTuple
+import time
+import numpy
+from tcod.console import Console
+from tcod_ansi_terminal.context import Presenter
+from ._sinks import NullSink
+
+Density = Literal['static', 'cursor', '10%', 'full']
+
+# Number of different sets of cells to change, cycled through frame by frame.
+_num_change_sets = 8
+
+class PresenterResult(NamedTuple):
+    frames_per_sec: float
+    bytes_per_frame: float
+
+def make_console(
+    dim: Tuple[int, int],
+    order: Literal['C', 'F'],
+    seed: int = 0,
+) -> Console:
+    """
+    Make a console filled with random glyphs and colours.
+    """
+    rng = numpy.random.default_rng(seed)
+    console = Console(dim[0], dim[1], order=order)
+    shape = console.rgba.shape
+    console.rgba['ch'] = rng.integers(ord(' '), ord('~') + 1, shape)
+    console.rgba['fg'] = rng.integers(0, 256, shape + (4,))
+    console.rgba['bg'] = rng.integers(0, 256, shape + (4,))
+    return console
+
+def make_changes(console: Console, density: Density, seed: int = 0) -> Callable[[int], None]:
+    """
+    Make a function which changes the console for a frame number.
+
+    With `'static'` nothing changes, with `'cursor'` a single cursor glyph
+    moves along by one cell each frame, and with `'10%'` or `'full'` that
+    fraction of the glyphs change each frame.
+    """
+    ch = console.rgba['ch']
+    num = ch.size
+    if density == 'static':
+        return lambda frame_num: None
+    if density == 'cursor':
+        original = ch.copy()
+        def move_cursor(frame_num: int) -> None:
+            last = numpy.unravel_index((frame_num - 1) % num, ch.shape)
+            ch[last] = original[last]
+            ch[numpy.unravel_index(frame_num % num, ch.shape)] = ord('@')
+        return move_cursor
+    rng = numpy.random.default_rng(seed)
+    num_changed = num if density == 'full' else num // 10
+    change_sets = [
+        numpy.unravel_index(rng.choice(num, num_changed, replace=False), ch.shape)
+        for _ in range(_num_change_sets)
+    ]
+    def change(frame_num: int) -> None:
+        cells = change_sets[frame_num % _num_change_sets]
+        ch[cells] = numpy.where(ch[cells] == ord('#'), ord('.'), ord('#'))
+    return change
+
+def bench_presenter(
+    presenter: Presenter,
+    console: Console,
+    *,
+    term_dim: Tuple[int, int],
+    min_time: float = 1.0,
+    density: Density = 'static',
+    align: Tuple[float, float] = (0.5, 0.5),
+) -> PresenterResult:
+    """
+    Present a console repeatedly for at least `min_time` seconds, changing it
+    by `density` between frames. Only presenting is timed.
+    """
+    sink = NullSink()
+    change = make_changes(console, density)
+    num_frames = 0
+    elapsed = 0.0
+    while elapsed < min_time:
+        change(num_frames)
+        start_time = time.perf_counter()
+        presenter.present(
+            console=console,
+            term_dim=term_dim,
+            out_file=sink, # type: ignore
+            clear_colour=(0, 0, 0),
+            align=align,
+        )
+        elapsed += time.perf_counter() - start_time
+        num_frames += 1
+    return PresenterResult(
+        frames_per_sec=num_frames / elapsed,
+        bytes_per_frame=sink.num_bytes / num_frames,
+    )
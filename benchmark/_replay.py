@@ -0,0 +1,54 @@
+"""
+Replaying recorded terminal output.
+"""
+
+from typing import BinaryIO, Iterable, NamedTuple, Union
+import time
+from tcod_ansi_terminal.context import RecordedChunk
+from ._sinks import NullSink
+
+class ReplayResult(NamedTuple):
+    chunks: int
+    bytes: int
+    duration: float
+    write_time: float
+    """Time spent writing and flushing, which for a terminal is how long it
+    took to take the output."""
+    bytes_per_sec: float
+
+def replay(
+    chunks: Iterable[RecordedChunk],
+    out_file: Union[BinaryIO, NullSink],
+    *,
+    max_speed: bool = False
+) -> ReplayResult:
+    """
+    Write recorded chunks to `out_file`, at the times they were recorded or
+    as fast as possible if `max_speed` is true.
+    """
+    num_chunks = 0
+    num_bytes = 0
+    write_time = 0.0
+    start = time.perf_counter()
+    first_time = None
+    for chunk in chunks:
+        if first_time is None:
+            first_time = chunk.time
+        if not max_speed:
+            delay = chunk.time - first_time - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+        write_start = time.perf_counter()
+        out_file.write(chunk.data)
+        out_file.flush()
+        write_time += time.perf_counter() - write_start
+        num_chunks += 1
+        num_bytes += len(chunk.data)
+    duration = time.perf_counter() - start
+    return ReplayResult(
+        chunks=num_chunks,
+        bytes=num_bytes,
+        duration=duration,
+        write_time=write_time,
+        bytes_per_sec=num_bytes / write_time if write_time > 0 else 0.0,
+    )
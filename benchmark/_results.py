@@ -0,0 +1,79 @@
+"""
+Saving benchmark results and comparing them with earlier runs.
+"""
+
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from pathlib import Path
+import json
+import platform
+import time
+
+_Params = Tuple[Tuple[str, Any], ...]
+
+class Results:
+    """
+    Results from a run of benchmarks, each a set of parameters saying what
+    was run and the metrics measured.
+    """
+
+    def __init__(self) -> None:
+        self.entries: List[Dict[str, Dict[str, Any]]] = []
+
+    def add(self, params: Mapping[str, Any], metrics: Mapping[str, float]) -> None:
+        self.entries.append({'params': dict(params), 'metrics': dict(metrics)})
+
+    def save(self, path: Path) -> None:
+        """
+        Save the results as JSON, along with what they were run on.
+        """
+        with open(path, 'w', encoding='utf-8') as out_file:
+            json.dump(
+                {
+                    'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    'python': platform.python_version(),
+                    'machine': platform.machine(),
+                    'entries': self.entries,
+                },
+                out_file,
+                indent=1,
+            )
+
+    @staticmethod
+    def load(path: Path) -> "Results":
+        with open(path, encoding='utf-8') as in_file:
+            results = Results()
+            results.entries = json.load(in_file)['entries']
+            return results
+
+    def by_params(self) -> Dict[_Params, Dict[str, float]]:
+        """
+        Metrics for each set of parameters.
+        """
+        return {
+            tuple(sorted(entry['params'].items())): entry['metrics']
+            for entry in self.entries
+        }
+
+    def compare(self, baseline: "Results", threshold: float) -> List[str]:
+        """
+        Describe how each metric has changed from a baseline run, marking
+        changes of more than `threshold` (as a fraction).
+        """
+        old = baseline.by_params()
+        lines = []
+        for params, metrics in self.by_params().items():
+            old_metrics: Optional[Dict[str, float]] = old.get(params)
+            if old_metrics is None:
+                continue
+            described = " ".join(f"{name}={value}" for name, value in params)
+            for name, value in metrics.items():
+                old_value = old_metrics.get(name)
+                if not old_value:
+                    continue
+                change = value / old_value - 1
+                mark = " !" if abs(change) > threshold else ""
+                lines.append(
+                    f"{described} {name}: {old_value:.4g} -> {value:.4g}"
+                    f" ({change:+.1%}){mark}"
+                )
+        return lines
@@ -0,0 +1,21 @@
+"""
+Output files which discard what is written to them.
+"""
+
+from typing import Any
+
+class NullSink:
+    """
+    Binary output file which just counts what is written to it.
+    """
+
+    def __init__(self) -> None:
+        self.num_bytes = 0
+
+    def write(self, data: Any) -> int:
+        num = len(memoryview(data).cast('B'))
+        self.num_bytes += num
+        return num
+
+    def flush(self) -> None:
+        pass
@@ -7,12 +7,15 @@ import logging
 import argparse
 import tcod
 import tcod_ansi_terminal
-from tcod_ansi_terminal.context import NaivePresenter, SparsePresenter
+from tcod_ansi_terminal.context import NaivePresenter, SparsePresenter, AdaptivePresenter, \
+    RenderStats
 from . import GameUi
+from ._logging import logger
 
 _presenters = {
     'naive': NaivePresenter,
     'sparse': SparsePresenter,
+    'adaptive': AdaptivePresenter,
 }
 
 def main() -> None:
@@ -59,6 +62,36 @@ def main() -> None:
         default='naive',
         help="The type of presenter to use in terminal mode."
     )
+    argparser.add_argument(
+        '--colours',
+        dest='colours',
+        type=str,
+        choices=('true', '256', '16'),
+        default='true',
+        help="How the presenter writes colours in terminal mode."
+    )
+    argparser.add_argument(
+        '--fps',
+        dest='target_fps',
+        type=float,
+        default=None,
+        help="Frame rate to pace presenting to in terminal mode."
+    )
+    argparser.add_argument(
+        '--stats',
+        dest='render_stats',
+        default=False,
+        action='store_true',
+        help="Log render statistics on exit in terminal mode."
+    )
+    argparser.add_argument(
+        '--record',
+        dest='record_path',
+        type=Path,
+        default=None,
+        help="Path to record terminal output to in terminal mode, for replaying with the"
+             " benchmarks."
+    )
     argparser.add_argument(
         '--x',
         dest='window_x',
@@ -141,16 +174,33 @@ def main() -> None:
     )
 
     if args.use_terminal:
-        with tcod_ansi_terminal.context.new(**context_kwargs) as terminal_context:
+        render_stats = RenderStats() if args.render_stats else None
+        with tcod_ansi_terminal.context.new(
+            target_fps=args.target_fps,
+            render_stats=render_stats,
+            record_path=str(args.record_path) if args.record_path is not None else None,
+            **context_kwargs
+        ) as terminal_context:
             terminal_context.cursor_visible = args.cursor_visible
             GameUi(
                 context=terminal_context,
                 event_wait=tcod_ansi_terminal.event.wait,
                 present_kwargs={
-                    'presenter': _presenters[args.presenter]()
+                    'presenter': _presenters[args.presenter](colours=args.colours)
                 },
                 **game_ui_kwargs
             ).run()
+        if render_stats is not None:
+            for name, summary in render_stats.summaries().items():
+                logger.info(
+                    "%s min %g mean %g max %g p90 %g p99 %g",
+                    name,
+                    summary.min,
+                    summary.mean,
+                    summary.max,
+                    summary.p90,
+                    summary.p99,
+                )
 
     else:
         tileset = tcod.tileset.load_tilesheet(
@@ -2,19 +2,16 @@
 ANSI terminal control.
 """
 
-from typing import Union, Optional, Tuple, BinaryIO, NamedTuple
+from typing import Callable, Dict, Union, Optional, Sequence, Tuple, BinaryIO
 import dataclasses
+import functools
+import re
 from tcod.event import KeySym
 from ._logging import logger
-from ._platform import Platform
 
 escape = b"\x1B"
-
-class _EscapeInputResult(NamedTuple):
-    start: bytes
-    end: Optional[bytes]
-    arg0: int
-    arg1: Optional[int]
+# DEC private mode which holds off drawing until an update is finished.
+synchronized_update_mode = 2026
 
 @dataclasses.dataclass(frozen=True)
 class WindowResizeInput:
@@ -30,7 +27,13 @@ class MouseMotionInput:
 
 @dataclasses.dataclass(frozen=True)
 class MouseButtonInput:
+    """
+    Mouse button pressed, or released if `released` is true. Legacy reports
+    don't say which button was released, and give them as button 3.
+    """
     button: int
+    pos: Tuple[int, int]
+    released: bool = False
 
 @dataclasses.dataclass(frozen=True)
 class MouseWheelInput:
@@ -44,6 +47,16 @@ class WindowFocusGained:
 class WindowFocusLost:
     pass
 
+@dataclasses.dataclass(frozen=True)
+class ModeReportInput:
+    """
+    Reply to `request_mode()`, where `setting` is 0 if the mode is not
+    recognized, 1 or 2 if it is set or reset, and 3 or 4 if it is permanently
+    set or reset.
+    """
+    mode: int
+    setting: int
+
 EscapeInputEvent = Union[
     WindowResizeInput,
     SpecialKeyInput,
@@ -52,8 +65,31 @@ EscapeInputEvent = Union[
     MouseWheelInput,
     WindowFocusGained,
     WindowFocusLost,
+    ModeReportInput,
 ]
 
+ParsedInput = Union[bytes, EscapeInputEvent]
+
+# Control sequence after the escape, with its parameter, intermediate and
+# final bytes.
+_csi_re = re.compile(rb"\[([\x30-\x3f]*)([\x20-\x2f]*)([\x40-\x7e])")
+# Start of a control sequence which more input could complete.
+_partial_csi_re = re.compile(rb"\[[\x30-\x3f]*[\x20-\x2f]*\Z")
+# Longest partial sequence to wait for the rest of.
+_max_sequence_len = 32
+# Bytes after a legacy mouse report sequence.
+_mouse_report_len = 3
+# Parameters of an SGR mouse report: button code and position.
+_sgr_mouse_params_re = re.compile(rb"<(\d+);(\d+);(\d+)")
+# DEC private modes for mouse tracking: button presses and releases only,
+# motion while a button is down as well, and any motion.
+mouse_click_mode = 1000
+mouse_drag_mode = 1002
+mouse_any_motion_mode = 1003
+# DEC private mode for SGR encoded mouse reports, which unlike legacy reports
+# work beyond 223 columns or rows and say which button was released.
+mouse_sgr_mode = 1006
+
 def reset(out_file: BinaryIO) -> None:
     out_file.write(b"%sc" % (escape))
 
@@ -63,11 +99,14 @@ def hide_cursor(out_file: BinaryIO) -> None:
 def show_cursor(out_file: BinaryIO) -> None:
     out_file.write(b"%s[?25h" % (escape))
 
-def enable_mouse_tracking(out_file: BinaryIO) -> None:
-    out_file.write(b"%s[?1003h" % (escape))
+def enable_mouse_tracking(mode: int, out_file: BinaryIO) -> None:
+    # Terminals without SGR reports ignore the mode and send legacy reports.
+    out_file.write(b"%s[?%ih%s[?%ih" % (escape, mode, escape, mouse_sgr_mode))
 
 def disable_mouse_tracking(out_file: BinaryIO) -> None:
-    out_file.write(b"%s[?1003l" % (escape))
+    # Every tracking mode is reset, whichever was set.
+    for mode in (mouse_click_mode, mouse_drag_mode, mouse_any_motion_mode, mouse_sgr_mode):
+        out_file.write(b"%s[?%il" % (escape, mode))
 
 def enable_focus_reporting(out_file: BinaryIO) -> None:
     out_file.write(b"%s[?1004h" % (escape))
@@ -111,140 +150,207 @@ def request_get_terminal_dim(out_file: BinaryIO) -> None:
     set_cursor_pos((b, b), out_file)
     request_get_cursor_pos(out_file)
 
-def _read_terminated_int(
-    platform: Platform,
-    timeout: Optional[int],
-    max_len: int = 16,
-) -> Tuple[int, Optional[bytes]]:
-    num = 0
-    for _ in range(max_len):
-        ch = platform.getch(timeout)
-        if ch is None:
-            break
-        if not ch.isdigit():
-            return num, ch
-        num = num * 10 + int(ch)
-    return num, None
-
-def _read_escape_input(platform: Platform, timeout: Optional[int]) -> Optional[_EscapeInputResult]:
-    start = platform.getch(timeout)
-    if start not in (b'[', b'O'):
+def request_mode(mode: int, out_file: BinaryIO) -> None:
+    out_file.write(b"%s[?%i$p" % (escape, mode))
+
+def begin_synchronized_update(out_file: BinaryIO) -> None:
+    out_file.write(b"%s[?%ih" % (escape, synchronized_update_mode))
+
+def end_synchronized_update(out_file: BinaryIO) -> None:
+    out_file.write(b"%s[?%il" % (escape, synchronized_update_mode))
+
+def _parse_args(params: bytes) -> Optional[Tuple[int, Optional[int]]]:
+    args = params.split(b';')
+    if len(args) > 2 or not all(arg.isdigit() or arg == b'' for arg in args):
         return None
-    arg0, end = _read_terminated_int(platform, timeout)
-    if end == b';':
-        arg1, end = _read_terminated_int(platform, timeout)
-    else:
-        arg1 = None
-    return _EscapeInputResult(start=start, end=end, arg0=arg0, arg1=arg1)
-
-def _get_mouse_input(platform: Platform, timeout: Optional[int]) -> Optional[EscapeInputEvent]:
-    cb_ch = platform.getch(timeout)
-    x_ch = platform.getch(timeout)
-    y_ch = platform.getch(timeout)
-    if cb_ch is None or x_ch is None or y_ch is None:
+    return int(args[0] or 0), int(args[1] or 0) if len(args) > 1 else None
+
+def _decode_mouse(code: int, pos: Tuple[int, int], released: bool) -> EscapeInputEvent:
+    if code & 64 != 0:
+        return MouseWheelInput(button=code & 3)
+    if code & 32 != 0:
+        return MouseMotionInput(pos=pos)
+    return MouseButtonInput(button=code & 3, pos=pos, released=released)
+
+def _decode_mouse_report(report: bytes) -> EscapeInputEvent:
+    # Legacy reports offset everything by 32 and positions by 1 more.
+    code = report[0] - 32
+    return _decode_mouse(code, (report[1] - 33, report[2] - 33), code & 3 == 3)
+
+def _decode_sgr_mouse_report(params: bytes, released: bool) -> Optional[EscapeInputEvent]:
+    match = _sgr_mouse_params_re.fullmatch(params)
+    if match is None:
         return None
-    cb = cb_ch[0]
-    x = x_ch[0] - 33
-    y = y_ch[0] - 33
-    if cb & 32 != 0:
-        if cb & 64 != 0:
-            return MouseWheelInput(button=cb & 3)
-        return MouseButtonInput(button=cb & 3)
-    return MouseMotionInput(pos=(x, y))
-
-def get_escape_input(
-    platform: Platform,
-    timeout: Optional[int] = None,
-) -> Optional[EscapeInputEvent]:
-    # pylint: disable=too-many-branches,too-many-return-statements
-    result = _read_escape_input(platform, timeout)
-    if result is None:
+    code, x, y = match.groups()
+    return _decode_mouse(int(code), (int(x) - 1, int(y) - 1), released)
+
+def _decode_mode_report(params: bytes) -> Optional[EscapeInputEvent]:
+    args = _parse_args(params[1:]) if params.startswith(b'?') else None
+    if args is None or args[1] is None:
+        return None
+    return ModeReportInput(mode=args[0], setting=args[1])
+
+def _decode_cursor_report(params: bytes) -> Optional[EscapeInputEvent]:
+    # The size is found by moving the cursor as far as it goes and asking
+    # where it is. Otherwise this is F3, which with modifiers can't be told
+    # apart from a cursor report.
+    args = _parse_args(params)
+    if args is None:
         return None
-    if result.start == b'[': # CSI
-        if result.end == b'R' and result.arg1 is not None:
-            return WindowResizeInput(dim=(result.arg1, result.arg0))
-        if result.end == b'M':
-            return _get_mouse_input(platform, timeout)
-        if result.end == b'I':
-            return WindowFocusGained()
-        if result.end == b'O':
-            return WindowFocusLost()
-        if result.end == b'A':
-            return SpecialKeyInput(KeySym.UP)
-        if result.end == b'B':
-            return SpecialKeyInput(KeySym.DOWN)
-        if result.end == b'C':
-            return SpecialKeyInput(KeySym.RIGHT)
-        if result.end == b'D':
-            return SpecialKeyInput(KeySym.LEFT)
-        if result.end == b'H':
-            return SpecialKeyInput(KeySym.HOME)
-        if result.end == b'F':
-            return SpecialKeyInput(KeySym.END)
-        if result.end == b'P':
-            return SpecialKeyInput(KeySym.F1)
-        if result.end == b'Q':
-            return SpecialKeyInput(KeySym.F2)
-        if result.end == b'R':
-            return SpecialKeyInput(KeySym.F3)
-        if result.end == b'S':
-            return SpecialKeyInput(KeySym.F4)
-        if result.end == b'~' and result.arg0 is not None:
-            if result.arg0 == 1:
-                return SpecialKeyInput(KeySym.HOME)
-            if result.arg0 == 2:
-                return SpecialKeyInput(KeySym.INSERT)
-            if result.arg0 == 3:
-                return SpecialKeyInput(KeySym.DELETE)
-            if result.arg0 == 4:
-                return SpecialKeyInput(KeySym.END)
-            if result.arg0 == 5:
-                return SpecialKeyInput(KeySym.PAGEUP)
-            if result.arg0 == 6:
-                return SpecialKeyInput(KeySym.PAGEDOWN)
-            if result.arg0 == 7:
-                return SpecialKeyInput(KeySym.HOME)
-            if result.arg0 == 8:
-                return SpecialKeyInput(KeySym.END)
-            if result.arg0 == 11:
-                return SpecialKeyInput(KeySym.F1)
-            if result.arg0 == 12:
-                return SpecialKeyInput(KeySym.F2)
-            if result.arg0 == 13:
-                return SpecialKeyInput(KeySym.F3)
-            if result.arg0 == 14:
-                return SpecialKeyInput(KeySym.F4)
-            if result.arg0 == 15:
-                return SpecialKeyInput(KeySym.F5)
-            if result.arg0 == 17:
-                return SpecialKeyInput(KeySym.F6)
-            if result.arg0 == 18:
-                return SpecialKeyInput(KeySym.F7)
-            if result.arg0 == 19:
-                return SpecialKeyInput(KeySym.F8)
-            if result.arg0 == 20:
-                return SpecialKeyInput(KeySym.F9)
-            if result.arg0 == 21:
-                return SpecialKeyInput(KeySym.F10)
-            if result.arg0 == 23:
-                return SpecialKeyInput(KeySym.F11)
-            if result.arg0 == 24:
-                return SpecialKeyInput(KeySym.F12)
-    elif result.start == b'O': # SS3
-        if result.end == b'P':
-            return SpecialKeyInput(KeySym.F1)
-        if result.end == b'Q':
-            return SpecialKeyInput(KeySym.F2)
-        if result.end == b'R':
-            return SpecialKeyInput(KeySym.F3)
-        if result.end == b'S':
-            return SpecialKeyInput(KeySym.F4)
-    logger.debug("unknown escape: %r", result)
+    if args[1] is None:
+        return _f3_input
+    return WindowResizeInput(dim=(args[1], args[0]))
+
+_f3_input = SpecialKeyInput(KeySym.F3)
+
+# Escape inputs keyed by introducer, final byte (after any intermediate bytes)
+# and first parameter, or `None` to match any parameters. Events are frozen,
+# so one instance is shared by every input decoded to it.
+_escape_inputs: Dict[Tuple[bytes, bytes, Optional[bytes]], EscapeInputEvent] = {
+    (b'[', b'I', None): WindowFocusGained(),
+    (b'[', b'O', None): WindowFocusLost(),
+    **{
+        (introducer, final, None): SpecialKeyInput(key_sym)
+        for introducer, final, key_sym in (
+            (b'[', b'A', KeySym.UP),
+            (b'[', b'B', KeySym.DOWN),
+            (b'[', b'C', KeySym.RIGHT),
+            (b'[', b'D', KeySym.LEFT),
+            (b'[', b'H', KeySym.HOME),
+            (b'[', b'F', KeySym.END),
+            (b'[', b'P', KeySym.F1),
+            (b'[', b'Q', KeySym.F2),
+            (b'[', b'S', KeySym.F4),
+            (b'O', b'P', KeySym.F1),
+            (b'O', b'Q', KeySym.F2),
+            (b'O', b'R', _f3_input.key_sym),
+            (b'O', b'S', KeySym.F4),
+        )
+    },
+    **{
+        (b'[', b'~', b'%i' % num): SpecialKeyInput(key_sym)
+        for num, key_sym in (
+            (1, KeySym.HOME),
+            (2, KeySym.INSERT),
+            (3, KeySym.DELETE),
+            (4, KeySym.END),
+            (5, KeySym.PAGEUP),
+            (6, KeySym.PAGEDOWN),
+            (7, KeySym.HOME),
+            (8, KeySym.END),
+            (11, KeySym.F1),
+            (12, KeySym.F2),
+            (13, KeySym.F3),
+            (14, KeySym.F4),
+            (15, KeySym.F5),
+            (17, KeySym.F6),
+            (18, KeySym.F7),
+            (19, KeySym.F8),
+            (20, KeySym.F9),
+            (21, KeySym.F10),
+            (23, KeySym.F11),
+            (24, KeySym.F12),
+        )
+    },
+}
+
+# Decoders for escape inputs which carry values in their parameters, keyed by
+# introducer and final byte (after any intermediate bytes). These are used
+# when there is no match in `_escape_inputs`.
+_escape_decoders: Dict[Tuple[bytes, bytes], Callable[[bytes], Optional[EscapeInputEvent]]] = {
+    (b'[', b'R'): _decode_cursor_report,
+    (b'[', b'$y'): _decode_mode_report,
+    (b'[', b'M'): functools.partial(_decode_sgr_mouse_report, released=False),
+    (b'[', b'm'): functools.partial(_decode_sgr_mouse_report, released=True),
+}
+
+def _decode_escape_input(
+    introducer: bytes,
+    final: bytes,
+    params: bytes
+) -> Optional[EscapeInputEvent]:
+    # Private parameters, starting with something other than a digit, are
+    # left to the decoders.
+    if not params or params[:1].isdigit():
+        separator = params.find(b';')
+        first = params if separator < 0 else params[:separator]
+        event = _escape_inputs.get((introducer, final, first)) \
+            or _escape_inputs.get((introducer, final, None))
+        if event is not None:
+            return event
+    decoder = _escape_decoders.get((introducer, final))
+    if decoder is not None:
+        return decoder(params)
+    logger.debug("unknown escape: %r %r %r", introducer, params, final)
     return None
 
+def parse_input(data: bytes, pos: int = 0) -> Tuple[Optional[ParsedInput], int]:
+    """
+    Parse one key or escape sequence from `data` starting at `pos`, returning
+    it (a key as a single byte, an escape input event, or `None` if it isn't
+    recognized) and the position after it. If `data` ends partway through a
+    sequence nothing is parsed, and the position returned is `pos`.
+    """
+    # pylint: disable=too-many-return-statements
+    if data[pos] != escape[0]:
+        return data[pos:pos + 1], pos + 1
+    introducer = data[pos + 1:pos + 2]
+    if introducer == b'O' and pos + 2 < len(data):
+        return _decode_escape_input(introducer, data[pos + 2:pos + 3], b''), pos + 3
+    if introducer != b'[':
+        # Either the sequence isn't complete, or this is a lone escape which
+        # is dropped.
+        return None, pos if introducer in (b'', b'O') else pos + 1
+    match = _csi_re.match(data, pos + 1)
+    if match is None:
+        if len(data) - pos <= _max_sequence_len and _partial_csi_re.match(data, pos + 1):
+            return None, pos
+        return None, pos + 1
+    params, intermediates, final = match.groups()
+    end = match.end()
+    if final == b'M' and not params and not intermediates:
+        if end + _mouse_report_len > len(data):
+            return None, pos
+        return _decode_mouse_report(data[end:end + _mouse_report_len]), end + _mouse_report_len
+    return _decode_escape_input(introducer, intermediates + final, params), end
+
 def make_set_colours_true(
     fg: Tuple[int, int, int, int],
     bg: Tuple[int, int, int, int],
 ) -> bytes:
     return b"%s[38;2;%i;%i;%im%s[48;2;%i;%i;%im" \
         % (escape, fg[0], fg[1], fg[2], escape, bg[0], bg[1], bg[2])
+
+def make_set_fg_true(fg: Sequence[int]) -> bytes:
+    return b"%s[38;2;%i;%i;%im" % (escape, fg[0], fg[1], fg[2])
+
+def make_set_bg_true(bg: Sequence[int]) -> bytes:
+    return b"%s[48;2;%i;%i;%im" % (escape, bg[0], bg[1], bg[2])
+
+def make_set_fg_256(index: int) -> bytes:
+    return b"%s[38;5;%im" % (escape, index)
+
+def make_set_bg_256(index: int) -> bytes:
+    return b"%s[48;5;%im" % (escape, index)
+
+def make_set_fg_16(index: int) -> bytes:
+    if index < 8:
+        return b"%s[%im" % (escape, 30 + index)
+    return b"%s[%im" % (escape, 90 + index - 8)
+
+def make_set_bg_16(index: int) -> bytes:
+    if index < 8:
+        return b"%s[%im" % (escape, 40 + index)
+    return b"%s[%im" % (escape, 100 + index - 8)
+
+def make_set_scroll_region(top: int, bottom: int) -> bytes:
+    return b"%s[%i;%ir" % (escape, top, bottom)
+
+def make_reset_scroll_region() -> bytes:
+    return b"%s[r" % (escape)
+
+def make_scroll_up(num: int) -> bytes:
+    return b"%s[%iS" % (escape, num)
+
+def make_scroll_down(num: int) -> bytes:
+    return b"%s[%iT" % (escape, num)
@@ -0,0 +1,230 @@
+"""
+Encoding cells in horizontal bands in parallel.
+"""
+
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+try:
+    from typing import Literal # pylint: disable=ungrouped-imports
+except ImportError:
+    from typing_extensions import Literal # type: ignore
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+import functools
+import os
+from numpy.typing import NDArray
+import numpy
+from ._frame_buffer import FrameBuffer
+from ._encoding import ColourEncoder, ColourMode, encode_cells, make_colour_encoder
+
+PoolKind = Literal['thread', 'process']
+
+# Below this many cells per band, splitting costs more than it saves.
+_min_band_cells = 4096
+
+_Encoded = Tuple[NDArray[numpy.uint8], NDArray[numpy.intp]]
+
+class _SharedArrays(NamedTuple):
+    cells: NDArray[Any]
+    previous_fg: NDArray[numpy.int64]
+    previous_bg: NDArray[numpy.int64]
+    skip: NDArray[numpy.bool_]
+
+def _shared_layout(dtype: Any, shape: Tuple[int, int]) -> Tuple[Tuple[int, ...], int]:
+    """
+    Offsets of the arrays in shared memory for cells of a dtype and shape,
+    and the total size.
+    """
+    num = shape[0] * shape[1]
+    sizes = (num * numpy.dtype(dtype).itemsize, num * 8, num * 8, num)
+    offsets = []
+    offset = 0
+    for size in sizes:
+        offsets.append(offset)
+        # Keep each array aligned for its largest items.
+        offset += (size + 7) // 8 * 8
+    return tuple(offsets), offset
+
+def _shared_arrays(buf: Any, dtype: Any, shape: Tuple[int, int]) -> _SharedArrays:
+    offsets, _ = _shared_layout(dtype, shape)
+    return _SharedArrays(
+        numpy.ndarray(shape, dtype=dtype, buffer=buf, offset=offsets[0]),
+        numpy.ndarray(shape, dtype=numpy.int64, buffer=buf, offset=offsets[1]),
+        numpy.ndarray(shape, dtype=numpy.int64, buffer=buf, offset=offsets[2]),
+        numpy.ndarray(shape, dtype=numpy.bool_, buffer=buf, offset=offsets[3]),
+    )
+
+def _encode_band(
+    cells: NDArray[Any],
+    previous_fg: NDArray[numpy.int64],
+    previous_bg: NDArray[numpy.int64],
+    encoder: ColourEncoder,
+    skip: NDArray[numpy.bool_],
+    *,
+    out: Optional[FrameBuffer] = None,
+) -> _Encoded:
+    return encode_cells(
+        cells.reshape(-1),
+        previous_fg.reshape(-1),
+        previous_bg.reshape(-1),
+        encoder,
+        skip=skip.reshape(-1),
+        out=out,
+    )
+
+# Shared memory attached to by this worker process, by name.
+_worker_memory: Dict[str, SharedMemory] = {}
+
+@functools.lru_cache(maxsize=None)
+def _worker_encoder(mode: ColourMode) -> ColourEncoder:
+    return make_colour_encoder(mode)
+
+def _encode_shared_band(
+    name: str,
+    dtype: Any,
+    shape: Tuple[int, int],
+    mode: ColourMode,
+    rows: Tuple[int, int],
+) -> _Encoded:
+    """
+    Encode a band of rows in a worker process, from arrays in shared memory.
+    """
+    memory = _worker_memory.get(name)
+    if memory is None:
+        # The memory is only replaced when it grows, so let go of the old one.
+        for old in _worker_memory.values():
+            old.close()
+        _worker_memory.clear()
+        memory = _worker_memory[name] = SharedMemory(name)
+    arrays = _shared_arrays(memory.buf, dtype, shape)
+    start, end = rows
+    data, cell_ends = _encode_band(
+        arrays.cells[start:end],
+        arrays.previous_fg[start:end],
+        arrays.previous_bg[start:end],
+        _worker_encoder(mode),
+        arrays.skip[start:end],
+    )
+    del arrays
+    return data, cell_ends
+
+def _stitch(bands: Sequence[_Encoded], out: Optional[FrameBuffer] = None) -> _Encoded:
+    """
+    Join the outputs of consecutive bands, adding them to `out` if it is given.
+    """
+    offsets = numpy.cumsum([0] + [len(data) for data, _ in bands[:-1]])
+    datas = [data for data, _ in bands]
+    data = numpy.concatenate(datas) if out is None \
+        else numpy.concatenate(datas, out=out.reserve(sum(len(d) for d in datas)))
+    cell_ends = numpy.concatenate([ends + offset for (_, ends), offset in zip(bands, offsets)])
+    return data, cell_ends
+
+class BandEncoder:
+    """
+    Encodes cells for drawing whole consoles, split into horizontal bands
+    which are encoded in parallel by a pool of `workers` threads or processes.
+
+    The colours the terminal has before each cell are worked out before
+    encoding, so each band starts from the colours the band above it leaves
+    and the outputs can just be joined in order. Process workers read the
+    cells from shared memory rather than having them pickled. Bands have at
+    least `min_band_cells` cells, so small consoles use fewer workers.
+
+    Use `close()` to shut down the pool.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        *,
+        pool: PoolKind = 'thread',
+        min_band_cells: int = _min_band_cells,
+    ) -> None:
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self._pool_kind = pool
+        self._min_band_cells = min_band_cells
+        self._pool: Executor = ThreadPoolExecutor(self.workers) if pool == 'thread' \
+            else ProcessPoolExecutor(self.workers)
+        self._memory: Optional[SharedMemory] = None
+
+    def encode_rows(
+        self,
+        cells: NDArray[Any],
+        previous_fg: NDArray[numpy.int64],
+        previous_bg: NDArray[numpy.int64],
+        encoder: ColourEncoder,
+        *,
+        skip: NDArray[numpy.bool_],
+        out: Optional[FrameBuffer] = None,
+    ) -> _Encoded:
+        """
+        Encode 2D cells row by row, with the same arguments and result as
+        `encode_cells()` on the flattened arrays.
+        """
+        height, width = cells.shape
+        num_bands = max(1, min(self.workers, height, height * width // self._min_band_cells))
+        if num_bands == 1:
+            return _encode_band(cells, previous_fg, previous_bg, encoder, skip, out=out)
+        bounds = numpy.linspace(0, height, num_bands + 1).astype(int).tolist()
+        bands = list(zip(bounds[:-1], bounds[1:]))
+        futures: List["Future[_Encoded]"]
+        if self._pool_kind == 'thread':
+            futures = [
+                self._pool.submit(
+                    _encode_band,
+                    cells[start:end],
+                    previous_fg[start:end],
+                    previous_bg[start:end],
+                    encoder,
+                    skip[start:end],
+                )
+                for start, end in bands
+            ]
+        else:
+            name = self._share(cells, previous_fg, previous_bg, skip)
+            futures = [
+                self._pool.submit(
+                    _encode_shared_band,
+                    name,
+                    cells.dtype,
+                    (height, width),
+                    encoder.mode,
+                    band,
+                )
+                for band in bands
+            ]
+        return _stitch([future.result() for future in futures], out)
+
+    def close(self) -> None:
+        """
+        Shut down the pool and free shared memory.
+        """
+        self._pool.shutdown()
+        if self._memory is not None:
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
+
+    def _share(
+        self,
+        cells: NDArray[Any],
+        previous_fg: NDArray[numpy.int64],
+        previous_bg: NDArray[numpy.int64],
+        skip: NDArray[numpy.bool_],
+    ) -> str:
+        """
+        Copy arrays into shared memory, returning its name.
+        """
+        shape = (cells.shape[0], cells.shape[1])
+        _, size = _shared_layout(cells.dtype, shape)
+        if self._memory is None or self._memory.size < size:
+            if self._memory is not None:
+                self._memory.close()
+                self._memory.unlink()
+            self._memory = SharedMemory(create=True, size=size)
+        arrays = _shared_arrays(self._memory.buf, cells.dtype, shape)
+        arrays.cells[...] = cells
+        arrays.previous_fg[...] = previous_fg
+        arrays.previous_bg[...] = previous_bg
+        arrays.skip[...] = skip
+        del arrays
+        return self._memory.name
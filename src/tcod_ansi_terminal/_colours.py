@@ -0,0 +1,197 @@
+"""
+Colours and the escape sequences which set them.
+"""
+
+from typing import Callable, Optional, Sequence, Tuple
+import functools
+from numpy.typing import NDArray
+import numpy
+from ._ansi import make_set_fg_true, make_set_bg_true
+
+_sequence_cache_size = 1024
+# Bits kept from each channel to index palette lookup tables.
+_lut_bits = 5
+
+def pack_colour(colour: Sequence[int]) -> int:
+    """
+    Pack an RGB(A) colour into a single integer.
+    """
+    return (int(colour[0]) << 16) | (int(colour[1]) << 8) | int(colour[2])
+
+def unpack_colour(packed: int) -> Tuple[int, int, int]:
+    """
+    Unpack a colour packed by `pack_colour()` into RGB.
+    """
+    return (packed >> 16) & 0xFF, (packed >> 8) & 0xFF, packed & 0xFF
+
+def pack_colours(colours: NDArray[numpy.uint8]) -> NDArray[numpy.int64]:
+    """
+    Pack RGB(A) colours in the last axis as for `pack_colour()`.
+    """
+    colours = colours.astype(numpy.int64)
+    return (colours[..., 0] << 16) | (colours[..., 1] << 8) | colours[..., 2]
+
+def _make_decimal_table(num: int) -> Tuple[NDArray[numpy.uint8], NDArray[numpy.bool_]]:
+    width = len(str(num - 1))
+    values = numpy.arange(num)
+    powers = 10 ** numpy.arange(width - 1, -1, -1)
+    digits = (values[:, None] // powers % 10 + ord('0')).astype(numpy.uint8)
+    mask = (values[:, None] >= powers) | (powers == 1)
+    return digits, mask
+
+# Decimal text of each colour channel value, padded to three bytes, with a
+# mask for the bytes actually used and the number of them. Vectorized encoders
+# gather from these rather than formatting each value.
+channel_digits, channel_mask = _make_decimal_table(256)
+channel_lengths: NDArray[numpy.intp] = numpy.count_nonzero(channel_mask, axis=1)
+
+def _make_fg_true(packed: int) -> bytes:
+    return make_set_fg_true(unpack_colour(packed))
+
+def _make_bg_true(packed: int) -> bytes:
+    return make_set_bg_true(unpack_colour(packed))
+
+def _make_sequence_lookup(
+    make: Callable[[int], bytes],
+    maxsize: int,
+) -> "functools._lru_cache_wrapper[bytes]":
+    @functools.lru_cache(maxsize=maxsize)
+    def lookup(packed: int) -> bytes:
+        return make(packed)
+    return lookup
+
+class ColourSequenceCache:
+    """
+    Cache of the escape sequences which set true colour foreground and
+    background colours, keyed by packed colour (see `pack_colour()`).
+
+    Foreground and background sequences are cached separately, each evicting
+    the least recently used entry once it has `maxsize` entries. Sequences
+    are made by `make_fg` and `make_bg`, which default to true colour.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = _sequence_cache_size,
+        *,
+        make_fg: Callable[[int], bytes] = _make_fg_true,
+        make_bg: Callable[[int], bytes] = _make_bg_true,
+    ):
+        self.fg = _make_sequence_lookup(make_fg, maxsize)
+        """Sequence to set the foreground to a packed colour."""
+        self.bg = _make_sequence_lookup(make_bg, maxsize)
+        """Sequence to set the background to a packed colour."""
+
+    @property
+    def hits(self) -> int:
+        return self.fg.cache_info().hits + self.bg.cache_info().hits
+
+    @property
+    def misses(self) -> int:
+        return self.fg.cache_info().misses + self.bg.cache_info().misses
+
+    def __len__(self) -> int:
+        return self.fg.cache_info().currsize + self.bg.cache_info().currsize
+
+    def clear(self) -> None:
+        """
+        Remove all cached sequences and reset the counters.
+        """
+        self.fg.cache_clear()
+        self.bg.cache_clear()
+
+colour_sequences = ColourSequenceCache()
+
+class Pen:
+    """
+    Tracks the colours currently set on the terminal, so that they are only
+    set again when they change.
+
+    Colours are packed as by `pack_colour()`, with -1 for unknown.
+    """
+
+    def __init__(self, sequences: ColourSequenceCache = colour_sequences) -> None:
+        self.fg = -1
+        self.bg = -1
+        self._sequences = sequences
+
+    def set_fg(self, fg: Sequence[int]) -> bytes:
+        packed = pack_colour(fg)
+        if packed == self.fg:
+            return b""
+        self.fg = packed
+        return self._sequences.fg(packed)
+
+    def set_bg(self, bg: Sequence[int]) -> bytes:
+        packed = pack_colour(bg)
+        if packed == self.bg:
+            return b""
+        self.bg = packed
+        return self._sequences.bg(packed)
+
+class Palette:
+    """
+    Indexed terminal colour palette, where `colours` are the RGB values of
+    the entries starting from `first_index`.
+
+    Colours are quantized to the nearest entry through a lookup table on the
+    high bits of each channel, which is built when first needed.
+    """
+
+    def __init__(self, colours: NDArray[numpy.uint8], first_index: int = 0):
+        self.colours = colours
+        self.first_index = first_index
+        self._table: Optional[NDArray[numpy.uint8]] = None
+
+    @property
+    def table(self) -> NDArray[numpy.uint8]:
+        """
+        Lookup table from the high bits of each channel to palette indices.
+        """
+        if self._table is None:
+            self._table = self._make_table()
+        return self._table
+
+    def _make_table(self) -> NDArray[numpy.uint8]:
+        num = 1 << _lut_bits
+        step = 256 // num
+        centres = numpy.arange(num) * step + step // 2
+        # Squared distance along each channel, from each bin to each entry.
+        channel_dists = [
+            (centres[:, None] - self.colours[:, channel].astype(numpy.int32)) ** 2
+            for channel in range(3)
+        ]
+        table = numpy.empty((num, num, num), dtype=numpy.uint8)
+        for r in range(num):
+            dists = channel_dists[0][r] + channel_dists[1][:, None, :] \
+                + channel_dists[2][None, :, :]
+            table[r] = numpy.argmin(dists, axis=-1) + self.first_index
+        return table
+
+    def quantize(self, colours: NDArray[numpy.uint8]) -> NDArray[numpy.uint8]:
+        """
+        Palette indices of RGB(A) colours in the last axis.
+        """
+        # Index the flattened table, which is quicker than a 3D gather.
+        shift = 8 - _lut_bits
+        flat = (colours[..., 0].astype(numpy.uint16) >> shift) << (2 * _lut_bits)
+        flat |= (colours[..., 1].astype(numpy.uint16) >> shift) << _lut_bits
+        flat |= colours[..., 2] >> shift
+        indices: NDArray[numpy.uint8] = self.table.reshape(-1)[flat]
+        return indices
+
+def _make_xterm_256_colours() -> NDArray[numpy.uint8]:
+    levels = numpy.array([0, 95, 135, 175, 215, 255])
+    cube = numpy.stack(numpy.meshgrid(levels, levels, levels, indexing='ij'), axis=-1)
+    greys = numpy.repeat(numpy.arange(8, 248, 10)[:, None], 3, axis=1)
+    return numpy.concatenate((cube.reshape(-1, 3), greys)).astype(numpy.uint8)
+
+# The first 16 entries are left out since they are often changed by themes.
+xterm_256_palette = Palette(_make_xterm_256_colours(), first_index=16)
+
+xterm_16_palette = Palette(numpy.array([
+    (0, 0, 0), (205, 0, 0), (0, 205, 0), (205, 205, 0),
+    (0, 0, 238), (205, 0, 205), (0, 205, 205), (229, 229, 229),
+    (127, 127, 127), (255, 0, 0), (0, 255, 0), (255, 255, 0),
+    (92, 92, 255), (255, 0, 255), (0, 255, 255), (255, 255, 255),
+], dtype=numpy.uint8))
@@ -2,12 +2,42 @@
 Utilities for TCOD consoles.
 """
 
+from typing import Optional
 try:
     from typing import Literal
 except ImportError:
     from typing_extensions import Literal # type: ignore
+from numpy.typing import NDArray
+import numpy
 from tcod.console import Console
 
 def get_console_order(console: Console) -> Literal['C', 'F']:
     # pylint: disable=protected-access
     return console._order
+
+def _cell_bytes(console: Console) -> NDArray[numpy.uint8]:
+    rgba = console.rgba
+    rows = rgba.T if get_console_order(console) == 'F' else rgba
+    cells: NDArray[numpy.uint8] = rows.view(numpy.uint8)
+    return cells
+
+def copy_console(console: Console, out: Optional[Console] = None) -> Console:
+    """
+    Copy the cells of a console into `out` if it has the same size and order,
+    or into a new console otherwise.
+    """
+    # Copying raw bytes is much quicker than copying the structured array,
+    # and reusing a console avoids the cost of making one.
+    order = get_console_order(console)
+    if out is None or out.rgba.shape != console.rgba.shape or get_console_order(out) != order:
+        out = Console(console.width, console.height, order=order)
+    numpy.copyto(_cell_bytes(out), _cell_bytes(console))
+    return out
+
+def consoles_equal(console: Console, other: Console) -> bool:
+    """
+    Whether two consoles have the same size, order and cells.
+    """
+    return console.rgba.shape == other.rgba.shape \
+        and get_console_order(console) == get_console_order(other) \
+        and numpy.array_equal(_cell_bytes(console), _cell_bytes(other))
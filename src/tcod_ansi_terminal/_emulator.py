@@ -0,0 +1,374 @@
+"""
+Headless emulation of a terminal, for checking what is written to it.
+"""
+
+from typing import Any, BinaryIO, Counter, Dict, List, Optional, Tuple
+import codecs
+import collections
+import io
+import re
+import unicodedata
+import numpy
+from numpy.typing import NDArray
+from ._colours import xterm_16_palette, xterm_256_palette
+
+# Control sequences, operating system commands, and two byte escapes.
+_sequence_re = re.compile(
+    rb"\x1b(?:\[([\x30-\x3f]*)([\x20-\x2f]*)([\x40-\x7e])"
+    rb"|\]([^\x07\x1b]*)(?:\x07|\x1b\\)"
+    rb"|([\x20-\x5a\x5c\x5e-\x7e]))"
+)
+
+# Longest incomplete sequence to wait for the rest of.
+_max_pending = 256
+
+_indexed_colours = numpy.concatenate((xterm_16_palette.colours, xterm_256_palette.colours))
+
+_default_colour = (-1, -1, -1)
+
+_csi_names = {
+    b"A": 'CUU', b"B": 'CUD', b"C": 'CUF', b"D": 'CUB', b"G": 'CHA', b"d": 'VPA',
+    b"H": 'CUP', b"f": 'CUP', b"J": 'ED', b"K": 'EL', b"m": 'SGR', b"r": 'DECSTBM',
+    b"S": 'SU', b"T": 'SD', b"s": 'SCOSC', b"u": 'SCORC', b"n": 'DSR', b"t": 'XTWINOPS',
+}
+
+_escape_names = {b"7": 'DECSC', b"8": 'DECRC', b"s": 'SCOSC', b"u": 'SCORC', b"c": 'RIS'}
+
+class VirtualTerminal(io.BufferedIOBase, BinaryIO):
+    """
+    Binary output file which interprets what is written to it as a terminal
+    would, keeping the resulting grid of cells. This is meant for testing
+    presenters without a real terminal.
+
+    It understands the sequences this package writes: cursor movement, SGR
+    colours (true colour, 256 and 16 colour), erasing, scroll regions and
+    scrolling, saving and restoring the cursor, and DEC private modes
+    including synchronized updates. Other sequences are counted but
+    otherwise ignored.
+
+    `ch` holds the codepoint in each cell, indexed by `[y, x]`, with -1 for
+    cells never written and -2 for the second half of a double width glyph.
+    `fg` and `bg` hold the RGB colour of each cell, with -1 for the default
+    colour. Erasing and scrolling blank cells in the current background
+    colour, as on most terminals, unless `background_colour_erase` is false,
+    when they are blanked in the default colours as on GNU screen without
+    `defbce`. `sequence_counts` counts the sequences received by name (such as
+    `'CUP'` or `'SGR'`), and `replies` collects what a terminal would reply
+    to queries.
+    """
+
+    # pylint: disable=abstract-method,too-many-instance-attributes
+
+    def __init__(self, dim: Tuple[int, int], *, background_colour_erase: bool = True):
+        super().__init__()
+        self.dim = dim
+        self.background_colour_erase = background_colour_erase
+        self.ch: NDArray[numpy.int32] = numpy.full((dim[1], dim[0]), -1, dtype=numpy.int32)
+        self.fg: NDArray[numpy.int16] = numpy.full((dim[1], dim[0], 3), -1, dtype=numpy.int16)
+        self.bg: NDArray[numpy.int16] = numpy.full((dim[1], dim[0], 3), -1, dtype=numpy.int16)
+        self.cursor = (0, 0)
+        """Cursor position, 0-based."""
+        self.modes: Dict[int, bool] = {}
+        """DEC private modes which have been set or reset."""
+        self.title: Optional[str] = None
+        self.bytes_written = 0
+        self.glyphs_written = 0
+        self.synchronized_updates = 0
+        """Number of synchronized updates which have ended."""
+        self.sequence_counts: Counter[str] = collections.Counter()
+        self.replies = bytearray()
+        self._fg = _default_colour
+        self._bg = _default_colour
+        self._region = (0, dim[1])
+        self._saved: Optional[Tuple[Tuple[int, int], Tuple[int, int, int], Tuple[int, int, int]]] \
+            = None
+        self._wrap_pending = False
+        self._pending = b""
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    @property
+    def in_synchronized_update(self) -> bool:
+        """
+        Whether a synchronized update has begun and not yet ended.
+        """
+        return self.modes.get(2026, False)
+
+    def resize(self, dim: Tuple[int, int]) -> None:
+        """
+        Resize the terminal, keeping the cells at the top left as terminals do.
+        """
+        height = min(dim[1], self.dim[1])
+        width = min(dim[0], self.dim[0])
+        for name in ('ch', 'fg', 'bg'):
+            old = getattr(self, name)
+            new = numpy.full((dim[1], dim[0]) + old.shape[2:], -1, dtype=old.dtype)
+            new[:height, :width] = old[:height, :width]
+            setattr(self, name, new)
+        self.dim = dim
+        self._region = (0, dim[1])
+        self.cursor = (min(self.cursor[0], dim[0] - 1), min(self.cursor[1], dim[1] - 1))
+        self._wrap_pending = False
+
+    def write(self, data: Any) -> int:
+        data = bytes(data)
+        num = len(data)
+        self.bytes_written += num
+        data = self._pending + data
+        pos = 0
+        for match in _sequence_re.finditer(data):
+            self._write_text(data[pos:match.start()])
+            pos = match.end()
+            if match.group(3) is not None:
+                self._apply_csi(match.group(1), match.group(2), match.group(3))
+            elif match.group(4) is not None:
+                self._apply_osc(match.group(4))
+            else:
+                self._apply_escape(match.group(5))
+        rest = data[pos:]
+        escape_pos = rest.find(b"\x1b")
+        if 0 <= escape_pos and len(rest) - escape_pos <= _max_pending:
+            self._pending = rest[escape_pos:]
+            rest = rest[:escape_pos]
+        else:
+            self._pending = b""
+        self._write_text(rest)
+        return num
+
+    def flush(self) -> None:
+        pass
+
+    def _write_text(self, text: bytes) -> None:
+        for ch in self._decoder.decode(text.replace(b"\x1b", b"")):
+            if ch == "\r":
+                self.cursor = (0, self.cursor[1])
+                self._wrap_pending = False
+            elif ch == "\n":
+                self._line_feed()
+            elif ch == "\b":
+                self.cursor = (max(0, self.cursor[0] - 1), self.cursor[1])
+                self._wrap_pending = False
+            elif ch >= " " and unicodedata.category(ch) not in ('Mn', 'Me', 'Cf'):
+                self._write_glyph(ch)
+
+    def _write_glyph(self, ch: str) -> None:
+        width = 2 if unicodedata.east_asian_width(ch) in ('W', 'F') else 1
+        # Like real terminals, cut a double width glyph short if the terminal
+        # is too narrow for both halves.
+        width = min(width, self.dim[0])
+        x, y = self.cursor
+        if self._wrap_pending or x + width > self.dim[0]:
+            self._line_feed()
+            x, y = 0, self.cursor[1]
+        self._clear_halves(y, x, x + width)
+        self.ch[y, x] = ord(ch)
+        self.fg[y, x:x + width] = self._fg
+        self.bg[y, x:x + width] = self._bg
+        if width == 2:
+            self.ch[y, x + 1] = -2
+        self.glyphs_written += 1
+        if x + width >= self.dim[0]:
+            self.cursor = (self.dim[0] - 1, y)
+            self._wrap_pending = True
+        else:
+            self.cursor = (x + width, y)
+
+    def _clear_halves(self, y: int, start: int, end: int) -> None:
+        """
+        Blank the other halves of any double width glyphs partly covered by
+        `start` to `end` on row `y`.
+        """
+        if 0 < start < self.dim[0] and self.ch[y, start] == -2:
+            self.ch[y, start - 1] = ord(' ')
+        if end < self.dim[0] and self.ch[y, end] == -2:
+            self.ch[y, end] = ord(' ')
+
+    def _line_feed(self) -> None:
+        x, y = self.cursor
+        bottom = self._region[1]
+        if self._wrap_pending:
+            x = 0
+        self._wrap_pending = False
+        if y == bottom - 1:
+            self._scroll(1)
+        else:
+            y = min(y + 1, self.dim[1] - 1)
+        self.cursor = (x, y)
+
+    def _erase(self, y: int, start: int, end: int) -> None:
+        start = max(0, start)
+        end = min(self.dim[0], end)
+        if start >= end:
+            return
+        self._clear_halves(y, start, end)
+        self.ch[y, start:end] = ord(' ')
+        if self.background_colour_erase:
+            self.fg[y, start:end] = self._fg
+            self.bg[y, start:end] = self._bg
+        else:
+            self.fg[y, start:end] = _default_colour
+            self.bg[y, start:end] = _default_colour
+
+    def _scroll(self, num: int) -> None:
+        """
+        Scroll the scroll region up by `num` rows, or down if negative.
+        """
+        top, bottom = self._region
+        num = max(-(bottom - top), min(bottom - top, num))
+        for name in ('ch', 'fg', 'bg'):
+            rows = getattr(self, name)[top:bottom]
+            rows[...] = numpy.roll(rows, -num, axis=0)
+        exposed = range(bottom - num, bottom) if num > 0 else range(top, top - num)
+        for y in exposed:
+            self._erase(y, 0, self.dim[0])
+
+    def _move_to(self, x: int, y: int) -> None:
+        self.cursor = (max(0, min(self.dim[0] - 1, x)), max(0, min(self.dim[1] - 1, y)))
+        self._wrap_pending = False
+
+    def _apply_csi(self, params: bytes, intermediates: bytes, final: bytes) -> None:
+        # pylint: disable=too-many-branches,too-many-statements,too-many-locals
+        if params.startswith(b"?"):
+            self._apply_private(params[1:], intermediates, final)
+            return
+        name = _csi_names.get(final, 'unknown') if not intermediates else 'unknown'
+        self.sequence_counts[name] += 1
+        args = [int(p) if p else 0 for p in params.split(b";")] if params else []
+        first = args[0] if args else 0
+        x, y = self.cursor
+        if name == 'CUP':
+            row = args[0] if len(args) > 0 and args[0] > 0 else 1
+            column = args[1] if len(args) > 1 and args[1] > 0 else 1
+            self._move_to(column - 1, row - 1)
+        elif name in ('CUU', 'CUD', 'CUF', 'CUB'):
+            num = max(1, first)
+            dx, dy = {'CUU': (0, -num), 'CUD': (0, num), 'CUF': (num, 0), 'CUB': (-num, 0)}[name]
+            self._move_to(x + dx, y + dy)
+        elif name == 'CHA':
+            self._move_to(max(1, first) - 1, y)
+        elif name == 'VPA':
+            self._move_to(x, max(1, first) - 1)
+        elif name == 'EL':
+            if first == 0:
+                self._erase(y, x, self.dim[0])
+            elif first == 1:
+                self._erase(y, 0, x + 1)
+            else:
+                self._erase(y, 0, self.dim[0])
+        elif name == 'ED':
+            if first == 0:
+                self._erase(y, x, self.dim[0])
+                rows = range(y + 1, self.dim[1])
+            elif first == 1:
+                self._erase(y, 0, x + 1)
+                rows = range(0, y)
+            else:
+                rows = range(self.dim[1])
+            for row in rows:
+                self._erase(row, 0, self.dim[0])
+        elif name == 'SGR':
+            self._apply_sgr(args)
+        elif name == 'DECSTBM':
+            top = args[0] if len(args) > 0 and args[0] > 0 else 1
+            bottom = args[1] if len(args) > 1 and args[1] > 0 else self.dim[1]
+            if top < bottom <= self.dim[1]:
+                self._region = (top - 1, bottom)
+            self._move_to(0, 0)
+        elif name == 'SU':
+            self._scroll(max(1, first))
+        elif name == 'SD':
+            self._scroll(-max(1, first))
+        elif name == 'SCOSC':
+            self._save()
+        elif name == 'SCORC':
+            self._restore()
+        elif name == 'DSR' and first == 6:
+            self.replies += b"\x1b[%i;%iR" % (y + 1, x + 1)
+
+    def _apply_private(self, params: bytes, intermediates: bytes, final: bytes) -> None:
+        args = [int(p) if p else 0 for p in params.split(b";")] if params else []
+        if intermediates == b"$" and final == b"p":
+            self.sequence_counts['DECRQM'] += 1
+            for mode in args:
+                setting = 0 if mode not in self.modes else 1 if self.modes[mode] else 2
+                self.replies += b"\x1b[?%i;%i$y" % (mode, setting)
+        elif not intermediates and final in (b"h", b"l"):
+            self.sequence_counts['DECSET' if final == b"h" else 'DECRST'] += 1
+            for mode in args:
+                if mode == 2026 and final == b"l" and self.in_synchronized_update:
+                    self.synchronized_updates += 1
+                self.modes[mode] = final == b"h"
+        else:
+            self.sequence_counts['unknown'] += 1
+
+    def _apply_sgr(self, args: List[int]) -> None:
+        # pylint: disable=too-many-branches
+        if not args:
+            args = [0]
+        while args:
+            code = args.pop(0)
+            if code == 0:
+                self._fg = _default_colour
+                self._bg = _default_colour
+                continue
+            if code in (38, 48):
+                kind = args.pop(0) if args else 0
+                if kind == 2 and len(args) >= 3:
+                    colour = (args[0], args[1], args[2])
+                    del args[:3]
+                elif kind == 5 and args:
+                    r, g, b = _indexed_colours[args.pop(0)].tolist()
+                    colour = (r, g, b)
+                else:
+                    continue
+            elif 30 <= code <= 37 or 90 <= code <= 97:
+                r, g, b = _indexed_colours[code % 10 + (8 if code >= 90 else 0)].tolist()
+                colour = (r, g, b)
+                code = 38
+            elif 40 <= code <= 47 or 100 <= code <= 107:
+                r, g, b = _indexed_colours[code % 10 + (8 if code >= 100 else 0)].tolist()
+                colour = (r, g, b)
+                code = 48
+            elif code in (39, 49):
+                colour = _default_colour
+                code -= 1
+            else:
+                continue
+            if code == 38:
+                self._fg = colour
+            else:
+                self._bg = colour
+
+    def _apply_osc(self, command: bytes) -> None:
+        self.sequence_counts['OSC'] += 1
+        kind, _, text = command.partition(b";")
+        if kind in (b"0", b"2"):
+            self.title = text.decode('utf-8', errors='replace')
+
+    def _apply_escape(self, final: bytes) -> None:
+        name = _escape_names.get(final, 'unknown')
+        self.sequence_counts[name] += 1
+        if name in ('DECSC', 'SCOSC'):
+            self._save()
+        elif name in ('DECRC', 'SCORC'):
+            self._restore()
+        elif name == 'RIS':
+            self._reset()
+
+    def _save(self) -> None:
+        self._saved = (self.cursor, self._fg, self._bg)
+
+    def _restore(self) -> None:
+        if self._saved is not None:
+            (x, y), self._fg, self._bg = self._saved
+            self._move_to(x, y)
+
+    def _reset(self) -> None:
+        self.ch[...] = ord(' ')
+        self.fg[...] = -1
+        self.bg[...] = -1
+        self._fg = _default_colour
+        self._bg = _default_colour
+        self._region = (0, self.dim[1])
+        self._saved = None
+        self.modes.clear()
+        self._move_to(0, 0)
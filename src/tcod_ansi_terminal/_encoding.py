@@ -0,0 +1,448 @@
+"""
+Vectorized encoding of console cells into terminal output.
+
+Output for a sequence of cells is built from segments. A segment is a 2D byte
+array with one row per cell, plus a mask of the same shape saying which of
+those bytes are actually emitted. Concatenating the segments for all cells and
+compressing by the mask gives the output for every cell in order, without any
+per-cell Python code.
+"""
+
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+try:
+    from typing import Literal, Protocol # pylint: disable=ungrouped-imports
+except ImportError:
+    from typing_extensions import Literal, Protocol # type: ignore
+from numpy.typing import NDArray
+import numpy
+from ._ansi import escape, make_set_fg_256, make_set_bg_256, make_set_fg_16, make_set_bg_16
+from ._glyphs import glyphs
+from ._frame_buffer import FrameBuffer
+from ._colours import channel_digits, channel_mask, channel_lengths, pack_colours, \
+    ColourSequenceCache, Palette, colour_sequences, xterm_256_palette, xterm_16_palette
+
+Segment = Tuple[NDArray[numpy.uint8], NDArray[numpy.bool_]]
+
+# Number of cells to encode at a time when encoding into a buffer.
+_encode_chunk_cells = 2048
+
+def const_segment(value: bytes, num: int) -> Segment:
+    """
+    Segment with the same bytes for every cell.
+    """
+    data = numpy.frombuffer(value, dtype=numpy.uint8)
+    return (
+        numpy.broadcast_to(data, (num, len(data))),
+        numpy.broadcast_to(numpy.bool_(True), (num, len(data))),
+    )
+
+def channel_segment(values: NDArray[numpy.uint8]) -> Segment:
+    """
+    Segment with the decimal text of a colour channel value for each cell.
+    """
+    return channel_digits[values], channel_mask[values]
+
+def decimal_segment(values: NDArray[numpy.integer[Any]]) -> Segment:
+    """
+    Segment with the decimal text of a non-negative integer for each cell.
+    """
+    width = len(str(int(values.max()))) if len(values) > 0 else 1
+    powers = 10 ** numpy.arange(width - 1, -1, -1)
+    digits = (values[:, None] // powers % 10 + ord('0')).astype(numpy.uint8)
+    mask = (values[:, None] >= powers) | (powers == 1)
+    return digits, mask
+
+def decimal_lengths(values: NDArray[numpy.integer[Any]]) -> NDArray[numpy.intp]:
+    """
+    Number of digits in the decimal text of each non-negative integer.
+    """
+    lengths = numpy.ones(values.shape, dtype=numpy.intp)
+    power = 10
+    while True:
+        more = values >= power
+        if not more.any():
+            return lengths
+        lengths += more
+        power *= 10
+
+def glyph_segment(ch: NDArray[numpy.int32]) -> Segment:
+    """
+    Segment with the UTF-8 encoded glyph for each cell.
+    """
+    data, lengths, _ = glyphs.encode(ch)
+    return data, numpy.arange(data.shape[1]) < lengths[:, None]
+
+def masked_segments(
+    segments: Sequence[Segment],
+    present: NDArray[numpy.bool_],
+) -> Sequence[Segment]:
+    """
+    Segments which are only emitted for cells where `present` is true.
+    """
+    return [(data, mask & present[:, None]) for data, mask in segments]
+
+def cursor_pos_segments(
+    xs: NDArray[numpy.integer[Any]],
+    ys: NDArray[numpy.integer[Any]],
+) -> Sequence[Segment]:
+    """
+    Segments to move the cursor to a terminal position (1-based) for each cell.
+    """
+    num = len(xs)
+    return (
+        const_segment(b"%s[" % (escape), num),
+        decimal_segment(ys),
+        const_segment(b";", num),
+        decimal_segment(xs),
+        const_segment(b"H", num),
+    )
+
+def cursor_pos_lengths(
+    xs: NDArray[numpy.integer[Any]],
+    ys: NDArray[numpy.integer[Any]],
+) -> NDArray[numpy.intp]:
+    """
+    Number of bytes used by `cursor_pos_segments()` for each cell.
+    """
+    return 4 + decimal_lengths(xs) + decimal_lengths(ys)
+
+def join_segments(
+    segments: Sequence[Segment],
+    out: Optional[FrameBuffer] = None,
+) -> Tuple[NDArray[numpy.uint8], NDArray[numpy.intp]]:
+    """
+    Join segments, returning the output bytes and the end offset of each cell's output.
+
+    If `out` is given the output bytes are added to it, and the returned
+    bytes are a view of them there.
+    """
+    data = numpy.concatenate([d for d, _ in segments], axis=1)
+    mask = numpy.concatenate([m for _, m in segments], axis=1)
+    cell_ends = numpy.cumsum(numpy.count_nonzero(mask, axis=1))
+    if out is None:
+        return data[mask], cell_ends
+    joined = out.reserve(int(cell_ends[-1]) if len(cell_ends) > 0 else 0)
+    joined[...] = data[mask]
+    return joined, cell_ends
+
+def previous_in_rows(values: NDArray[Any], row_starts: NDArray[Any]) -> NDArray[Any]:
+    """
+    Shift 2D `values` right along each row, filling the first column from `row_starts`.
+
+    For packed colours this gives the colour the terminal has before each
+    cell is written, so comparing against the cell's own colour finds where
+    runs of the same colour start.
+    """
+    previous = numpy.empty_like(values)
+    previous[:, 1:] = values[:, :-1]
+    previous[:, 0] = row_starts
+    return previous
+
+def colour_true_segments(
+    colours: NDArray[numpy.uint8],
+    layer: bytes,
+) -> Sequence[Segment]:
+    """
+    Segments to set true colour foreground (`layer` is `b"38"`) or background
+    (`layer` is `b"48"`) colours for each cell.
+    """
+    num = len(colours)
+    return (
+        const_segment(b"%s[%s;2;" % (escape, layer), num),
+        channel_segment(colours[:, 0]),
+        const_segment(b";", num),
+        channel_segment(colours[:, 1]),
+        const_segment(b";", num),
+        channel_segment(colours[:, 2]),
+        const_segment(b"m", num),
+    )
+
+def colour_true_lengths(colours: NDArray[numpy.uint8]) -> NDArray[numpy.intp]:
+    """
+    Number of bytes used by `colour_true_segments()` for each cell.
+    """
+    lengths: NDArray[numpy.intp] = 10 + channel_lengths[colours[..., :3]].sum(axis=-1)
+    return lengths
+
+ColourMode = Literal['true', '256', '16']
+
+class ColourEncoder(Protocol):
+    """
+    Says how colours are stored in cells and how they are written.
+
+    `sequences` gives the sequences to set single packed colours, and `mode`
+    the colour mode to make the encoder with `make_colour_encoder()`.
+    """
+
+    sequences: ColourSequenceCache
+    mode: ColourMode
+
+    def quantize(self, colours: NDArray[numpy.uint8]) -> NDArray[numpy.uint8]:
+        """
+        RGB(A) colours in the last axis in the form they are stored in cells.
+        """
+
+    def quantize_cells(
+        self,
+        cells: NDArray[Any],
+        out: Optional[NDArray[Any]] = None,
+    ) -> NDArray[Any]:
+        """
+        Console cells with their colours in the form they are stored in cells.
+
+        If `out` is given the result is written there, otherwise the cells may
+        be returned unchanged.
+        """
+
+    def segments(
+        self,
+        colours: NDArray[numpy.uint8],
+        layer: Literal['fg', 'bg'],
+    ) -> Sequence[Segment]:
+        """
+        Segments to set foreground or background colours for each cell.
+        """
+
+    def lengths(
+        self,
+        colours: NDArray[numpy.uint8],
+        layer: Literal['fg', 'bg'],
+    ) -> NDArray[numpy.intp]:
+        """
+        Number of bytes used by `segments()` for each cell.
+        """
+
+class TrueColourEncoder(ColourEncoder):
+    """
+    Writes colours as true colour, storing them unchanged as RGB.
+    """
+
+    def __init__(self) -> None:
+        self.sequences = colour_sequences
+        self.mode: ColourMode = 'true'
+
+    def quantize(self, colours: NDArray[numpy.uint8]) -> NDArray[numpy.uint8]:
+        return colours
+
+    def quantize_cells(
+        self,
+        cells: NDArray[Any],
+        out: Optional[NDArray[Any]] = None,
+    ) -> NDArray[Any]:
+        if out is None:
+            return cells
+        out[...] = cells
+        return out
+
+    def segments(
+        self,
+        colours: NDArray[numpy.uint8],
+        layer: Literal['fg', 'bg'],
+    ) -> Sequence[Segment]:
+        return colour_true_segments(colours, b"38" if layer == 'fg' else b"48")
+
+    def lengths(
+        self,
+        colours: NDArray[numpy.uint8],
+        layer: Literal['fg', 'bg'],
+    ) -> NDArray[numpy.intp]:
+        return colour_true_lengths(colours)
+
+def _make_sequence_table(sequences: Sequence[bytes]) -> Segment:
+    width = max(len(sequence) for sequence in sequences)
+    data = numpy.frombuffer(
+        b"".join(sequence.ljust(width, b"\0") for sequence in sequences),
+        dtype=numpy.uint8,
+    ).reshape(len(sequences), width)
+    lengths = numpy.array([len(sequence) for sequence in sequences])
+    return data, numpy.arange(width) < lengths[:, None]
+
+class PaletteColourEncoder(ColourEncoder):
+    """
+    Writes colours as indices into a terminal palette.
+
+    Colours are stored in cells quantized to their palette index, which is
+    kept in the blue channel so that the packed colour is the index.
+    """
+
+    def __init__(
+        self,
+        palette: Palette,
+        make_fg: Callable[[int], bytes],
+        make_bg: Callable[[int], bytes],
+        mode: ColourMode,
+    ):
+        self._palette = palette
+        self.mode = mode
+        self.sequences = ColourSequenceCache(make_fg=make_fg, make_bg=make_bg)
+        indices = range(palette.first_index + len(palette.colours))
+        self._tables = {
+            'fg': _make_sequence_table([make_fg(index) for index in indices]),
+            'bg': _make_sequence_table([make_bg(index) for index in indices]),
+        }
+        self._lengths = {
+            layer: numpy.count_nonzero(mask, axis=1) for layer, (_, mask) in self._tables.items()
+        }
+
+    def quantize(self, colours: NDArray[numpy.uint8]) -> NDArray[numpy.uint8]:
+        quantized = numpy.zeros_like(colours)
+        quantized[..., 2] = self._palette.quantize(colours)
+        if colours.shape[-1] > 3:
+            quantized[..., 3] = colours[..., 3]
+        return quantized
+
+    def quantize_cells(
+        self,
+        cells: NDArray[Any],
+        out: Optional[NDArray[Any]] = None,
+    ) -> NDArray[Any]:
+        if out is None:
+            out = numpy.copy(cells)
+        else:
+            out[...] = cells
+        for layer in ('fg', 'bg'):
+            colours = out[layer]
+            colours[..., 2] = self._palette.quantize(cells[layer])
+            colours[..., :2] = 0
+        return out
+
+    def segments(
+        self,
+        colours: NDArray[numpy.uint8],
+        layer: Literal['fg', 'bg'],
+    ) -> Sequence[Segment]:
+        data, mask = self._tables[layer]
+        indices = colours[:, 2]
+        return ((data[indices], mask[indices]),)
+
+    def lengths(
+        self,
+        colours: NDArray[numpy.uint8],
+        layer: Literal['fg', 'bg'],
+    ) -> NDArray[numpy.intp]:
+        lengths: NDArray[numpy.intp] = self._lengths[layer][colours[..., 2]]
+        return lengths
+
+_colour_encoders: Dict[str, Callable[[], ColourEncoder]] = {
+    'true': TrueColourEncoder,
+    '256': lambda: PaletteColourEncoder(
+        xterm_256_palette,
+        make_set_fg_256,
+        make_set_bg_256,
+        '256'
+    ),
+    '16': lambda: PaletteColourEncoder(xterm_16_palette, make_set_fg_16, make_set_bg_16, '16'),
+}
+
+def quantize_colour(
+    colour: Tuple[int, int, int],
+    encoder: ColourEncoder,
+) -> Tuple[int, int, int]:
+    """
+    A single RGB colour in the form it is stored in cells by `encoder`.
+    """
+    r, g, b = encoder.quantize(numpy.array(colour, dtype=numpy.uint8)).tolist()
+    return r, g, b
+
+def make_colour_encoder(mode: ColourMode) -> ColourEncoder:
+    """
+    Make an encoder for a colour mode: `'true'` for true colour, or `'256'`
+    or `'16'` for the xterm 256 or 16 colour palettes.
+    """
+    return _colour_encoders[mode]()
+
+def cell_costs(
+    cells: NDArray[Any],
+    previous_fg: NDArray[numpy.int64],
+    previous_bg: NDArray[numpy.int64],
+    encoder: ColourEncoder,
+) -> NDArray[numpy.intp]:
+    """
+    Number of bytes `encode_cells()` would use for each cell, without encoding.
+    """
+    fg = cells['fg']
+    bg = cells['bg']
+    costs = glyphs.lengths(cells['ch'])
+    costs += numpy.where(pack_colours(fg) != previous_fg, encoder.lengths(fg, 'fg'), 0)
+    costs += numpy.where(pack_colours(bg) != previous_bg, encoder.lengths(bg, 'bg'), 0)
+    return costs
+
+def _encode_chunk(
+    cells: NDArray[Any],
+    previous_fg: NDArray[numpy.int64],
+    previous_bg: NDArray[numpy.int64],
+    encoder: ColourEncoder,
+    *,
+    prefix: Sequence[Segment],
+    skip: Optional[NDArray[numpy.bool_]],
+    out: Optional[FrameBuffer],
+) -> Tuple[NDArray[numpy.uint8], NDArray[numpy.intp]]:
+    fg = cells['fg']
+    bg = cells['bg']
+    set_fg = pack_colours(fg) != previous_fg
+    set_bg = pack_colours(bg) != previous_bg
+    glyph: Sequence[Segment] = (glyph_segment(cells['ch']),)
+    if skip is not None:
+        set_fg &= ~skip
+        set_bg &= ~skip
+        glyph = masked_segments(glyph, ~skip)
+    return join_segments((
+        *prefix,
+        *masked_segments(encoder.segments(fg, 'fg'), set_fg),
+        *masked_segments(encoder.segments(bg, 'bg'), set_bg),
+        *glyph,
+    ), out)
+
+def encode_cells(
+    cells: NDArray[Any],
+    previous_fg: NDArray[numpy.int64],
+    previous_bg: NDArray[numpy.int64],
+    encoder: ColourEncoder,
+    *,
+    prefix: Sequence[Segment] = (),
+    skip: Optional[NDArray[numpy.bool_]] = None,
+    out: Optional[FrameBuffer] = None,
+) -> Tuple[NDArray[numpy.uint8], NDArray[numpy.intp]]:
+    """
+    Encode a 1D array of console cells, with colours as stored by `encoder`.
+
+    `previous_fg` and `previous_bg` are the packed colours the terminal will
+    have just before each cell is written; each colour is only set if it
+    differs. `prefix` are extra segments to write before each cell. Cells
+    where `skip` is true are not written at all (apart from their prefix).
+
+    If `out` is given the output is added to it and the returned bytes are a
+    view of it there. The cells are then encoded a chunk at a time, so that
+    the segments for all of them are never in memory at once.
+
+    Returns the output bytes and the end offset of each cell's output.
+    """
+    if out is None:
+        return _encode_chunk(
+            cells,
+            previous_fg,
+            previous_bg,
+            encoder,
+            prefix=prefix,
+            skip=skip,
+            out=None,
+        )
+    out_start = len(out)
+    chunk_ends = []
+    for start in range(0, len(cells), _encode_chunk_cells):
+        chunk = slice(start, start + _encode_chunk_cells)
+        chunk_start = len(out) - out_start
+        _, ends = _encode_chunk(
+            cells[chunk],
+            previous_fg[chunk],
+            previous_bg[chunk],
+            encoder,
+            prefix=[(data[chunk], mask[chunk]) for data, mask in prefix],
+            skip=skip[chunk] if skip is not None else None,
+            out=out,
+        )
+        chunk_ends.append(ends + chunk_start)
+    data = numpy.frombuffer(out.view()[out_start:], dtype=numpy.uint8)
+    if len(chunk_ends) == 0:
+        return data, numpy.zeros(0, dtype=numpy.intp)
+    return data, numpy.concatenate(chunk_ends)
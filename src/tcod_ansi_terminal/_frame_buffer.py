@@ -0,0 +1,67 @@
+"""
+Building frames in a reusable buffer.
+"""
+
+from typing import Any
+from numpy.typing import NDArray
+import numpy
+
+class FrameBuffer:
+    """
+    Growable byte buffer which a frame is built up in, and which is kept
+    between frames so that its memory is reused rather than allocated again.
+
+    Bytes are added with `write()`, or encoded in place into the space given
+    by `reserve()`. `view()` gives everything added since `clear()` without
+    copying it, to write to the output file.
+
+    The memory is a numpy array rather than a `bytearray`, since a
+    `bytearray` can't grow while views of it exist.
+    """
+
+    def __init__(self, capacity: int = 0) -> None:
+        self._data = numpy.empty(capacity, dtype=numpy.uint8)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        """
+        Number of bytes the buffer can hold before it has to grow.
+        """
+        return len(self._data)
+
+    def clear(self) -> None:
+        """
+        Empty the buffer, keeping its memory.
+        """
+        self._size = 0
+
+    def reserve(self, size: int) -> NDArray[numpy.uint8]:
+        """
+        Add `size` bytes to the end of the buffer, returning them to be filled in.
+        """
+        end = self._size + size
+        if end > len(self._data):
+            grown = numpy.empty(max(end, 2 * len(self._data)), dtype=numpy.uint8)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+        reserved = self._data[self._size:end]
+        self._size = end
+        return reserved
+
+    def write(self, data: Any) -> None:
+        """
+        Add bytes to the end of the buffer, from any bytes-like object.
+        """
+        self.reserve(memoryview(data).nbytes)[...] = numpy.frombuffer(data, dtype=numpy.uint8)
+
+    def view(self) -> memoryview:
+        """
+        View of the bytes in the buffer, which is only valid until the buffer
+        is next changed.
+        """
+        view: memoryview = self._data[:self._size].data
+        return view
@@ -0,0 +1,135 @@
+"""
+Encoding console glyphs (codepoints) for the terminal.
+"""
+
+from typing import Any, List, Sequence, Tuple
+from collections import OrderedDict
+import threading
+import unicodedata
+from numpy.typing import NDArray
+import numpy
+
+# Covers all of the TCOD charmaps (`CHARMAP_CP437` and `CHARMAP_TCOD`).
+_dense_limit = 0x2700
+_sparse_cache_size = 4096
+# Room for a space before a four byte zero-width character.
+_max_glyph_len = 5
+
+def encode_glyph(codepoint: int) -> Tuple[bytes, int]:
+    """
+    Encode a codepoint for the terminal, returning the bytes and the number
+    of columns it takes up on the terminal (1 or 2).
+
+    Control characters and invalid codepoints are replaced so that every
+    glyph moves the cursor. Zero-width characters are put on a space.
+    """
+    if codepoint < 0 or codepoint > 0x10FFFF or 0xD800 <= codepoint <= 0xDFFF:
+        return "�".encode('utf8'), 1
+    ch = chr(codepoint)
+    category = unicodedata.category(ch)
+    if category == 'Cc':
+        return b" ", 1
+    if category in ('Mn', 'Me', 'Cf'):
+        return b" " + ch.encode('utf8'), 1
+    if unicodedata.east_asian_width(ch) in ('W', 'F'):
+        return ch.encode('utf8'), 2
+    return ch.encode('utf8'), 1
+
+_Table = Tuple[NDArray[numpy.uint8], NDArray[numpy.intp], NDArray[numpy.intp]]
+
+def _make_table(encoded: Sequence[Tuple[bytes, int]]) -> _Table:
+    data = numpy.frombuffer(
+        b"".join(glyph.ljust(_max_glyph_len, b"\0") for glyph, _ in encoded),
+        dtype=numpy.uint8,
+    ).reshape(len(encoded), _max_glyph_len)
+    lengths = numpy.array([len(glyph) for glyph, _ in encoded], dtype=numpy.intp)
+    widths = numpy.array([width for _, width in encoded], dtype=numpy.intp)
+    return data, lengths, widths
+
+class GlyphTable:
+    """
+    Lookup table from codepoints to their terminal encoding, for use on
+    arrays of codepoints.
+
+    Codepoints below `dense_limit` are in a precomputed table. Others are
+    looked up in a bounded cache, which evicts the least recently used entry
+    once it has `cache_size` entries. The cache is locked, so a table can be
+    used from several threads at once.
+    """
+
+    def __init__(self, *, dense_limit: int = _dense_limit, cache_size: int = _sparse_cache_size):
+        self._dense_limit = dense_limit
+        self._cache_size = cache_size
+        self._cache: "OrderedDict[int, Tuple[bytes, int]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._dense = _make_table([encode_glyph(codepoint) for codepoint in range(dense_limit)])
+
+    def _lookup_sparse(self, codepoint: int) -> Tuple[bytes, int]:
+        result = self._cache.get(codepoint)
+        if result is None:
+            result = encode_glyph(codepoint)
+            self._cache[codepoint] = result
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(codepoint)
+        return result
+
+    def _gather(self, codepoints: NDArray[Any], columns: Sequence[int]) -> List[NDArray[Any]]:
+        sparse = (codepoints < 0) | (codepoints >= self._dense_limit)
+        indices = numpy.where(sparse, 0, codepoints)
+        results = [self._dense[column][indices] for column in columns]
+        if sparse.any():
+            unique, inverse = numpy.unique(codepoints[sparse], return_inverse=True)
+            with self._cache_lock:
+                encoded = [self._lookup_sparse(int(c)) for c in unique]
+            sparse_table = _make_table(encoded)
+            for result, column in zip(results, columns):
+                result[sparse] = sparse_table[column][inverse]
+        return results
+
+    def encode(self, codepoints: NDArray[Any]) -> _Table:
+        """
+        Encode an array of codepoints, returning the encoded bytes (padded to
+        the same length in an extra trailing axis), the length of each
+        encoding, and the width of each glyph on the terminal.
+        """
+        data, lengths, widths = self._gather(codepoints, (0, 1, 2))
+        return data, lengths, widths
+
+    def lengths(self, codepoints: NDArray[Any]) -> NDArray[numpy.intp]:
+        """
+        Number of bytes in the encoding of each codepoint.
+        """
+        lengths, = self._gather(codepoints, (1,))
+        return lengths
+
+    def widths(self, codepoints: NDArray[Any]) -> NDArray[numpy.intp]:
+        """
+        Number of terminal columns taken up by each codepoint's glyph.
+        """
+        widths, = self._gather(codepoints, (2,))
+        return widths
+
+glyphs = GlyphTable()
+
+def find_covered(widths: NDArray[numpy.intp]) -> NDArray[numpy.bool_]:
+    """
+    Find cells in a 2D array of glyph widths which are covered by a double
+    width glyph to their left, and so should not be written.
+
+    In a run of double width glyphs every other one is covered.
+    """
+    wide = widths == 2
+    covered = numpy.zeros(wide.shape, dtype=numpy.bool_)
+    if not wide.any():
+        return covered
+    xs = numpy.broadcast_to(numpy.arange(wide.shape[1]), wide.shape)
+    # Find where each run of wide glyphs starts, carried forward along the row.
+    previous_wide = numpy.zeros(wide.shape, dtype=numpy.bool_)
+    previous_wide[:, 1:] = wide[:, :-1]
+    run_starts = numpy.where(wide & ~previous_wide, xs, 0)
+    run_starts = numpy.maximum.accumulate(run_starts, axis=1)
+    drawn_wide = wide & ((xs - run_starts) % 2 == 0)
+    covered[:, 1:] = drawn_wide[:, :-1]
+    return covered
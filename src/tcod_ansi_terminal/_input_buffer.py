@@ -0,0 +1,91 @@
+"""
+Buffering terminal input.
+"""
+
+from typing import Any, List
+import os
+
+# Default size of input buffers, which is more than a terminal sends at once.
+default_input_buffer_size = 4096
+
+class InputBuffer:
+    """
+    Ring buffer of input bytes which have been read but not yet parsed.
+
+    Input is read in with `read_from()`, which reads as much as there is
+    room for with a single system call, or added with `write()`. `peek()`
+    gives the bytes in the buffer, and `consume()` removes them once parsed,
+    so a sequence split across reads stays in the buffer until the rest
+    arrives. The buffer grows if it fills up.
+    """
+
+    def __init__(self, capacity: int = default_input_buffer_size) -> None:
+        self._data = bytearray(capacity)
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        """
+        Number of bytes the buffer can hold before it has to grow.
+        """
+        return len(self._data)
+
+    def read_from(self, fd: int) -> int:
+        """
+        Read what is available from file descriptor `fd`, up to the space in
+        the buffer, returning the number of bytes read.
+        """
+        if self._size == len(self._data):
+            self._grow(2 * len(self._data))
+        with memoryview(self._data) as view:
+            num = os.readv(fd, self._free_spans(view))
+        self._size += num
+        return num
+
+    def write(self, data: Any) -> None:
+        """
+        Add bytes to the end of the buffer, from any bytes-like object.
+        """
+        data_view = memoryview(data).cast('B')
+        if self._size + len(data_view) > len(self._data):
+            self._grow(max(self._size + len(data_view), 2 * len(self._data)))
+        with memoryview(self._data) as view:
+            pos = 0
+            for span in self._free_spans(view):
+                num = min(len(span), len(data_view) - pos)
+                span[:num] = data_view[pos:pos + num]
+                pos += num
+        self._size += len(data_view)
+
+    def peek(self) -> bytes:
+        """
+        The bytes in the buffer, oldest first.
+        """
+        end = self._start + self._size
+        if end <= len(self._data):
+            return bytes(self._data[self._start:end])
+        return bytes(self._data[self._start:]) + bytes(self._data[:end - len(self._data)])
+
+    def consume(self, num: int) -> None:
+        """
+        Remove `num` bytes from the start of the buffer.
+        """
+        num = min(num, self._size)
+        self._size -= num
+        self._start = (self._start + num) % len(self._data) if self._size > 0 else 0
+
+    def _free_spans(self, view: memoryview) -> List[memoryview]:
+        end = self._start + self._size
+        if end >= len(self._data):
+            return [view[end - len(self._data):self._start]]
+        return [span for span in (view[end:], view[:self._start]) if len(span) > 0]
+
+    def _grow(self, capacity: int) -> None:
+        contents = self.peek()
+        self._data = bytearray(capacity)
+        self._data[:len(contents)] = contents
+        self._start = 0
@@ -2,23 +2,75 @@
 This is the internal context system.
 """
 
-from typing import TypeVar, Any, Optional, Sequence, Tuple, List, BinaryIO
+from typing import TypeVar, Any, Dict, NamedTuple, Optional, Sequence, Tuple, List, BinaryIO
 try:
     from typing import Literal
 except ImportError:
     from typing_extensions import Literal # type: ignore
+import threading
+import time
 from tcod.console import Console
 from tcod.event import Event
 from ._platform import Platform, make_platform
 from ._internal_event import EventsManager
 from ._abstract_context import TerminalCompatibleContext
-from ._presenters import Presenter, NaivePresenter
+from ._presenters import Presenter, NaivePresenter, SparsePresenter, AdaptivePresenter
+from ._output import OutputWriter
+from ._render_thread import RenderThread
+from ._console_utils import copy_console, consoles_equal
+from ._stats import FrameStats, RenderStats, StatsOutput
+from ._recording import OutputRecorder
 from . import _ansi
 
 E = TypeVar("E", bound=Event)
 
 _context_stack: List["TerminalContext"] = []
 
+class _Frame(NamedTuple):
+    console: Console
+    term_dim: Tuple[int, int]
+    clear_colour: Tuple[int, int, int]
+    align: Tuple[float, float]
+    presenter: Presenter
+    cursor_position: Tuple[int, int]
+
+class FrameCounts(NamedTuple):
+    """
+    Counts of frames given to `TerminalContext.present()`, by what happened
+    to them.
+    """
+
+    presented: int
+    """Frames written to the output."""
+    coalesced: int
+    """Frames replaced by a newer frame before they were written."""
+    unchanged: int
+    """Frames skipped since nothing had changed since the last one."""
+    dropped: int
+    """Frames written but dropped by the output before reaching the terminal."""
+
+class MouseMotionCounts(NamedTuple):
+    """
+    Counts of mouse motion events coalesced by `TerminalContext`.
+    """
+
+    merged: int
+    """Motion events merged into a later one which arrived with them."""
+    dropped: int
+    """Merged motion events dropped since the pointer ended where it started."""
+
+MouseTracking = Literal['none', 'click', 'drag', 'motion']
+"""
+Which mouse events the terminal reports: none, button presses and releases,
+those and motion while a button is down, or those and any motion.
+"""
+
+_mouse_tracking_modes: Dict[MouseTracking, int] = {
+    'click': _ansi.mouse_click_mode,
+    'drag': _ansi.mouse_drag_mode,
+    'motion': _ansi.mouse_any_motion_mode,
+}
+
 class TerminalContext(TerminalCompatibleContext):
     """
     TCOD-compatible context that writes to a terminal.
@@ -27,6 +79,35 @@ class TerminalContext(TerminalCompatibleContext):
     change at runtime after the context is created.
     `recommended_console_size()` is the actual size of the terminal and
     `new_console()` creates a console of that size.
+
+    If `synchronized_output` is true, each frame is written as a synchronized
+    update, so the terminal draws it all at once rather than as it arrives.
+
+    If the context has a render thread, `present()` copies the console and
+    returns, leaving the thread to write it; use `wait_presented()` to wait
+    until it has been written.
+
+    If `target_fps` is set, frames are paced to that rate: frames presented
+    within one frame interval are coalesced into the newest, and frames
+    where nothing has changed are skipped. Pacing uses the render thread,
+    which is started if need be. `frame_counts` counts what happened to
+    presented frames.
+
+    Statistics for each frame written are collected if `render_stats` is set
+    to a `RenderStats`. When it is `None` they cost next to nothing.
+
+    What is sent to the terminal is recorded if `recorder` is set to an
+    `OutputRecorder`.
+
+    If `coalesce_mouse_motion` is true, mouse motion events which arrive
+    together are merged into one, with the final position and the total
+    motion, so a fast sweep doesn't queue an event for every cell crossed.
+    Other events keep their order relative to the merged motion.
+    `mouse_motion_counts` counts what was merged.
+
+    `mouse_tracking` sets which mouse events the terminal reports, and can be
+    changed at any time, for example to stop motion reports in screens that
+    don't use the mouse.
     """
 
     _out_file: BinaryIO
@@ -34,7 +115,17 @@ class TerminalContext(TerminalCompatibleContext):
     _last_term_dim: Tuple[int, int]
     _cursor_visible: bool
     _cursor_position: Tuple[int, int]
+    _mouse_tracking: MouseTracking
     _events_manager: EventsManager
+    _output_lock: "threading.RLock"
+    _render_thread: Optional[RenderThread[_Frame]]
+    _target_fps: Optional[float]
+    _last_console: Optional[Console]
+    _last_frame_key: Optional[Tuple[Any, ...]]
+    _frames_presented: int
+    _frames_unchanged: int
+    synchronized_output: bool
+    render_stats: Optional[RenderStats]
 
     def _open(
         self,
@@ -46,7 +137,8 @@ class TerminalContext(TerminalCompatibleContext):
     ) -> None:
         _ansi.hide_cursor(self._out_file)
         _ansi.set_cursor_pos((0, 0), self._out_file)
-        _ansi.enable_mouse_tracking(self._out_file)
+        if self._mouse_tracking != 'none':
+            _ansi.enable_mouse_tracking(_mouse_tracking_modes[self._mouse_tracking], self._out_file)
         _ansi.enable_focus_reporting(self._out_file)
         if requested_window_pos is not None:
             _ansi.request_terminal_window_pos(requested_window_pos, self._out_file)
@@ -63,15 +155,24 @@ class TerminalContext(TerminalCompatibleContext):
 
     def close(self) -> None:
         global _context_stack
-        _ansi.set_cursor_pos((0, 0), self._out_file)
-        _ansi.clear_screen(self._out_file)
-        _ansi.show_cursor(self._out_file)
-        _ansi.disable_mouse_tracking(self._out_file)
-        _ansi.disable_focus_reporting(self._out_file)
-        _ansi.reset(self._out_file)
-        self._out_file.flush()
-        self._platform.close()
-        _context_stack = [c for c in _context_stack if c is not self]
+        try:
+            if self._render_thread is not None:
+                self._render_thread.close()
+        finally:
+            with self._output_lock:
+                _ansi.set_cursor_pos((0, 0), self._out_file)
+                _ansi.clear_screen(self._out_file)
+                _ansi.show_cursor(self._out_file)
+                _ansi.disable_mouse_tracking(self._out_file)
+                _ansi.disable_focus_reporting(self._out_file)
+                _ansi.reset(self._out_file)
+                self._out_file.flush()
+                if isinstance(self._out_file, OutputWriter):
+                    self._out_file.close()
+                    if self._out_file.recorder is not None:
+                        self._out_file.recorder.close()
+            self._platform.close()
+            _context_stack = [c for c in _context_stack if c is not self]
 
     def __exit__(self, *args: Any) -> None:
         self.close()
@@ -91,20 +192,199 @@ class TerminalContext(TerminalCompatibleContext):
         written to the terminal. In general the presenter instance should be
         reused between calls to `present()`. Other arguments are as for regular
         TCOD `present()`.
+
+        If the output is an `OutputWriter` which is behind, the frame is
+        written in full so that it can replace the frame still waiting to be
+        sent.
+
+        With a render thread, the console is copied and written by the
+        thread, replacing any earlier frame it hasn't started on. The
+        presenter must then not be used elsewhere until `wait_presented()`.
         """
         # pylint: disable=arguments-differ
+        if self._target_fps is not None:
+            frame_key = (self._last_term_dim, clear_color, align, presenter, self._cursor_position)
+            if frame_key == self._last_frame_key and self._last_console is not None \
+                    and consoles_equal(console, self._last_console):
+                self._frames_unchanged += 1
+                return
+            self._last_console = copy_console(console, self._last_console)
+            self._last_frame_key = frame_key
         if presenter is None:
             presenter = NaivePresenter()
-        presenter.present(
-            console=console,
-            term_dim=self._last_term_dim,
-            align=align,
-            clear_colour=clear_color,
-            out_file=self._out_file
+        if self._render_thread is None:
+            self._present_frame(_Frame(
+                console,
+                self._last_term_dim,
+                clear_color,
+                align,
+                presenter,
+                self._cursor_position
+            ))
+        else:
+            spare = self._render_thread.reclaim()
+            self._render_thread.submit(_Frame(
+                copy_console(console, spare.console if spare is not None else None),
+                self._last_term_dim,
+                clear_color,
+                align,
+                presenter,
+                self._cursor_position
+            ))
+
+    @property
+    def target_fps(self) -> Optional[float]:
+        """
+        Frame rate to pace presented frames to, which must be positive, or
+        `None` for no pacing.
+        """
+        return self._target_fps
+
+    @target_fps.setter
+    def target_fps(self, value: Optional[float]) -> None:
+        check_target_fps(value)
+        self._target_fps = value
+        self._last_console = None
+        self._last_frame_key = None
+        if value is not None and self._render_thread is None:
+            self._render_thread = RenderThread(self._present_frame)
+        if self._render_thread is not None:
+            self._render_thread.min_interval = 1 / value if value is not None else 0.0
+
+    @property
+    def recorder(self) -> Optional[OutputRecorder]:
+        """
+        Recorder for what is sent to the terminal, or `None` to not record.
+        Recording needs the output to be an `OutputWriter`. The recorder is
+        closed when the context is.
+        """
+        return self._out_file.recorder if isinstance(self._out_file, OutputWriter) else None
+
+    @recorder.setter
+    def recorder(self, value: Optional[OutputRecorder]) -> None:
+        if not isinstance(self._out_file, OutputWriter):
+            raise ValueError("recording needs the output to be an OutputWriter")
+        with self._output_lock:
+            self._out_file.recorder = value
+
+    @property
+    def coalesce_mouse_motion(self) -> bool:
+        """
+        Whether mouse motion events which arrive together are merged.
+        """
+        return self._events_manager.coalesce_mouse_motion
+
+    @coalesce_mouse_motion.setter
+    def coalesce_mouse_motion(self, value: bool) -> None:
+        self._events_manager.coalesce_mouse_motion = value
+
+    @property
+    def mouse_tracking(self) -> MouseTracking:
+        """
+        Which mouse events the terminal reports.
+        """
+        return self._mouse_tracking
+
+    @mouse_tracking.setter
+    def mouse_tracking(self, value: MouseTracking) -> None:
+        if value not in _mouse_tracking_modes and value != 'none':
+            raise ValueError(f"unknown mouse tracking: {value!r}")
+        with self._output_lock:
+            if value == self._mouse_tracking:
+                return
+            _ansi.disable_mouse_tracking(self._out_file)
+            if value != 'none':
+                _ansi.enable_mouse_tracking(_mouse_tracking_modes[value], self._out_file)
+            self._out_file.flush()
+            self._mouse_tracking = value
+
+    @property
+    def mouse_motion_counts(self) -> MouseMotionCounts:
+        """
+        Counts of mouse motion events merged or dropped by coalescing.
+        """
+        return MouseMotionCounts(
+            merged=self._events_manager.mouse_motions_merged,
+            dropped=self._events_manager.mouse_motions_dropped,
         )
-        cur_x, cur_y = self._cursor_position
-        _ansi.set_cursor_pos((cur_x + 1, cur_y + 1), self._out_file)
-        self._out_file.flush()
+
+    @property
+    def frame_counts(self) -> FrameCounts:
+        """
+        Counts of what happened to frames given to `present()`.
+        """
+        thread = self._render_thread
+        writer = self._out_file if isinstance(self._out_file, OutputWriter) else None
+        return FrameCounts(
+            presented=self._frames_presented,
+            coalesced=thread.frames_replaced if thread is not None else 0,
+            unchanged=self._frames_unchanged,
+            dropped=writer.frames_dropped if writer is not None else 0,
+        )
+
+    def wait_presented(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every frame given to `present()` has been written and
+        flushed, returning false if `timeout` (in seconds) ran out first. This
+        returns straight away without a render thread.
+        """
+        if self._render_thread is None:
+            return True
+        return self._render_thread.wait(timeout)
+
+    def _present_frame(self, frame: _Frame) -> None:
+        # pylint: disable=too-many-locals
+        presenter = frame.presenter
+        stats = self.render_stats
+        with self._output_lock:
+            self._frames_presented += 1
+            writer = self._out_file if isinstance(self._out_file, OutputWriter) else None
+            output = self._out_file if stats is None else StatsOutput(self._out_file)
+            complete = isinstance(presenter, NaivePresenter)
+            if writer is not None:
+                if writer.backlogged \
+                        and isinstance(presenter, (SparsePresenter, AdaptivePresenter)):
+                    presenter.invalidate()
+                    complete = True
+                writer.begin_frame()
+            synchronized = self.synchronized_output
+            if synchronized:
+                _ansi.begin_synchronized_update(output)
+            try:
+                present_start = time.perf_counter()
+                presenter.present(
+                    console=frame.console,
+                    term_dim=frame.term_dim,
+                    align=frame.align,
+                    clear_colour=frame.clear_colour,
+                    out_file=output
+                )
+                present_time = time.perf_counter() - present_start
+                cur_x, cur_y = frame.cursor_position
+                _ansi.set_cursor_pos((cur_x + 1, cur_y + 1), output)
+            finally:
+                # Always end the update, or the terminal would stop drawing
+                # until it gives up waiting.
+                if synchronized:
+                    _ansi.end_synchronized_update(output)
+                flush_start = time.perf_counter()
+                if writer is not None:
+                    writer.end_frame(complete=complete)
+                else:
+                    self._out_file.flush()
+                flush_time = time.perf_counter() - flush_start
+        if stats is not None:
+            assert isinstance(output, StatsOutput)
+            stats.add(FrameStats(
+                cells_written=output.cells_written,
+                bytes_written=output.bytes_written,
+                sgr_sequences=output.sgr_sequences,
+                cursor_moves=output.cursor_moves,
+                # Writes outside the presenter are too small to matter.
+                encode_time=present_time - output.write_time - output.count_time,
+                write_time=output.write_time,
+                flush_time=flush_time,
+            ))
 
     def pixel_to_tile(self, x: int, y: int) -> Tuple[int, int]:
         return x, y
@@ -154,12 +434,20 @@ class TerminalContext(TerminalCompatibleContext):
 
     @cursor_visible.setter
     def cursor_visible(self, value: bool) -> None:
-        if value:
-            _ansi.show_cursor(self._out_file)
-        else:
-            _ansi.hide_cursor(self._out_file)
+        with self._output_lock:
+            if value:
+                _ansi.show_cursor(self._out_file)
+            else:
+                _ansi.hide_cursor(self._out_file)
         self._cursor_visible = value
 
+def check_target_fps(value: Optional[float]) -> None:
+    """
+    Raise `ValueError` unless `value` is `None` or a usable frame rate.
+    """
+    if value is not None and not value > 0:
+        raise ValueError(f"target_fps must be positive: {value!r}")
+
 def get_terminal_context_stack() -> Sequence[TerminalContext]:
     return _context_stack
 
@@ -167,6 +455,10 @@ def get_events_manager(context: TerminalContext) -> EventsManager:
     # pylint: disable=protected-access
     return context._events_manager
 
+def _supports_synchronized_output(events_manager: EventsManager) -> bool:
+    setting = events_manager.query_mode(_ansi.synchronized_update_mode)
+    return setting in (1, 2, 3)
+
 def make_terminal_context(
     *,
     in_file: BinaryIO,
@@ -174,9 +466,26 @@ def make_terminal_context(
     requested_window_pos: Optional[Tuple[int, int]] = None,
     requested_pixels_dim: Optional[Tuple[int, int]] = None,
     requested_chars_dim: Optional[Tuple[int, int]] = None,
-    title: Optional[str] = None
+    title: Optional[str] = None,
+    synchronized_output: Optional[bool] = None,
+    render_thread: bool = False,
+    target_fps: Optional[float] = None,
+    render_stats: Optional[RenderStats] = None,
+    recorder: Optional[OutputRecorder] = None,
+    coalesce_mouse_motion: bool = False,
+    mouse_tracking: MouseTracking = 'motion'
 ) -> TerminalContext:
+    """
+    Make and open a terminal context. If `synchronized_output` is `None` it
+    is used if the terminal supports it. If `render_thread` is true, frames
+    are written from a background thread. `target_fps` sets up pacing,
+    `render_stats` collects statistics, `recorder` records the output
+    (which must then be an `OutputWriter`) from the start, and
+    `coalesce_mouse_motion` merges mouse motion events, and `mouse_tracking`
+    sets which mouse events are reported.
+    """
     # pylint: disable=protected-access
+    check_target_fps(target_fps)
     new: TerminalContext = TerminalContext.__new__(TerminalContext)
     new._out_file = out_file
     new._platform = make_platform(in_file)
@@ -184,12 +493,30 @@ def make_terminal_context(
     new._last_term_dim = (0, 0)
     new._cursor_visible = False
     new._cursor_position = (0, 0)
-    new._events_manager = EventsManager(new._platform, new._out_file, new._on_resize)
+    new._mouse_tracking = mouse_tracking
+    new._output_lock = threading.RLock()
+    if recorder is not None:
+        new.recorder = recorder
+    new._events_manager = EventsManager(
+        new._platform,
+        new._out_file,
+        new._on_resize,
+        new._output_lock
+    )
+    new._events_manager.coalesce_mouse_motion = coalesce_mouse_motion
     new._open(
         requested_window_pos=requested_window_pos,
         requested_pixels_dim=requested_pixels_dim,
         requested_chars_dim=requested_chars_dim,
         title=title,
     )
+    if synchronized_output is None:
+        synchronized_output = _supports_synchronized_output(new._events_manager)
+    new.synchronized_output = synchronized_output
+    new._render_thread = RenderThread(new._present_frame) if render_thread else None
+    new._frames_presented = 0
+    new._frames_unchanged = 0
+    new.render_stats = render_stats
+    new.target_fps = target_fps
     _context_stack.append(new)
     return new
@@ -2,15 +2,28 @@
 This is the internal event system including hooks for the context.
 """
 
-from typing import Union, Optional, Callable, Iterator, List, Tuple, BinaryIO
+from typing import Union, Optional, Callable, ContextManager, Iterator, Dict, List, Tuple, \
+    BinaryIO, Any
+import itertools
+import time
 from tcod.event import KeySym, Scancode, MouseButton, KeyDown, KeyUp, TextInput, Quit, \
     WindowResized, MouseMotion, MouseWheel, MouseButtonUp, MouseButtonDown, WindowEvent, \
     KMOD_NONE, KMOD_SHIFT
 from ._logging import logger
 from ._platform import Platform
+from ._output import OutputWriter
 from . import _ansi
 
 _catchup_read_timeout = 100
+# TCOD mouse buttons by the numbers terminals report them as.
+_mouse_buttons = {
+    0: MouseButton.LEFT,
+    1: MouseButton.MIDDLE,
+    2: MouseButton.RIGHT,
+}
+# Seconds to wait for the rest of a partly read escape sequence before
+# giving up on it.
+_partial_input_timeout = 0.05
 
 TerminalEvent = Union[
     KeyDown,
@@ -30,10 +43,12 @@ class EventsManager:
         self,
         platform: Platform,
         out_file: BinaryIO,
-        resize_callback: Callable[[Tuple[int, int]], None]
+        resize_callback: Callable[[Tuple[int, int]], None],
+        output_lock: ContextManager[Any]
     ) -> None:
         self._platform = platform
         self._out_file = out_file
+        self._output_lock = output_lock
         self._got_quit = False
         self._got_resize = False
         self._waiting_events: List[TerminalEvent] = []
@@ -41,6 +56,14 @@ class EventsManager:
         self._last_mouse_motion: Optional[Tuple[int, int]] = None
         self._current_mouse_button_down: Optional[int] = None
         self._last_term_dim: Optional[Tuple[int, int]] = None
+        self._mode_settings: Dict[int, int] = {}
+        self._partial_input_since: Optional[float] = None
+        self.coalesce_mouse_motion = False
+        """Whether to merge mouse motion events which arrive together."""
+        self.mouse_motions_merged = 0
+        """Number of mouse motion events merged into a later one."""
+        self.mouse_motions_dropped = 0
+        """Number of merged mouse motion events dropped as they went nowhere."""
         platform.watch_quit(self._on_quit)
         platform.watch_resize(self._on_resize)
         self._catchup()
@@ -57,13 +80,27 @@ class EventsManager:
         self._catchup()
         return self._last_term_dim
 
+    def query_mode(self, mode: int) -> Optional[int]:
+        """
+        Ask the terminal about a DEC private mode, returning its setting as for
+        `_ansi.ModeReportInput`, or `None` if the terminal doesn't answer.
+        """
+        # Terminals reply in order, so any reply will have arrived by the time
+        # the terminal size does.
+        with self._output_lock:
+            _ansi.request_mode(mode, self._out_file)
+            self.get_terminal_dim()
+        return self._mode_settings.get(mode)
+
     def _catchup(self) -> None:
         if self._got_resize:
-            _ansi.save_cursor_pos(self._out_file)
-            _ansi.request_get_terminal_dim(self._out_file)
-            self._out_file.flush()
-            while self._got_resize:
-                self._waiting_events += self._handle_input(_catchup_read_timeout)
+            # Nothing else can write until the cursor is restored.
+            with self._output_lock:
+                _ansi.save_cursor_pos(self._out_file)
+                _ansi.request_get_terminal_dim(self._out_file)
+                self._out_file.flush()
+                while self._got_resize:
+                    self._waiting_events += self._handle_input(_catchup_read_timeout)
 
     def _on_quit(self) -> None:
         self._got_quit = True
@@ -72,17 +109,99 @@ class EventsManager:
         self._got_resize = True
 
     def _handle_input(self, timeout: Optional[float]) -> Iterator[TerminalEvent]:
-        key = self._platform.getch(timeout)
+        if self._partial_input_since is not None:
+            remaining = self._partial_input_since + _partial_input_timeout - time.monotonic()
+            timeout = max(0.0, remaining if timeout is None else min(timeout, remaining))
+        self._read_input(timeout)
+        events: List[TerminalEvent] = []
         if self._got_quit:
-            yield Quit()
+            events.append(Quit())
             self._got_quit = False
-        if key is not None:
-            if key == _ansi.escape:
-                result = _ansi.get_escape_input(self._platform)
-                if result is not None:
-                    yield from self._handle_escape_input(result)
-            else:
-                yield from self._handle_key_press(key)
+        for parsed in self._parse_input():
+            if isinstance(parsed, bytes):
+                events += self._handle_key_press(parsed)
+            elif parsed is not None:
+                events += self._handle_escape_input(parsed)
+        if self.coalesce_mouse_motion:
+            events = self._coalesce_mouse_motion(events)
+        # Events are only given out once all the input is parsed, so that
+        # handling them can safely read more input.
+        yield from events
+
+    def _read_input(self, timeout: Optional[float]) -> None:
+        """
+        Wait for input as `Platform.read_input()` does, meanwhile sending any
+        output the terminal hasn't taken yet as it becomes able to.
+        """
+        writer = self._out_file if isinstance(self._out_file, OutputWriter) else None
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            output_fd = writer.fileno() if writer is not None and writer.backlogged else None
+            got_input = self._platform.read_input(timeout, output_fd)
+            if writer is not None and output_fd is not None:
+                with self._output_lock:
+                    writer.poll()
+            if got_input or output_fd is None or self._got_quit or self._got_resize:
+                return
+            if deadline is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    return
+
+    def _coalesce_mouse_motion(self, events: List[TerminalEvent]) -> List[TerminalEvent]:
+        """
+        Merge each run of mouse motion events into one with the final position
+        and the total motion, dropping it if the motion adds up to nothing.
+        """
+        coalesced: List[TerminalEvent] = []
+        run: Optional[MouseMotion] = None
+        run_length = 0
+        # The `None` at the end finishes any run still going.
+        for event in itertools.chain(events, (None,)):
+            if isinstance(event, MouseMotion):
+                if run is None:
+                    run = event
+                else:
+                    run = MouseMotion(
+                        position=event.position,
+                        motion=(run.motion[0] + event.motion[0], run.motion[1] + event.motion[1]),
+                        tile=event.position,
+                    )
+                    self.mouse_motions_merged += 1
+                run_length += 1
+                continue
+            if run is not None:
+                if run_length > 1 and tuple(run.motion) == (0, 0):
+                    self.mouse_motions_dropped += 1
+                else:
+                    coalesced.append(run)
+                run = None
+                run_length = 0
+            if event is not None:
+                coalesced.append(event)
+        return coalesced
+
+    def _parse_input(self) -> List[Optional[_ansi.ParsedInput]]:
+        buffer = self._platform.input_buffer
+        data = buffer.peek()
+        parsed = []
+        pos = 0
+        while pos < len(data):
+            result, end = _ansi.parse_input(data, pos)
+            if end == pos:
+                # Wait for the rest of the sequence, unless it is overdue.
+                if self._partial_input_since is None:
+                    self._partial_input_since = time.monotonic()
+                    break
+                if time.monotonic() < self._partial_input_since + _partial_input_timeout:
+                    break
+                logger.debug("incomplete escape: %r", data[pos:])
+                end = pos + 1
+            self._partial_input_since = None
+            parsed.append(result)
+            pos = end
+        buffer.consume(pos)
+        return parsed
 
     def _handle_resize(self, event: _ansi.WindowResizeInput) -> Iterator[TerminalEvent]:
         self._got_resize = False
@@ -127,35 +246,24 @@ class EventsManager:
         yield MouseMotion(position=event.pos, motion=motion, tile=event.pos)
 
     def _handle_mouse_button(self, event: _ansi.MouseButtonInput) -> Iterator[TerminalEvent]:
-        if self._last_mouse_motion is None:
-            logger.warning("mouse button but don't have position")
-            return
-        if event.button == 3:
-            if self._current_mouse_button_down is None:
-                logger.warning("mouse button up but didn't know it was down")
-                return
-            button = self._current_mouse_button_down
-            self._current_mouse_button_down = None
-            yield MouseButtonUp(
-                pixel=self._last_mouse_motion,
-                tile=self._last_mouse_motion,
-                button=button,
-            )
-        else:
-            if event.button == 0:
-                button = MouseButton.LEFT
-            elif event.button == 1:
-                button = MouseButton.MIDDLE
-            elif event.button == 2:
-                button = MouseButton.RIGHT
+        self._last_mouse_motion = event.pos
+        if event.released:
+            if event.button == 3:
+                # Legacy reports don't say which button was released.
+                if self._current_mouse_button_down is None:
+                    logger.warning("mouse button up but didn't know it was down")
+                    return
+                button = self._current_mouse_button_down
             else:
-                logger.warning("unhandled mouse button: %r", event)
+                button = _mouse_buttons[event.button]
+            self._current_mouse_button_down = None
+            yield MouseButtonUp(pixel=event.pos, tile=event.pos, button=button)
+        elif event.button in _mouse_buttons:
+            button = _mouse_buttons[event.button]
             self._current_mouse_button_down = button
-            yield MouseButtonDown(
-                pixel=self._last_mouse_motion,
-                tile=self._last_mouse_motion,
-                button=button,
-            )
+            yield MouseButtonDown(pixel=event.pos, tile=event.pos, button=button)
+        else:
+            logger.warning("unhandled mouse button: %r", event)
 
     def _handle_mouse_wheel(self, event: _ansi.MouseWheelInput) -> Iterator[TerminalEvent]:
         if event.button == 0:
@@ -180,5 +288,7 @@ class EventsManager:
             yield WindowEvent(type='WindowFocusGained')
         elif isinstance(event, _ansi.WindowFocusLost):
             yield WindowEvent(type='WindowFocusLost')
+        elif isinstance(event, _ansi.ModeReportInput):
+            self._mode_settings[event.mode] = event.setting
         else:
             logger.warning("unhandled escape input: %r", event)
@@ -0,0 +1,157 @@
+"""
+Writing output to the terminal.
+"""
+
+from typing import Any, BinaryIO, Optional, Tuple
+import io
+import os
+import select
+from ._recording import OutputRecorder
+
+class OutputWriter(io.BufferedIOBase, BinaryIO):
+    """
+    Binary output file for a terminal, which collects what is written in a
+    buffer and sends it with as few system calls as it can.
+
+    Writes between `begin_frame()` and `end_frame()` make up a frame. If
+    `blocking` is false frames are sent only as far as the terminal will take
+    them without waiting, with the rest sent by later calls (`poll()` sends
+    it as the terminal takes it). Then a complete frame (one which draws
+    everything) replaces any earlier frame which is still waiting to be
+    sent, so a slow terminal gets the newest frame rather than a backlog of
+    stale ones.
+
+    Non-blocking mode belongs to the open file, which every descriptor for it
+    shares. So for a terminal the writer opens the terminal again, leaving
+    stdin, stderr and the given file descriptor blocking. Anything else, such
+    as a pipe, has its file descriptor made non-blocking, which affects every
+    other file descriptor sharing it until the writer is closed.
+
+    `flush()` always sends everything written so far, waiting if need be.
+    Closing the writer flushes it and closes any file it opened, or restores
+    the file descriptor's blocking mode, but does not close the file
+    descriptor it was given.
+
+    If `recorder` is set, what is sent to the terminal is recorded to it, so
+    frames which are dropped are left out as they are on the terminal.
+    """
+
+    # pylint: disable=abstract-method
+
+    def __init__(self, fd: int, *, blocking: bool = True):
+        super().__init__()
+        self._fd = fd
+        self._blocking = blocking
+        self._was_blocking = os.get_blocking(fd)
+        self._opened_fd = False
+        if not blocking:
+            if os.isatty(fd):
+                self._fd = os.open(os.ttyname(fd), os.O_WRONLY | os.O_NOCTTY | os.O_NONBLOCK)
+                self._opened_fd = True
+            else:
+                os.set_blocking(fd, False)
+        # Everything not yet sent. The first `_flushed` bytes are ready to
+        # send, and the rest are still being written.
+        self._pending = bytearray()
+        self._flushed = 0
+        self._frame_start: Optional[int] = None
+        # Where in `_pending` the last frame is, if none of it has been sent.
+        self._waiting_frame: Optional[Tuple[int, int]] = None
+        self.bytes_sent = 0
+        """Number of bytes sent to the terminal."""
+        self.write_calls = 0
+        """Number of system calls made to send them."""
+        self.writes_blocked = 0
+        """Number of writes which failed as the terminal wasn't ready."""
+        self.frames_dropped = 0
+        """Number of frames replaced before they were sent."""
+        self.recorder: Optional[OutputRecorder] = None
+
+    @property
+    def backlogged(self) -> bool:
+        """
+        Whether there is output which the terminal has not yet taken.
+        """
+        return self._flushed > 0
+
+    def fileno(self) -> int:
+        return self._fd
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        self._pending += data
+        return len(memoryview(data).cast('B'))
+
+    def begin_frame(self) -> None:
+        """
+        Start a frame. What was written before it is sent along with the
+        frame but is never dropped.
+        """
+        self._frame_start = len(self._pending)
+
+    def end_frame(self, *, complete: bool = False) -> None:
+        """
+        Finish a frame and send as much as possible. If the frame is
+        `complete` it replaces an earlier frame which is still waiting.
+        """
+        start = self._frame_start if self._frame_start is not None else self._flushed
+        end = len(self._pending)
+        if complete and self._waiting_frame is not None:
+            waiting_start, waiting_end = self._waiting_frame
+            del self._pending[waiting_start:waiting_end]
+            start -= waiting_end - waiting_start
+            end -= waiting_end - waiting_start
+            self.frames_dropped += 1
+        self._waiting_frame = (start, end)
+        self._frame_start = None
+        self._flushed = end
+        self._send(wait=self._blocking)
+
+    def poll(self) -> None:
+        """
+        Send any waiting output the terminal will take without waiting.
+        """
+        self._send(wait=False)
+
+    def flush(self) -> None:
+        self._flushed = len(self._pending)
+        self._frame_start = None
+        self._send(wait=True)
+
+    def close(self) -> None:
+        if not self.closed:
+            self.flush()
+            if self._opened_fd:
+                os.close(self._fd)
+            else:
+                os.set_blocking(self._fd, self._was_blocking)
+        super().close()
+
+    def _send(self, *, wait: bool) -> None:
+        sent = 0
+        with memoryview(self._pending) as view:
+            while sent < self._flushed:
+                try:
+                    sent += os.write(self._fd, view[sent:self._flushed])
+                    self.write_calls += 1
+                except BlockingIOError:
+                    self.writes_blocked += 1
+                    if not wait:
+                        break
+                    select.select((), (self._fd,), ())
+            if sent > 0 and self.recorder is not None:
+                self.recorder.record(view[:sent])
+        if sent == 0:
+            return
+        del self._pending[:sent]
+        self._flushed -= sent
+        self.bytes_sent += sent
+        if self._frame_start is not None:
+            self._frame_start -= sent
+        if self._waiting_frame is not None:
+            if sent > self._waiting_frame[0]:
+                self._waiting_frame = None
+            else:
+                self._waiting_frame = (self._waiting_frame[0] - sent, self._waiting_frame[1] - sent)
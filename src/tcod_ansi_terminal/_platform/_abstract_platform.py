@@ -7,15 +7,23 @@ try:
     from typing import Protocol # pylint: disable=ungrouped-imports
 except ImportError:
     from typing_extensions import Protocol # type: ignore
+from .._input_buffer import InputBuffer
 
 class Platform(Protocol):
+    input_buffer: InputBuffer
+
     def open(self) -> None:
         ...
 
     def close(self) -> None:
         ...
 
-    def getch(self, timeout: Optional[float] = None) -> Optional[bytes]:
+    def read_input(self, timeout: Optional[float] = None, output_fd: Optional[int] = None) -> bool:
+        """
+        Wait up to `timeout` seconds for input and add what is available to
+        `input_buffer`, returning whether there was any. If `output_fd` is
+        given, stop waiting as well once it can be written to.
+        """
         ...
 
     def watch_resize(self, callback: Callable[[], None]) -> None:
@@ -8,16 +8,22 @@ import termios
 import tty
 import signal
 import select
+from .._input_buffer import InputBuffer
 
 class UnixPlatform:
     def __init__(self, in_file: BinaryIO):
         self.old_attrs: Optional[List[Union[int, List[Union[bytes, int]]]]] = None
-        # We need an extra pipe here so that we can interrupt any getch() call
+        # We need an extra pipe here so that we can interrupt any read_input() call
         # on a signal.
         self._pipe_r, self._pipe_w = os.pipe()
         os.set_blocking(self._pipe_w, False)
         self.in_file = in_file.fileno()
         signal.set_wakeup_fd(self._pipe_w, warn_on_full_buffer=False)
+        self.input_buffer = InputBuffer()
+        self.select_calls = 0
+        """Number of `select()` calls made waiting for input."""
+        self.read_calls = 0
+        """Number of `read()` calls made to get input."""
 
     def open(self) -> None:
         self.old_attrs = termios.tcgetattr(self.in_file)
@@ -27,13 +33,16 @@ class UnixPlatform:
         if self.old_attrs is not None:
             termios.tcsetattr(self.in_file, termios.TCSADRAIN, self.old_attrs)
 
-    def getch(self, timeout: Optional[float] = None) -> Optional[bytes]:
-        ready, _rw, _rx = select.select((self.in_file, self._pipe_r), (), (), timeout)
+    def read_input(self, timeout: Optional[float] = None, output_fd: Optional[int] = None) -> bool:
+        write_fds = (output_fd,) if output_fd is not None else ()
+        ready, _rw, _rx = select.select((self.in_file, self._pipe_r), write_fds, (), timeout)
+        self.select_calls += 1
         if self._pipe_r in ready:
             os.read(self._pipe_r, 1)
         if self.in_file in ready:
-            return os.read(self.in_file, 1)
-        return None
+            self.read_calls += 1
+            return self.input_buffer.read_from(self.in_file) > 0
+        return False
 
     def watch_resize(self, callback: Callable[[], None]) -> None:
         signal.signal(signal.SIGWINCH, lambda sn, sf: callback())
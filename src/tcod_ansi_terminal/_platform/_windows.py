@@ -6,10 +6,12 @@ TODO: This is totally untested, and doesn't support some things!
 
 from typing import Callable, Optional, BinaryIO
 import msvcrt # pylint: disable=import-error
+from .._input_buffer import InputBuffer
 
 class WindowsPlatform:
     def __init__(self, in_file: BinaryIO):
         self.in_file = in_file
+        self.input_buffer = InputBuffer()
 
     def open(self) -> None:
         pass
@@ -17,9 +19,10 @@ class WindowsPlatform:
     def close(self) -> None:
         pass
 
-    def getch(self, timeout: Optional[float] = None) -> Optional[bytes]:
+    def read_input(self, timeout: Optional[float] = None, output_fd: Optional[int] = None) -> bool:
         # pylint: disable=unused-argument
-        return msvcrt.getch() # type: ignore
+        self.input_buffer.write(msvcrt.getch()) # type: ignore
+        return True
 
     def watch_resize(self, callback: Callable[[], None]) -> None:
         pass
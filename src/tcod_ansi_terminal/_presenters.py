@@ -2,18 +2,26 @@
 Presenters which handle presenting a console on a terminal.
 """
 
-from typing import Any, Callable, Iterable, NamedTuple, Tuple, BinaryIO
+from typing import Any, NamedTuple, Optional, Tuple, BinaryIO
 try:
-    from typing import Protocol # pylint: disable=ungrouped-imports
+    from typing import Literal, Protocol # pylint: disable=ungrouped-imports
 except ImportError:
-    from typing_extensions import Protocol # type: ignore
+    from typing_extensions import Literal, Protocol # type: ignore
 from numpy.typing import NDArray
 import numpy
 from tcod.console import Console
 from ._console_utils import get_console_order
-from ._ansi import escape, make_set_colours_true
+from ._ansi import escape
+from ._colours import pack_colour, pack_colours, Pen
+from ._glyphs import glyphs, find_covered
+from ._screen import ShadowScreen, find_scroll, make_scroll
+from ._bands import BandEncoder
+from ._frame_buffer import FrameBuffer
+from ._encoding import encode_cells, cell_costs, previous_in_rows, \
+    masked_segments, cursor_pos_segments, cursor_pos_lengths, ColourEncoder, ColourMode, \
+    make_colour_encoder, quantize_colour
 
-_PAD_FG = (0, 0, 0, 0)
+_max_bridged_gap = 8
 
 class Presenter(Protocol):
     """
@@ -35,75 +43,205 @@ class _DrawPlan(NamedTuple):
     draw_dim: Tuple[int, int]
     pad_left: int
     pad_top: int
-    buf_get: Callable[[int, int, NDArray[Any]], Any]
+    cells: NDArray[Any]
+
+def _get_rows(buf: NDArray[Any], console: Console) -> NDArray[Any]:
+    """
+    View a console-shaped array indexed by `[y, x]` whatever the console order.
+    """
+    order = get_console_order(console)
+    if order == "F":
+        return buf.T
+    if order == "C":
+        return buf
+    assert False, "unknown console order"
+
+def _fit_last_column(cells: NDArray[Any]) -> NDArray[Any]:
+    """
+    Replace double width glyphs in the last column of 2D cells with spaces,
+    since they would run past the edge of the drawn area, wrapping onto the
+    next row or spilling into the padding. The cells are copied if any are
+    replaced.
+    """
+    wide = glyphs.widths(cells['ch'][:, -1]) == 2
+    if not wide.any():
+        return cells
+    cells = cells.copy()
+    cells['ch'][wide, -1] = ord(' ')
+    return cells
 
 def _get_draw_plan(
     console: Console,
+    rgba: NDArray[Any],
     term_dim: Tuple[int, int],
     align: Tuple[float, float]
 ) -> _DrawPlan:
-    order = get_console_order(console)
-
-    con_dim = console.rgba.shape
-    if order == "F":
-        def buf_get(x: int, y: int, buf: NDArray[Any]) -> Any:
-            return buf[x, y]
-    elif order == "C":
-        con_dim = con_dim[1], con_dim[0]
-        def buf_get(x: int, y: int, buf: NDArray[Any]) -> Any:
-            return buf[y, x]
-    else:
-        assert False, "unknown console order"
+    rows = _get_rows(rgba, console)
+    con_dim = rows.shape[1], rows.shape[0]
 
     draw_dim = (min(con_dim[0], term_dim[0]), min(con_dim[1], term_dim[1]))
     pad_left = int((term_dim[0] - draw_dim[0]) * align[0])
     pad_top = int((term_dim[1] - draw_dim[1]) * align[1])
+    cells = rows[:draw_dim[1], :draw_dim[0]]
+    if draw_dim[0] > 0 and draw_dim[1] > 0:
+        cells = _fit_last_column(cells)
+
+    return _DrawPlan(draw_dim, pad_left, pad_top, cells)
 
-    return _DrawPlan(draw_dim, pad_left, pad_top, buf_get)
+def _pack_written_colours(
+    cells: NDArray[Any],
+    covered: NDArray[numpy.bool_],
+) -> Tuple[NDArray[numpy.int64], NDArray[numpy.int64]]:
+    """
+    Pack the colours of 2D cells, giving cells which are covered by a double
+    width glyph (and so not written) the colours of that glyph.
+    """
+    fg = pack_colours(cells['fg'])
+    bg = pack_colours(cells['bg'])
+    if covered.any():
+        fg[:, 1:] = numpy.where(covered[:, 1:], fg[:, :-1], fg[:, 1:])
+        bg[:, 1:] = numpy.where(covered[:, 1:], bg[:, :-1], bg[:, 1:])
+    return fg, bg
+
+def _get_naive_previous_colours(
+    fg: NDArray[numpy.int64],
+    bg: NDArray[numpy.int64],
+    *,
+    pad_left: int,
+    pad_right: int,
+    pad_bg: Tuple[int, int, int],
+    pen: Pen
+) -> Tuple[NDArray[numpy.int64], NDArray[numpy.int64]]:
+    """
+    Find the packed colours the terminal has just before each cell is written
+    by `_draw_naive()`, given the pen before the first row.
+    """
+    height = fg.shape[0]
+    row_start_fg = numpy.empty(height, dtype=numpy.int64)
+    row_start_fg[0] = pen.fg
+    row_start_fg[1:] = fg[:-1, -1]
+    row_start_bg = numpy.empty(height, dtype=numpy.int64)
+    if pad_left > 0:
+        row_start_bg[:] = pack_colour(pad_bg)
+    else:
+        row_start_bg[0] = pen.bg
+        row_start_bg[1:] = pack_colour(pad_bg) if pad_right > 0 else bg[:-1, -1]
+    return previous_in_rows(fg, row_start_fg), previous_in_rows(bg, row_start_bg)
+
+class _FrameBuffers(NamedTuple):
+    """
+    Buffers kept by a presenter between frames.
+    """
+
+    # The frame, which is written to the output file in one go.
+    frame: FrameBuffer
+    # Encoded cells, which are copied into the frame between padding.
+    cells: FrameBuffer
+
+def _make_frame_buffers() -> _FrameBuffers:
+    return _FrameBuffers(FrameBuffer(), FrameBuffer())
 
 def _draw_naive(
+    buffers: _FrameBuffers,
     *,
-    draw_dim: Tuple[int, int],
+    cells: NDArray[Any],
     pad_left: int,
     pad_right: int,
     pad_top: int,
     pad_bottom: int,
-    pad_bg: Tuple[int, int, int, int],
-    buf_get: Callable[[int, int, NDArray[Any]], Any],
-    console: Console
-) -> Iterable[bytes]:
+    pad_bg: Tuple[int, int, int],
+    encoder: ColourEncoder,
+    band_encoder: Optional[BandEncoder]
+) -> None:
+    # pylint: disable=too-many-locals
+    height, width = cells.shape
+    frame = buffers.frame
+    pen = Pen(encoder.sequences)
     term_y = 1
 
-    yield make_set_colours_true(_PAD_FG, pad_bg)
+    if pad_top > 0:
+        frame.write(pen.set_bg(pad_bg))
     for _ in range(pad_top):
-        yield b"%s[%i;1H" % (escape, term_y)
-        yield b"%s[2K" % (escape)
+        frame.write(b"%s[%i;1H%s[2K" % (escape, term_y, escape))
         term_y += 1
 
-    for con_y in range(draw_dim[1]):
-        yield b"%s[%i;%iH" % (escape, term_y, pad_left + 1)
-        yield make_set_colours_true(_PAD_FG, pad_bg)
-        yield b"%s[1K" % (escape)
-        for con_x in range(draw_dim[0]):
-            c, fg, bg = buf_get(con_x, con_y, console.rgba)
-            yield make_set_colours_true(fg, bg)
-            yield c
+    buffers.cells.clear()
+    if width > 0 and height > 0:
+        covered = find_covered(glyphs.widths(cells['ch']))
+        fg, bg = _pack_written_colours(cells, covered)
+        previous_fg, previous_bg = _get_naive_previous_colours(
+            fg,
+            bg,
+            pad_left=pad_left,
+            pad_right=pad_right,
+            pad_bg=pad_bg,
+            pen=pen
+        )
+        if band_encoder is None:
+            out, cell_ends = encode_cells(
+                cells.reshape(-1),
+                previous_fg.reshape(-1),
+                previous_bg.reshape(-1),
+                encoder,
+                skip=covered.reshape(-1),
+                out=buffers.cells,
+            )
+        else:
+            out, cell_ends = band_encoder.encode_rows(
+                cells,
+                previous_fg,
+                previous_bg,
+                encoder,
+                skip=covered,
+                out=buffers.cells,
+            )
+        row_ends = cell_ends[width - 1::width].tolist()
+    else:
+        out = buffers.cells.reserve(0)
+        row_ends = [0] * height
+
+    row_start = 0
+    for con_y, row_end in enumerate(row_ends):
+        frame.write(b"%s[%i;%iH" % (escape, term_y, pad_left + 1))
+        if pad_left > 0:
+            frame.write(pen.set_bg(pad_bg))
+            frame.write(b"%s[1K" % (escape))
+        frame.write(out[row_start:row_end])
+        if width > 0:
+            pen.fg = int(fg[con_y, -1])
+            pen.bg = int(bg[con_y, -1])
         if pad_right > 0:
-            yield make_set_colours_true(_PAD_FG, pad_bg)
-            yield b"%s[0K" % (escape)
+            frame.write(pen.set_bg(pad_bg))
+            frame.write(b"%s[0K" % (escape))
+        row_start = row_end
         term_y += 1
 
-    yield make_set_colours_true(_PAD_FG, pad_bg)
+    if pad_bottom > 0:
+        frame.write(pen.set_bg(pad_bg))
     for _ in range(pad_bottom):
-        yield b"%s[%i;1H" % (escape, term_y)
-        yield b"%s[2K" % (escape)
+        frame.write(b"%s[%i;1H%s[2K" % (escape, term_y, escape))
         term_y += 1
 
 class NaivePresenter(Presenter):
     """
     Basic presenter which always writes the whole console to the terminal.
+
+    Colours are written as true colour if `colours` is `'true'`, or quantized
+    to the xterm palette if it is `'256'` or `'16'`. If `band_encoder` is
+    given, it is used to encode the console in parallel bands, which helps
+    with very large consoles. These are the same for all presenters.
     """
 
+    def __init__(
+        self,
+        *,
+        colours: ColourMode = 'true',
+        band_encoder: Optional[BandEncoder] = None
+    ) -> None:
+        self._encoder = make_colour_encoder(colours)
+        self._band_encoder = band_encoder
+        self._buffers = _make_frame_buffers()
+
     def present(
         self,
         *,
@@ -113,48 +251,565 @@ class NaivePresenter(Presenter):
         clear_colour: Tuple[int, int, int],
         align: Tuple[float, float]
     ) -> None:
-        # pylint: disable=too-many-locals
+        rgba = self._encoder.quantize_cells(console.rgba)
+        _write_naive(
+            out_file,
+            self._buffers,
+            plan=_get_draw_plan(console, rgba, term_dim, align),
+            term_dim=term_dim,
+            pad_bg=quantize_colour(clear_colour, self._encoder),
+            encoder=self._encoder,
+            band_encoder=self._band_encoder
+        )
 
-        draw_dim, pad_left, pad_top, buf_get = _get_draw_plan(console, term_dim, align)
+def _write_naive(
+    out_file: BinaryIO,
+    buffers: _FrameBuffers,
+    *,
+    plan: _DrawPlan,
+    term_dim: Tuple[int, int],
+    pad_bg: Tuple[int, int, int],
+    encoder: ColourEncoder,
+    band_encoder: Optional[BandEncoder]
+) -> None:
+    draw_dim, pad_left, pad_top, cells = plan
+    buffers.frame.clear()
+    _draw_naive(
+        buffers,
+        cells=cells,
+        pad_left=pad_left,
+        pad_top=pad_top,
+        pad_right=term_dim[0] - draw_dim[0] - pad_left,
+        pad_bottom=term_dim[1] - draw_dim[1] - pad_top,
+        pad_bg=pad_bg,
+        encoder=encoder,
+        band_encoder=band_encoder
+    )
+    out_file.write(buffers.frame.view())
 
-        out_file.write(b''.join(_draw_naive(
-            draw_dim=draw_dim,
-            pad_left=pad_left,
-            pad_top=pad_top,
-            pad_right=term_dim[0] - draw_dim[0] - pad_left,
-            pad_bottom=term_dim[1] - draw_dim[1] - pad_top,
-            pad_bg=clear_colour + (0,),
-            buf_get=buf_get,
-            console=console
-        )))
+def _fill_screen(
+    screen: NDArray[Any],
+    *,
+    plan: _DrawPlan,
+    pad_bg: Tuple[int, int, int],
+    encoder: ColourEncoder
+) -> _DrawPlan:
+    """
+    Fill a screen with a frame, with the console cells (with colours
+    quantized) placed within the padding. Returns the draw plan for the cells
+    as placed in the screen.
+
+    Padding cells are spaces with both colours set to the padding colour.
+    """
+    draw_dim, pad_left, pad_top, cells = plan
+    bottom = pad_top + draw_dim[1]
+    right = pad_left + draw_dim[0]
+    for padding in (
+        screen[:pad_top],
+        screen[bottom:],
+        screen[pad_top:bottom, :pad_left],
+        screen[pad_top:bottom, right:],
+    ):
+        padding['ch'] = ord(' ')
+        padding['fg'] = (*pad_bg, 255)
+        padding['bg'] = (*pad_bg, 255)
+    placed = encoder.quantize_cells(cells, out=screen[pad_top:bottom, pad_left:right])
+    return _DrawPlan(draw_dim, pad_left, pad_top, placed)
+
+def _prepare_shadow(
+    shadow: Optional[ShadowScreen],
+    *,
+    console: Console,
+    term_dim: Tuple[int, int],
+    align: Tuple[float, float],
+    pad_bg: Tuple[int, int, int],
+    encoder: ColourEncoder
+) -> Tuple[ShadowScreen, _DrawPlan]:
+    """
+    Get a shadow screen ready for a frame, with the next frame filled in and
+    hashed. This is a new one, with nothing known of what is on the
+    terminal, if `shadow` is `None` or the terminal has been resized.
+    """
+    # Terminals differ in what they keep when resized, with some reflowing
+    # their contents, so nothing is assumed to be kept.
+    if shadow is None or shadow.dim != term_dim:
+        shadow = ShadowScreen(term_dim, console.rgba.dtype)
+    plan = _fill_screen(
+        shadow.next,
+        plan=_get_draw_plan(console, console.rgba, term_dim, align),
+        pad_bg=pad_bg,
+        encoder=encoder
+    )
+    shadow.hash_next()
+    return shadow, plan
+
+def _scroll_shadow(
+    shadow: ShadowScreen,
+    pad_bg: Tuple[int, int, int],
+    encoder: ColourEncoder
+) -> bytes:
+    """
+    Scroll the terminal if that gets it closer to the next frame, returning
+    the sequences to do so and updating the shadow screen to match.
+
+    Rows scrolled into view are blanked to the padding colour on terminals
+    which erase in the current background colour, but others use the
+    default colour, so they are left unknown to be written in full.
+    """
+    scroll = find_scroll(shadow.next_hashes, shadow.hashes)
+    if scroll is None:
+        return b""
+    shadow.scroll(scroll)
+    return make_scroll(scroll, encoder.sequences.bg(pack_colour(pad_bg)))
+
+def _bridge_gaps(
+    *,
+    cells: NDArray[Any],
+    changed: NDArray[numpy.intp],
+    pad_left: int,
+    pad_top: int,
+    encoder: ColourEncoder
+) -> NDArray[numpy.intp]:
+    """
+    Add unchanged cells in short gaps between changed cells on the same row,
+    where rewriting them is cheaper than moving the cursor past them.
+
+    Cells are given as sorted flat indices into `cells`.
+    """
+    # pylint: disable=too-many-locals
+    width = cells.shape[1]
+    ys, xs = numpy.divmod(changed, width)
+    gaps = xs[1:] - xs[:-1] - 1
+    candidates = numpy.flatnonzero(
+        (ys[1:] == ys[:-1]) & (gaps > 0) & (gaps <= _max_bridged_gap)
+    )
+    if len(candidates) == 0:
+        return changed
+    after = candidates + 1
+
+    # Bridging writes each gap cell and then the next changed cell, each just
+    # after its left neighbour.
+    run_lens = gaps[candidates] + 1
+    run_ids = numpy.repeat(numpy.arange(len(candidates)), run_lens)
+    run_starts = numpy.cumsum(run_lens) - run_lens
+    run_xs = xs[candidates][run_ids] + 1 + numpy.arange(len(run_ids)) - run_starts[run_ids]
+    run_ys = ys[candidates][run_ids]
+    left_cells = cells[run_ys, run_xs - 1]
+    run_costs = cell_costs(
+        cells[run_ys, run_xs],
+        pack_colours(left_cells['fg']),
+        pack_colours(left_cells['bg']),
+        encoder,
+    )
+    bridge_costs = numpy.add.reduceat(run_costs, run_starts)
+
+    # Jumping moves the cursor and then writes the next changed cell after the last one.
+    last_cells = cells[ys[candidates], xs[candidates]]
+    jump_costs = cursor_pos_lengths(xs[after] + pad_left + 1, ys[after] + pad_top + 1) \
+        + cell_costs(
+            cells[ys[after], xs[after]],
+            pack_colours(last_cells['fg']),
+            pack_colours(last_cells['bg']),
+            encoder,
+        )
+
+    bridged = numpy.repeat(bridge_costs < jump_costs, run_lens) \
+        & (run_xs < xs[after][run_ids])
+    return numpy.sort(numpy.concatenate((changed, run_ys[bridged] * width + run_xs[bridged])))
+
+class _SpanPlan(NamedTuple):
+    cells: NDArray[Any]
+    xs: NDArray[numpy.intp]
+    ys: NDArray[numpy.intp]
+    span_starts: NDArray[numpy.bool_]
+    previous_fg: NDArray[numpy.int64]
+    previous_bg: NDArray[numpy.int64]
+
+def _plan_spans(
+    *,
+    cells: NDArray[Any],
+    to_draw: NDArray[numpy.intp],
+    covered: NDArray[numpy.bool_],
+    pad_left: int,
+    pad_top: int
+) -> _SpanPlan:
+    """
+    Plan writing cells, given as sorted flat indices into `cells`, in spans.
+
+    Cells which are covered by a double width glyph are left out. Positions in
+    the plan are terminal positions (1-based).
+    """
+    to_draw = to_draw[~covered.reshape(-1)[to_draw]]
+    ys, xs = numpy.divmod(to_draw, cells.shape[1])
+    to_draw_cells = cells[ys, xs]
+
+    # A span continues wherever the cursor is left by the previous glyph.
+    widths = glyphs.widths(to_draw_cells['ch'])
+    span_starts = numpy.ones(len(to_draw), dtype=numpy.bool_)
+    span_starts[1:] = (to_draw[1:] != to_draw[:-1] + widths[:-1]) | (xs[1:] == 0)
+
+    fg = pack_colours(to_draw_cells['fg'])
+    bg = pack_colours(to_draw_cells['bg'])
+
+    return _SpanPlan(
+        cells=to_draw_cells,
+        xs=xs + pad_left + 1,
+        ys=ys + pad_top + 1,
+        span_starts=span_starts,
+        previous_fg=numpy.concatenate(([-1], fg[:-1])),
+        previous_bg=numpy.concatenate(([-1], bg[:-1])),
+    )
+
+def _span_costs(plan: _SpanPlan, encoder: ColourEncoder) -> NDArray[numpy.intp]:
+    """
+    Estimated number of bytes to write each cell in a span plan.
+    """
+    costs = cell_costs(plan.cells, plan.previous_fg, plan.previous_bg, encoder)
+    costs[plan.span_starts] += cursor_pos_lengths(
+        plan.xs[plan.span_starts],
+        plan.ys[plan.span_starts],
+    )
+    return costs
+
+def _draw_spans(frame: FrameBuffer, plan: _SpanPlan, encoder: ColourEncoder) -> None:
+    if len(plan.cells) == 0:
+        return
+    encode_cells(
+        plan.cells,
+        plan.previous_fg,
+        plan.previous_bg,
+        encoder,
+        prefix=masked_segments(cursor_pos_segments(plan.xs, plan.ys), plan.span_starts),
+        out=frame,
+    )
+
+def _find_changes(
+    *,
+    cells: NDArray[Any],
+    last_cells: NDArray[Any],
+    rows: NDArray[numpy.intp],
+    pad_left: int,
+    pad_top: int,
+    encoder: ColourEncoder
+) -> Tuple[NDArray[numpy.intp], NDArray[numpy.bool_]]:
+    """
+    Find changed cells as sorted flat indices into `cells`, including bridged
+    gaps, and which cells are covered by double width glyphs.
+
+    Only the sorted `rows` are compared, and only for them is it found which
+    cells are covered. Cells are also changed if whether they are covered has
+    changed.
+    """
+    covered = numpy.zeros(cells.shape, dtype=numpy.bool_)
+    row_cells = cells[rows]
+    last_row_cells = last_cells[rows]
+    row_covered = find_covered(glyphs.widths(row_cells['ch']))
+    covered[rows] = row_covered
+    changed = (row_cells != last_row_cells) \
+        | (row_covered != find_covered(glyphs.widths(last_row_cells['ch'])))
+    ys, xs = numpy.nonzero(changed & ~row_covered)
+    to_draw = rows[ys] * cells.shape[1] + xs
+    if len(to_draw) == 0 or cells.shape[1] == 0:
+        return to_draw, covered
+    return _bridge_gaps(
+        cells=cells,
+        changed=to_draw,
+        pad_left=pad_left,
+        pad_top=pad_top,
+        encoder=encoder
+    ), covered
 
 def _draw_sparse_changes(
+    frame: FrameBuffer,
     *,
-    draw_dim: Tuple[int, int],
+    cells: NDArray[Any],
+    last_cells: NDArray[Any],
+    rows: NDArray[numpy.intp],
     pad_left: int,
     pad_top: int,
-    buf_get: Callable[[int, int, NDArray[Any]], Any],
-    to_draw: NDArray[Any],
-    console: Console
-) -> Iterable[bytes]:
-    for con_x, con_y in numpy.ndindex(draw_dim):
-        if buf_get(con_x, con_y, to_draw):
-            yield b"%s[%i;%iH" % (escape, con_y + pad_top, con_x + pad_left)
-            c, fg, bg = buf_get(con_x, con_y, console.rgba)
-            yield make_set_colours_true(fg, bg)
-            yield c
+    encoder: ColourEncoder
+) -> None:
+    if len(rows) == 0:
+        return
+    to_draw, covered = _find_changes(
+        cells=cells,
+        last_cells=last_cells,
+        rows=rows,
+        pad_left=pad_left,
+        pad_top=pad_top,
+        encoder=encoder
+    )
+    _draw_spans(frame, _plan_spans(
+        cells=cells,
+        to_draw=to_draw,
+        covered=covered,
+        pad_left=pad_left,
+        pad_top=pad_top,
+    ), encoder)
 
 class SparsePresenter:
     """
     Presenter which finds differences between frames and only writes the changes to the terminal.
 
+    Changed cells are grouped into horizontal spans which are each written
+    after a single cursor move. Short gaps of unchanged cells between changes
+    are rewritten when that is cheaper than moving the cursor past them.
+
+    Differences are found against a shadow of what is on the terminal, in
+    screen coordinates, so resizing the console, changing the alignment or
+    changing the clear colour only writes the cells which actually look
+    different. Terminals differ in what they keep when they are resized, so
+    after a terminal resize the frame is written in full. Rows are compared
+    by hash first, so unchanged rows cost very little. Use `invalidate()` if
+    something else has changed the terminal, so that the next frame is
+    written in full.
+
+    If `scrolling` is true, bands of rows which have moved up or down are
+    found and moved by scrolling the terminal, so that only the rows which
+    scroll into view need to be written.
+
     May be faster than the naive presenter if you are usually updating only
     small parts of the console. Needs to be reused between `present()` calls.
     """
 
-    def __init__(self) -> None:
-        self._last_buffer = numpy.full(fill_value=0, shape=(0, 0))
-        self._fallback = NaivePresenter()
+    def __init__(
+        self,
+        *,
+        colours: ColourMode = 'true',
+        scrolling: bool = True,
+        band_encoder: Optional[BandEncoder] = None
+    ) -> None:
+        self._encoder = make_colour_encoder(colours)
+        self._band_encoder = band_encoder
+        self._scrolling = scrolling
+        self._shadow: Optional[ShadowScreen] = None
+        self._buffers = _make_frame_buffers()
+
+    def invalidate(self) -> None:
+        """
+        Forget what is on the terminal, so that the next frame is written in full.
+        """
+        self._shadow = None
+
+    def present(
+        self,
+        *,
+        console: Console,
+        term_dim: Tuple[int, int],
+        out_file: BinaryIO,
+        clear_colour: Tuple[int, int, int],
+        align: Tuple[float, float]
+    ) -> None:
+        pad_bg = quantize_colour(clear_colour, self._encoder)
+        shadow, plan = _prepare_shadow(
+            self._shadow,
+            console=console,
+            term_dim=term_dim,
+            align=align,
+            pad_bg=pad_bg,
+            encoder=self._encoder
+        )
+
+        # A new shadow knows nothing of the terminal, so draw everything.
+        if shadow is not self._shadow:
+            _write_naive(
+                out_file,
+                self._buffers,
+                plan=plan,
+                term_dim=term_dim,
+                pad_bg=pad_bg,
+                encoder=self._encoder,
+                band_encoder=self._band_encoder
+            )
+            shadow.commit()
+
+        else:
+            frame = self._buffers.frame
+            frame.clear()
+            if self._scrolling:
+                frame.write(_scroll_shadow(shadow, pad_bg, self._encoder))
+            rows = shadow.changed_rows()
+            _draw_sparse_changes(
+                frame,
+                cells=shadow.next,
+                last_cells=shadow.cells,
+                rows=rows,
+                pad_left=0,
+                pad_top=0,
+                encoder=self._encoder
+            )
+            out_file.write(frame.view())
+            shadow.commit(rows)
+
+        self._shadow = shadow
+
+class PresentChoice(NamedTuple):
+    """
+    What an `AdaptivePresenter` chose to do for a frame.
+
+    `strategy` is `'full'` if the whole console was written and `'diff'` if
+    only changes were written. For a diff, `full_rows` is the number of rows
+    which were nonetheless written in full. The costs are the estimated
+    numbers of bytes for each strategy, or `None` if not estimated.
+    """
+
+    strategy: Literal['full', 'diff']
+    full_rows: int
+    full_cost: Optional[int]
+    diff_cost: Optional[int]
+
+def _estimate_full_cost(
+    *,
+    cells: NDArray[Any],
+    pad_left: int,
+    pad_top: int,
+    term_dim: Tuple[int, int],
+    pad_bg: Tuple[int, int, int],
+    encoder: ColourEncoder
+) -> int:
+    """
+    Estimated number of bytes for `_draw_naive()` to write a frame.
+    """
+    # pylint: disable=too-many-locals
+    height, width = cells.shape
+    pad_right = term_dim[0] - width - pad_left
+    num_padded_rows = term_dim[1] - height
+    set_pad_cost = len(encoder.sequences.bg(pack_colour(pad_bg)))
+    # Padding rows cost a cursor move and an erase each, plus setting the colour.
+    cost: int = 12 * num_padded_rows + (set_pad_cost if num_padded_rows > 0 else 0)
+    if width > 0 and height > 0:
+        fg = pack_colours(cells['fg'])
+        bg = pack_colours(cells['bg'])
+        pen = Pen(encoder.sequences)
+        if pad_top > 0:
+            pen.bg = pack_colour(pad_bg)
+        previous_fg, previous_bg = _get_naive_previous_colours(
+            fg,
+            bg,
+            pad_left=pad_left,
+            pad_right=pad_right,
+            pad_bg=pad_bg,
+            pen=pen
+        )
+        cost += int(cell_costs(cells, previous_fg, previous_bg, encoder).sum())
+        cost += int(cursor_pos_lengths(
+            numpy.full(height, pad_left + 1),
+            numpy.arange(height) + pad_top + 1,
+        ).sum())
+        # Padding within rows costs an erase and at most one colour change per side.
+        if pad_left > 0:
+            cost += height * (4 + set_pad_cost)
+        if pad_right > 0:
+            cost += height * (4 + set_pad_cost)
+    return cost
+
+def _estimate_full_row_costs(
+    *,
+    cells: NDArray[Any],
+    pad_left: int,
+    pad_top: int,
+    encoder: ColourEncoder,
+    rows: Optional[NDArray[numpy.intp]] = None
+) -> NDArray[numpy.intp]:
+    if rows is None:
+        rows = numpy.arange(cells.shape[0])
+    row_cells = cells[rows]
+    unknown = numpy.full(len(rows), -1, dtype=numpy.int64)
+    costs = cell_costs(
+        row_cells,
+        previous_in_rows(pack_colours(row_cells['fg']), unknown),
+        previous_in_rows(pack_colours(row_cells['bg']), unknown),
+        encoder,
+    )
+    row_costs: NDArray[numpy.intp] = costs.sum(axis=1) + cursor_pos_lengths(
+        numpy.full(len(rows), pad_left + 1),
+        rows + pad_top + 1,
+    )
+    return row_costs
+
+def _promote_full_rows(
+    *,
+    cells: NDArray[Any],
+    to_draw: NDArray[numpy.intp],
+    covered: NDArray[numpy.bool_],
+    plan: _SpanPlan,
+    costs: NDArray[numpy.intp],
+    pad_left: int,
+    pad_top: int,
+    encoder: ColourEncoder
+) -> Tuple[_SpanPlan, int]:
+    """
+    Change a span plan to write rows in full where that is estimated to be
+    cheaper than writing just their changes.
+    """
+    if len(to_draw) == 0:
+        return plan, 0
+    height, width = cells.shape
+    diff_row_costs = numpy.bincount(plan.ys - pad_top - 1, weights=costs, minlength=height)
+    rows = numpy.flatnonzero(diff_row_costs)
+    full_row_costs = _estimate_full_row_costs(
+        cells=cells,
+        pad_left=pad_left,
+        pad_top=pad_top,
+        encoder=encoder,
+        rows=rows
+    )
+    full_rows = rows[full_row_costs < diff_row_costs[rows]]
+    if len(full_rows) == 0:
+        return plan, 0
+    in_full_rows = numpy.isin(to_draw // width, full_rows)
+    to_draw = numpy.sort(numpy.concatenate((
+        to_draw[~in_full_rows],
+        (full_rows[:, None] * width + numpy.arange(width)).reshape(-1),
+    )))
+    plan = _plan_spans(
+        cells=cells,
+        to_draw=to_draw,
+        covered=covered,
+        pad_left=pad_left,
+        pad_top=pad_top
+    )
+    return plan, len(full_rows)
+
+class AdaptivePresenter:
+    """
+    Presenter which chooses between writing the whole console and writing
+    only changes, whichever is estimated to produce less output.
+
+    With `granularity` of `'frame'` the choice is made for each frame, between
+    what `NaivePresenter` and `SparsePresenter` would write. With `'row'` only
+    changes are written, but changed rows are written in full where that is
+    estimated to be cheaper than writing their changes.
+
+    Like `SparsePresenter`, changes are found against a shadow of what is on
+    the terminal, `invalidate()` makes the next frame be written in full, and
+    `scrolling` enables scrolling bands of rows which have moved.
+
+    `last_choice` gives what was chosen for the last frame, which is useful
+    for tuning. Needs to be reused between `present()` calls.
+    """
+
+    def __init__(
+        self,
+        *,
+        granularity: Literal['frame', 'row'] = 'row',
+        colours: ColourMode = 'true',
+        scrolling: bool = True,
+        band_encoder: Optional[BandEncoder] = None
+    ) -> None:
+        self._granularity = granularity
+        self._encoder = make_colour_encoder(colours)
+        self._band_encoder = band_encoder
+        self._scrolling = scrolling
+        self._shadow: Optional[ShadowScreen] = None
+        self._buffers = _make_frame_buffers()
+        self.last_choice: Optional[PresentChoice] = None
+
+    def invalidate(self) -> None:
+        """
+        Forget what is on the terminal, so that the next frame is written in full.
+        """
+        self._shadow = None
 
     def present(
         self,
@@ -167,25 +822,114 @@ class SparsePresenter:
     ) -> None:
         # pylint: disable=too-many-locals
 
-        if console.rgba.shape != self._last_buffer.shape:
-            self._fallback.present(
-                console=console,
+        pad_bg = quantize_colour(clear_colour, self._encoder)
+        shadow, draw_plan = _prepare_shadow(
+            self._shadow,
+            console=console,
+            term_dim=term_dim,
+            align=align,
+            pad_bg=pad_bg,
+            encoder=self._encoder
+        )
+
+        # A new shadow knows nothing of the terminal, so draw everything.
+        if shadow is not self._shadow:
+            _write_naive(
+                out_file,
+                self._buffers,
+                plan=draw_plan,
                 term_dim=term_dim,
-                out_file=out_file,
-                clear_colour=clear_colour,
-                align=align
+                pad_bg=pad_bg,
+                encoder=self._encoder,
+                band_encoder=self._band_encoder
             )
+            shadow.commit()
+            self.last_choice = PresentChoice('full', 0, None, None)
 
         else:
-            draw_dim, pad_left, pad_top, buf_get = _get_draw_plan(console, term_dim, align)
-            diff = console.rgba != self._last_buffer
-            out_file.write(b''.join(_draw_sparse_changes(
-                draw_dim=draw_dim,
-                pad_left=pad_left + 1,
-                pad_top=pad_top + 1,
-                buf_get=buf_get,
-                to_draw=diff,
-                console=console
-            )))
-
-        self._last_buffer = numpy.copy(console.rgba)
+            scroll = b""
+            if self._scrolling:
+                scroll = _scroll_shadow(shadow, pad_bg, self._encoder)
+            rows = shadow.changed_rows()
+            if len(rows) == 0:
+                out_file.write(scroll)
+                self.last_choice = PresentChoice('diff', 0, None, len(scroll))
+                self._shadow = shadow
+                return
+            to_draw, covered = _find_changes(
+                cells=shadow.next,
+                last_cells=shadow.cells,
+                rows=rows,
+                pad_left=0,
+                pad_top=0,
+                encoder=self._encoder
+            )
+            plan = _plan_spans(
+                cells=shadow.next,
+                to_draw=to_draw,
+                covered=covered,
+                pad_left=0,
+                pad_top=0
+            )
+            costs = _span_costs(plan, self._encoder)
+
+            if self._granularity == 'row':
+                plan, num_full_rows = _promote_full_rows(
+                    cells=shadow.next,
+                    to_draw=to_draw,
+                    covered=covered,
+                    plan=plan,
+                    costs=costs,
+                    pad_left=0,
+                    pad_top=0,
+                    encoder=self._encoder
+                )
+                self._write_spans(out_file, scroll, plan)
+                shadow.commit(rows)
+                self.last_choice = PresentChoice(
+                    'diff',
+                    num_full_rows,
+                    None,
+                    len(scroll) + int(_span_costs(plan, self._encoder).sum())
+                )
+
+            else:
+                diff_cost = len(scroll) + int(costs.sum())
+                # Every cell costs at least a byte, so don't estimate the full
+                # cost if the diff is already cheaper than that.
+                full_cost = None
+                if diff_cost >= draw_plan.draw_dim[0] * draw_plan.draw_dim[1]:
+                    full_cost = _estimate_full_cost(
+                        cells=draw_plan.cells,
+                        pad_left=draw_plan.pad_left,
+                        pad_top=draw_plan.pad_top,
+                        term_dim=term_dim,
+                        pad_bg=pad_bg,
+                        encoder=self._encoder
+                    )
+                # Prefer a full redraw on ties since it writes padding more simply.
+                if full_cost is not None and full_cost <= diff_cost:
+                    _write_naive(
+                        out_file,
+                        self._buffers,
+                        plan=draw_plan,
+                        term_dim=term_dim,
+                        pad_bg=pad_bg,
+                        encoder=self._encoder,
+                        band_encoder=self._band_encoder
+                    )
+                    shadow.commit()
+                    self.last_choice = PresentChoice('full', 0, full_cost, diff_cost)
+                else:
+                    self._write_spans(out_file, scroll, plan)
+                    shadow.commit(rows)
+                    self.last_choice = PresentChoice('diff', 0, full_cost, diff_cost)
+
+        self._shadow = shadow
+
+    def _write_spans(self, out_file: BinaryIO, scroll: bytes, plan: _SpanPlan) -> None:
+        frame = self._buffers.frame
+        frame.clear()
+        frame.write(scroll)
+        _draw_spans(frame, plan, self._encoder)
+        out_file.write(frame.view())
@@ -0,0 +1,112 @@
+"""
+Recording what is sent to the terminal, to replay later.
+"""
+
+from typing import Any, Iterator, NamedTuple, Optional, Tuple, Union
+import gzip
+import os
+import queue
+import struct
+import threading
+import time
+
+# Start of every recording file, including the format version.
+_magic = b"TCODREC\x01"
+
+# Header of each chunk: seconds since recording started, and length.
+_chunk_header = struct.Struct("<dI")
+
+class RecordedChunk(NamedTuple):
+    """
+    Output sent to the terminal in one go.
+    """
+
+    time: float
+    """Seconds from the start of the recording."""
+    data: bytes
+
+class OutputRecorder:
+    """
+    Recorder for the output sent to a terminal, which streams each chunk
+    sent with a timestamp to a gzip compressed file at `path`.
+
+    Chunks are compressed and written by a background thread, so recording
+    costs the caller only a copy of each chunk. An exception raised while
+    writing is raised again by the next call to `record()` or `close()`.
+    Read recordings back with `read_recording()`.
+    """
+
+    def __init__(self, path: Union[str, "os.PathLike[str]"], *, compress_level: int = 1) -> None:
+        self._file = gzip.open(path, 'wb', compresslevel=compress_level)
+        self._file.write(_magic)
+        self._start = time.perf_counter()
+        self._queue: "queue.SimpleQueue[Optional[Tuple[float, bytes]]]" = queue.SimpleQueue()
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        self.chunks_recorded = 0
+        """Number of chunks recorded."""
+        self.bytes_recorded = 0
+        """Number of bytes recorded, before compression."""
+        self._thread = threading.Thread(target=self._run, name="record", daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> "OutputRecorder":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def record(self, data: Any) -> None:
+        """
+        Record a chunk of output, from any bytes-like object, as sent now.
+        """
+        self._raise_error()
+        chunk = bytes(data)
+        self._queue.put((time.perf_counter() - self._start, chunk))
+        self.chunks_recorded += 1
+        self.bytes_recorded += len(chunk)
+
+    def close(self) -> None:
+        """
+        Write out any chunks still waiting and close the file.
+        """
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+            self._file.close()
+        self._raise_error()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            error = self._error
+            self._error = None
+            raise error
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error is not None:
+                continue
+            timestamp, chunk = item
+            try:
+                self._file.write(_chunk_header.pack(timestamp, len(chunk)))
+                self._file.write(chunk)
+            except Exception as error: # pylint: disable=broad-exception-caught
+                self._error = error
+
+def read_recording(path: Union[str, "os.PathLike[str]"]) -> Iterator[RecordedChunk]:
+    """
+    Read the chunks of a recording made by `OutputRecorder`, in order.
+    """
+    with gzip.open(path, 'rb') as in_file:
+        if in_file.read(len(_magic)) != _magic:
+            raise ValueError(f"not an output recording: {path}")
+        while True:
+            header = in_file.read(_chunk_header.size)
+            if len(header) < _chunk_header.size:
+                return
+            timestamp, size = _chunk_header.unpack(header)
+            yield RecordedChunk(timestamp, in_file.read(size))
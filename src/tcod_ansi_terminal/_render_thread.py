@@ -0,0 +1,115 @@
+"""
+Presenting frames from a background thread.
+"""
+
+from typing import Callable, Deque, Generic, Optional, TypeVar
+import collections
+import threading
+import time
+
+F = TypeVar("F")
+
+# Frames kept for reuse once the thread is done with them.
+_num_spare_frames = 2
+
+class RenderThread(Generic[F]):
+    """
+    Thread which presents frames with `present`, so that encoding and writing
+    them overlaps with whatever the caller does next.
+
+    Frames are handed over through a single slot, so if frames arrive while
+    the thread is still busy only the newest is presented. Frames the thread
+    is done with can be taken back with `reclaim()` to reuse their buffers.
+    An exception raised while presenting is raised again by the next call
+    to `submit()`, `wait()` or `close()`.
+
+    Frames are presented at most once every `min_interval` seconds, so that
+    frames arriving within an interval are coalesced into the newest.
+    """
+
+    def __init__(self, present: Callable[[F], None], *, min_interval: float = 0.0) -> None:
+        self._present = present
+        self.min_interval = min_interval
+        self._last_start = -float('inf')
+        self._cond = threading.Condition()
+        self._next: Optional[F] = None
+        self._busy = False
+        self._closing = False
+        self._error: Optional[BaseException] = None
+        self._spare: Deque[F] = collections.deque(maxlen=_num_spare_frames)
+        self.frames_presented = 0
+        """Number of frames presented."""
+        self.frames_replaced = 0
+        """Number of frames replaced by newer ones before being presented."""
+        self._thread = threading.Thread(target=self._run, name="present", daemon=True)
+        self._thread.start()
+
+    def submit(self, frame: F) -> None:
+        """
+        Hand over a frame to present, replacing any frame still waiting.
+        """
+        with self._cond:
+            self._raise_error()
+            if self._next is not None:
+                self._spare.append(self._next)
+                self.frames_replaced += 1
+            self._next = frame
+            self._cond.notify_all()
+
+    def reclaim(self) -> Optional[F]:
+        """
+        Take back a frame which is no longer needed, if there is one.
+        """
+        try:
+            return self._spare.popleft()
+        except IndexError:
+            return None
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until all frames handed over have been presented, returning
+        false if `timeout` (in seconds) ran out first.
+        """
+        with self._cond:
+            done = self._cond.wait_for(lambda: self._next is None and not self._busy, timeout)
+            self._raise_error()
+            return done
+
+    def close(self) -> None:
+        """
+        Present any frame still waiting and stop the thread.
+        """
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join()
+        with self._cond:
+            self._raise_error()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._next is not None or self._closing)
+                delay = self._last_start + self.min_interval - time.monotonic()
+                if delay > 0:
+                    self._cond.wait_for(lambda: self._closing, delay)
+                frame, self._next = self._next, None
+                if frame is None:
+                    return
+                self._busy = True
+            self._last_start = time.monotonic()
+            try:
+                self._present(frame)
+            except BaseException as error: # pylint: disable=broad-exception-caught
+                with self._cond:
+                    self._error = error
+            self._spare.append(frame)
+            with self._cond:
+                self.frames_presented += 1
+                self._busy = False
+                self._cond.notify_all()
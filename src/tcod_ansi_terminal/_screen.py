@@ -0,0 +1,185 @@
+"""
+Shadow model of what is on the terminal, in screen coordinates.
+
+Screens are arrays of console cells indexed by `[y, x]` covering the whole
+terminal, including any padding around the console.
+"""
+
+from typing import Any, NamedTuple, Optional, Tuple
+import functools
+from numpy.typing import NDArray
+import numpy
+from ._ansi import make_set_scroll_region, make_reset_scroll_region, make_scroll_up, \
+    make_scroll_down
+
+# Glyph for cells whose contents are not known, which never matches a console cell.
+unknown_glyph = -1
+
+@functools.lru_cache(maxsize=8)
+def _hash_weights(num: int) -> NDArray[numpy.uint64]:
+    rng = numpy.random.default_rng(0)
+    weights = rng.integers(0, 2**63, num, dtype=numpy.uint64)
+    weights |= numpy.uint64(1)
+    return weights
+
+def hash_rows(screen: NDArray[Any]) -> NDArray[numpy.uint64]:
+    """
+    Hash the contents of each row of a C-contiguous screen.
+
+    Rows are hashed as a weighted sum of their words with random odd weights,
+    so changing any single word always changes the hash.
+    """
+    row_bytes = screen.shape[1] * screen.dtype.itemsize
+    rows = screen.view(numpy.uint8).reshape(screen.shape[0], row_bytes)
+    if rows.shape[1] % 4 == 0:
+        rows = rows.view(numpy.uint32)
+    hashes: NDArray[numpy.uint64] = numpy.dot(rows, _hash_weights(rows.shape[1]))
+    return hashes
+
+class Scroll(NamedTuple):
+    """
+    Rows `top` to `bottom` (exclusive) of a new screen which are rows
+    `top + shift` to `bottom + shift` of the last one.
+    """
+
+    top: int
+    bottom: int
+    shift: int
+
+    @property
+    def region(self) -> Tuple[int, int]:
+        """
+        Rows (top inclusive, bottom exclusive) to scroll.
+        """
+        if self.shift > 0:
+            return self.top, self.bottom + self.shift
+        return self.top + self.shift, self.bottom
+
+    @property
+    def exposed(self) -> Tuple[int, int]:
+        """
+        Rows (top inclusive, bottom exclusive) which are blanked by scrolling.
+        """
+        if self.shift > 0:
+            return self.bottom, self.bottom + self.shift
+        return self.top + self.shift, self.top
+
+def _find_shift(hashes: NDArray[numpy.uint64], last_hashes: NDArray[numpy.uint64]) -> int:
+    """
+    Find the most common shift of rows from their position on the last screen,
+    using rows which have changed and appear exactly once on the last screen.
+    """
+    order = numpy.argsort(last_hashes, kind='stable')
+    sorted_hashes = last_hashes[order]
+    starts = numpy.searchsorted(sorted_hashes, hashes, side='left')
+    ends = numpy.searchsorted(sorted_hashes, hashes, side='right')
+    moved = (ends - starts == 1) & (hashes != last_hashes)
+    if not moved.any():
+        return 0
+    shifts = order[starts[moved]] - numpy.flatnonzero(moved)
+    values, counts = numpy.unique(shifts, return_counts=True)
+    return int(values[numpy.argmax(counts)])
+
+def find_scroll(
+    hashes: NDArray[numpy.uint64],
+    last_hashes: NDArray[numpy.uint64],
+) -> Optional[Scroll]:
+    """
+    Find a band of rows which has moved vertically from the last screen,
+    given the row hashes of both, if scrolling it is worth it.
+
+    Scrolling is worth it if it puts more rows in place than it blanks rows
+    which were already in place.
+    """
+    height = len(hashes)
+    shift = _find_shift(hashes, last_hashes)
+    if shift == 0:
+        return None
+    ys = numpy.arange(max(0, -shift), min(height, height - shift))
+    matches = numpy.zeros(height + 2, dtype=numpy.bool_)
+    matches[ys + 1] = hashes[ys] == last_hashes[ys + shift]
+    # Take the longest run of rows which match after the shift.
+    edges = numpy.flatnonzero(numpy.diff(matches.astype(numpy.int8)))
+    run_starts, run_ends = edges[::2], edges[1::2]
+    longest = numpy.argmax(run_ends - run_starts)
+    scroll = Scroll(int(run_starts[longest]), int(run_ends[longest]), shift)
+
+    in_place = hashes == last_hashes
+    fixed = numpy.count_nonzero(~in_place[scroll.top:scroll.bottom])
+    broken = numpy.count_nonzero(in_place[slice(*scroll.exposed)])
+    if fixed <= broken:
+        return None
+    return scroll
+
+def make_scroll(scroll: Scroll, set_blank_bg: bytes) -> bytes:
+    """
+    Sequences to scroll the terminal, blanking rows after `set_blank_bg`
+    sets the background colour. This leaves the cursor position and
+    foreground colour unknown.
+    """
+    top, bottom = scroll.region
+    if scroll.shift > 0:
+        move = make_scroll_up(scroll.shift)
+    else:
+        move = make_scroll_down(-scroll.shift)
+    return set_blank_bg + make_set_scroll_region(top + 1, bottom) + move \
+        + make_reset_scroll_region()
+
+class ShadowScreen:
+    """
+    What is on the terminal, with a hash of each row, and a buffer for the
+    next frame which is reused between frames.
+
+    The next frame is filled in `next`, hashed with `hash_next()`, and after
+    it is written the rows which were written are copied over with
+    `commit()`, so the screen buffers are reused for frames which keep the
+    same size.
+    """
+
+    def __init__(self, term_dim: Tuple[int, int], dtype: Any):
+        shape = (term_dim[1], term_dim[0])
+        self.cells = numpy.zeros(shape, dtype=dtype)
+        self.cells['ch'] = unknown_glyph
+        self.hashes = hash_rows(self.cells)
+        self.next = numpy.zeros(shape, dtype=dtype)
+        self.next_hashes = numpy.zeros(shape[0], dtype=numpy.uint64)
+
+    @property
+    def dim(self) -> Tuple[int, int]:
+        return self.cells.shape[1], self.cells.shape[0]
+
+    def hash_next(self) -> None:
+        """
+        Update the row hashes of the next frame.
+        """
+        self.next_hashes[:] = hash_rows(self.next)
+
+    def changed_rows(self) -> NDArray[numpy.intp]:
+        """
+        Rows of the next frame which differ from the terminal.
+        """
+        return numpy.flatnonzero(self.next_hashes != self.hashes)
+
+    def scroll(self, scroll: Scroll) -> None:
+        """
+        Scroll the terminal contents. The blanked rows become unknown, since
+        terminals blank them in either the current or the default background
+        colour.
+        """
+        source = slice(scroll.top + scroll.shift, scroll.bottom + scroll.shift)
+        self.cells[scroll.top:scroll.bottom] = self.cells[source]
+        self.hashes[scroll.top:scroll.bottom] = self.hashes[source]
+        exposed = slice(*scroll.exposed)
+        self.cells['ch'][exposed] = unknown_glyph
+        self.hashes[exposed] = hash_rows(self.cells[exposed])
+
+    def commit(self, rows: Optional[NDArray[numpy.intp]] = None) -> None:
+        """
+        Record that rows of the next frame (or all of it) have been written.
+        """
+        if rows is None:
+            self.cells[...] = self.next
+            self.hashes[...] = self.next_hashes
+        elif len(rows) > 0:
+            self.cells[rows] = self.next[rows]
+            self.hashes[rows] = self.next_hashes[rows]
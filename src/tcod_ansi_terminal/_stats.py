@@ -0,0 +1,174 @@
+"""
+Collecting statistics about rendered frames.
+"""
+
+from typing import Any, BinaryIO, Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+import collections
+import io
+import threading
+import time
+import numpy
+
+class FrameStats(NamedTuple):
+    """
+    Statistics for one frame written by `TerminalContext.present()`.
+
+    Counts are found from the output itself, so they cover whatever the
+    presenter wrote. Times are in seconds.
+    """
+
+    cells_written: int
+    """Glyphs written, which for the diff presenters is the cells which changed
+    plus any rewritten alongside them."""
+    bytes_written: int
+    """Bytes written, including synchronized update and cursor sequences."""
+    sgr_sequences: int
+    """Sequences setting colours or other attributes."""
+    cursor_moves: int
+    """Sequences moving the cursor."""
+    encode_time: float
+    """Time the presenter spent other than writing."""
+    write_time: float
+    """Time spent writing to the output file."""
+    flush_time: float
+    """Time spent flushing the output file at the end of the frame."""
+
+class StatSummary(NamedTuple):
+    """
+    Summary of the values of one statistic over recent frames.
+    """
+
+    min: float
+    mean: float
+    max: float
+    p50: float
+    p90: float
+    p99: float
+
+# Final bytes of control sequences which move the cursor.
+_cursor_move_finals = numpy.frombuffer(b"ABCDEFGHdf", dtype=numpy.uint8)
+
+def count_output(data: Any) -> Tuple[int, int, int]:
+    """
+    Count the glyphs, SGR sequences and cursor moves in terminal output made
+    of UTF-8 glyphs and control sequences.
+    """
+    output = numpy.frombuffer(data, dtype=numpy.uint8)
+    sequence_starts = numpy.flatnonzero(output[:-1] == 0x1b)
+    sequence_starts = sequence_starts[output[sequence_starts + 1] == ord('[')]
+    # Parameter and intermediate bytes are all below the final bytes, so the
+    # first final byte after the introducer ends the sequence.
+    finals = numpy.flatnonzero((output >= 0x40) & (output <= 0x7e))
+    end_indices = numpy.searchsorted(finals, sequence_starts + 2)
+    sequence_starts = sequence_starts[end_indices < len(finals)]
+    sequence_ends = finals[end_indices[end_indices < len(finals)]]
+    final_bytes = output[sequence_ends]
+    # Sequences are ASCII, and glyphs are counted by their UTF-8 lead bytes.
+    num_sequence_bytes = int((sequence_ends - sequence_starts + 1).sum())
+    num_glyphs = int(numpy.count_nonzero((output & 0xc0) != 0x80)) - num_sequence_bytes
+    return (
+        num_glyphs,
+        int(numpy.count_nonzero(final_bytes == ord('m'))),
+        int(numpy.count_nonzero(numpy.isin(final_bytes, _cursor_move_finals))),
+    )
+
+class StatsOutput(io.BufferedIOBase, BinaryIO):
+    """
+    Binary output file which passes writes on to another file, timing them
+    and counting what is written.
+    """
+
+    # pylint: disable=abstract-method
+
+    def __init__(self, out_file: BinaryIO):
+        super().__init__()
+        self._out_file = out_file
+        self.write_time = 0.0
+        self.bytes_written = 0
+        self.cells_written = 0
+        self.sgr_sequences = 0
+        self.cursor_moves = 0
+        self.count_time = 0.0
+
+    def write(self, data: Any) -> int:
+        start = time.perf_counter()
+        num = self._out_file.write(data)
+        counted = time.perf_counter()
+        cells, sgr_sequences, cursor_moves = count_output(data)
+        self.bytes_written += memoryview(data).nbytes
+        self.cells_written += cells
+        self.sgr_sequences += sgr_sequences
+        self.cursor_moves += cursor_moves
+        self.write_time += counted - start
+        self.count_time += time.perf_counter() - counted
+        return num
+
+    def flush(self) -> None:
+        self._out_file.flush()
+
+class RenderStats:
+    """
+    Statistics for the last `window` frames presented, to give to
+    `TerminalContext.render_stats`.
+
+    `summary()` and `summaries()` give rolling statistics over the frames
+    in the window. If `callback` is given it is called with the statistics
+    for each frame once the frame is written, from whichever thread writes
+    it.
+    """
+
+    def __init__(
+        self,
+        *,
+        window: int = 240,
+        callback: Optional[Callable[[FrameStats], None]] = None
+    ) -> None:
+        self.callback = callback
+        self._frames: Deque[FrameStats] = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, stats: FrameStats) -> None:
+        """
+        Add the statistics for a frame.
+        """
+        with self._lock:
+            self._frames.append(stats)
+        if self.callback is not None:
+            self.callback(stats)
+
+    @property
+    def frames(self) -> List[FrameStats]:
+        """
+        Statistics for the frames in the window, oldest first.
+        """
+        with self._lock:
+            return list(self._frames)
+
+    def summary(self, name: str) -> Optional[StatSummary]:
+        """
+        Summary of one of the fields of `FrameStats` over the window, or
+        `None` if no frames have been presented.
+        """
+        return self.summaries().get(name)
+
+    def summaries(self) -> Dict[str, StatSummary]:
+        """
+        Summaries of all the fields of `FrameStats` over the window, which is
+        empty if no frames have been presented.
+        """
+        frames = self.frames
+        if len(frames) == 0:
+            return {}
+        values = numpy.array(frames, dtype=numpy.float64)
+        percentiles = numpy.percentile(values, (50, 90, 99), axis=0)
+        return {
+            name: StatSummary(
+                min=float(values[:, i].min()),
+                mean=float(values[:, i].mean()),
+                max=float(values[:, i].max()),
+                p50=float(percentiles[0, i]),
+                p90=float(percentiles[1, i]),
+                p99=float(percentiles[2, i]),
+            )
+            for i, name in enumerate(FrameStats._fields)
+        }
@@ -4,18 +4,41 @@ TCOD-compatible contexts that will write to a terminal.
 
 from typing import Optional
 import sys
-import os
 from ._abstract_context import TerminalCompatibleContext
-from ._internal_context import TerminalContext, make_terminal_context
-from ._presenters import Presenter, NaivePresenter, SparsePresenter
+from ._internal_context import TerminalContext, FrameCounts, MouseMotionCounts, MouseTracking, \
+    make_terminal_context, check_target_fps
+from ._presenters import Presenter, NaivePresenter, SparsePresenter, AdaptivePresenter, \
+    PresentChoice
+from ._encoding import ColourMode
+from ._output import OutputWriter
+from ._bands import BandEncoder, PoolKind
+from ._stats import FrameStats, StatSummary, RenderStats
+from ._emulator import VirtualTerminal
+from ._recording import OutputRecorder, RecordedChunk, read_recording
 
 __all__ = (
     'TerminalCompatibleContext',
     'TerminalContext',
+    'FrameCounts',
+    'MouseMotionCounts',
+    'MouseTracking',
     'new',
     'Presenter',
     'NaivePresenter',
     'SparsePresenter',
+    'AdaptivePresenter',
+    'PresentChoice',
+    'ColourMode',
+    'OutputWriter',
+    'BandEncoder',
+    'PoolKind',
+    'FrameStats',
+    'StatSummary',
+    'RenderStats',
+    'VirtualTerminal',
+    'OutputRecorder',
+    'RecordedChunk',
+    'read_recording',
 )
 
 def new(
@@ -26,7 +49,15 @@ def new(
     height: Optional[int] = None,
     columns: Optional[int] = None,
     rows: Optional[int] = None,
-    title: Optional[str] = None
+    title: Optional[str] = None,
+    synchronized_output: Optional[bool] = None,
+    nonblocking_output: bool = False,
+    render_thread: bool = False,
+    target_fps: Optional[float] = None,
+    render_stats: Optional[RenderStats] = None,
+    record_path: Optional[str] = None,
+    coalesce_mouse_motion: bool = False,
+    mouse_tracking: MouseTracking = 'motion'
 ) -> TerminalContext:
     """
     Corresponds to `tcod.context.new()` but produces a terminal context.
@@ -36,10 +67,41 @@ def new(
     use the returned context's `recommended_console_size()` or `new_console()`
     to get the actual dimensions.
 
+    `synchronized_output` controls whether frames are written as synchronized
+    updates, which terminals draw all at once to avoid tearing. By default
+    they are if the terminal reports supporting them.
+
+    Output is sent through an `OutputWriter`. If `nonblocking_output` is
+    true, `present()` doesn't wait for a slow terminal, and frames the
+    terminal hasn't started taking are dropped in favour of newer ones.
+
+    If `render_thread` is true, `present()` copies the console and returns
+    straight away, with the frame written by a background thread.
+
+    If `target_fps` is given, frames are paced to that rate, coalescing frames
+    presented within one frame interval and skipping unchanged frames. This
+    uses the background thread whether or not `render_thread` is true. A
+    `target_fps` which isn't positive raises `ValueError`.
+
+    If `render_stats` is given, statistics for each frame are collected in it.
+
+    If `record_path` is given, everything sent to the terminal is recorded
+    to that file by an `OutputRecorder`, to be read with `read_recording()`.
+
+    If `coalesce_mouse_motion` is true, mouse motion events which arrive
+    together are merged into one.
+
+    `mouse_tracking` sets which mouse events the terminal reports: `'none'`,
+    `'click'` for button presses and releases, `'drag'` for those and motion
+    while a button is down, or `'motion'` for any motion. It can be changed
+    later through the context's `mouse_tracking`.
+
     This does not read `sys.argv` or take `argv` as input.
     """
+    # pylint: disable=too-many-locals
+    check_target_fps(target_fps)
     in_file = sys.stdin.buffer
-    out_file = os.fdopen(sys.stdout.fileno(), 'wb', 1024)
+    out_file = OutputWriter(sys.stdout.fileno(), blocking=not nonblocking_output)
     return make_terminal_context(
         in_file=in_file,
         out_file=out_file,
@@ -47,4 +109,11 @@ def new(
         requested_pixels_dim=(width, height) if width is not None and height is not None else None,
         requested_chars_dim=(columns, rows) if columns is not None and rows is not None else None,
         title=title,
+        synchronized_output=synchronized_output,
+        render_thread=render_thread,
+        target_fps=target_fps,
+        render_stats=render_stats,
+        recorder=OutputRecorder(record_path) if record_path is not None else None,
+        coalesce_mouse_motion=coalesce_mouse_motion,
+        mouse_tracking=mouse_tracking,
     )
@@ -0,0 +1,70 @@
+import pytest
+from tcod.event import KeySym
+from tcod_ansi_terminal import _ansi
+
+@pytest.mark.parametrize('data, expected', [
+    (b"\x1b[?2026;2$y", _ansi.ModeReportInput(mode=2026, setting=2)),
+    (b"\x1b[?2026;0$y", _ansi.ModeReportInput(mode=2026, setting=0)),
+    (b"\x1b[?2026y", None),
+])
+def test_mode_report(data, expected):
+    assert _ansi.parse_input(data) == (expected, len(data))
+
+@pytest.mark.parametrize('data, expected', [
+    (b"\x1b[A", _ansi.SpecialKeyInput(KeySym.UP)),
+    (b"\x1b[1;5A", _ansi.SpecialKeyInput(KeySym.UP)),
+    (b"\x1bOR", _ansi.SpecialKeyInput(KeySym.F3)),
+    (b"\x1b[R", _ansi.SpecialKeyInput(KeySym.F3)),
+    (b"\x1b[15;2~", _ansi.SpecialKeyInput(KeySym.F5)),
+    (b"\x1b[16~", None),
+    (b"\x1b[24;80R", _ansi.WindowResizeInput(dim=(80, 24))),
+    (b"\x1b[O", _ansi.WindowFocusLost()),
+    (b"\x1b[?5A", None),
+])
+def test_escape_input_table(data, expected):
+    assert _ansi.parse_input(data) == (expected, len(data))
+
+def test_parse_input_waits_for_split_sequences():
+    data = b"a\x1b[15~\x1b[M" + bytes([32, 33 + 4, 33 + 7]) + b"\x1b[<2;300;400m\x1bOP"
+    parsed = []
+    for split in range(len(data) + 1):
+        # Everything before the split is parsed, stopping at a partial sequence.
+        pos = 0
+        results = []
+        while pos < split:
+            result, end = _ansi.parse_input(data[:split], pos)
+            if end == pos:
+                break
+            results.append(result)
+            pos = end
+        # The rest of the sequence completes it.
+        while pos < len(data):
+            result, pos = _ansi.parse_input(data, pos)
+            results.append(result)
+        parsed.append(results)
+    assert parsed[0] == [
+        b"a",
+        _ansi.SpecialKeyInput(KeySym.F5),
+        _ansi.MouseButtonInput(button=0, pos=(4, 7)),
+        _ansi.MouseButtonInput(button=2, pos=(299, 399), released=True),
+        _ansi.SpecialKeyInput(KeySym.F1),
+    ]
+    assert all(results == parsed[0] for results in parsed)
+
+def test_parse_input_drops_lone_escapes():
+    assert _ansi.parse_input(b"\x1bx") == (None, 1)
+    assert _ansi.parse_input(b"\x1b[") == (None, 0)
+    assert _ansi.parse_input(b"\x1b[" + b"1" * 40) == (None, 1)
+
+@pytest.mark.parametrize('data, expected', [
+    (b"\x1b[<0;1;1M", _ansi.MouseButtonInput(button=0, pos=(0, 0))),
+    (b"\x1b[<0;1000;500m", _ansi.MouseButtonInput(button=0, pos=(999, 499), released=True)),
+    (b"\x1b[<35;250;240M", _ansi.MouseMotionInput(pos=(249, 239))),
+    (b"\x1b[<34;3;4M", _ansi.MouseMotionInput(pos=(2, 3))),
+    (b"\x1b[<65;3;4M", _ansi.MouseWheelInput(button=1)),
+    (b"\x1b[M" + bytes([35, 33 + 10, 33 + 20]), _ansi.MouseButtonInput(button=3, pos=(10, 20), released=True)),
+    (b"\x1b[M" + bytes([67, 33 + 10, 33 + 20]), _ansi.MouseMotionInput(pos=(10, 20))),
+    (b"\x1b[<0;1M", None),
+])
+def test_mouse_reports(data, expected):
+    assert _ansi.parse_input(data) == (expected, len(data))
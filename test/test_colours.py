@@ -0,0 +1,50 @@
+from tcod_ansi_terminal._ansi import make_set_fg_true, make_set_bg_true
+import numpy
+import pytest
+from tcod_ansi_terminal._colours import ColourSequenceCache, Pen, pack_colour, \
+    channel_digits, channel_mask, channel_lengths, xterm_16_palette, xterm_256_palette
+
+def test_colour_sequence_cache():
+    cache = ColourSequenceCache(maxsize=2)
+    red = pack_colour((255, 0, 0))
+    green = pack_colour((0, 128, 0))
+    blue = pack_colour((0, 0, 7))
+    assert cache.fg(red) == make_set_fg_true((255, 0, 0))
+    assert cache.bg(red) == make_set_bg_true((255, 0, 0))
+    assert cache.fg(red) == make_set_fg_true((255, 0, 0))
+    assert (cache.hits, cache.misses) == (1, 2)
+    cache.fg(green)
+    cache.fg(red)
+    cache.fg(blue)
+    assert len(cache) == 3
+    cache.fg(red)
+    cache.fg(green)
+    assert (cache.hits, cache.misses) == (3, 5)
+    cache.clear()
+    assert (len(cache), cache.hits, cache.misses) == (0, 0, 0)
+
+def test_pen_uses_cache():
+    cache = ColourSequenceCache()
+    pen = Pen(cache)
+    assert pen.set_fg((1, 2, 3)) == b"\x1b[38;2;1;2;3m"
+    assert pen.set_fg((1, 2, 3)) == b""
+    assert pen.set_bg((1, 2, 3)) == b"\x1b[48;2;1;2;3m"
+    pen.fg = -1
+    assert pen.set_fg((1, 2, 3)) == b"\x1b[38;2;1;2;3m"
+    assert (cache.hits, cache.misses) == (1, 2)
+
+def test_channel_tables():
+    for value in (0, 7, 10, 99, 100, 255):
+        text = channel_digits[value][channel_mask[value]].tobytes()
+        assert text == b"%i" % value
+        assert channel_lengths[value] == len(text)
+
+@pytest.mark.parametrize('palette', [xterm_16_palette, xterm_256_palette])
+def test_palette_quantize(palette):
+    rng = numpy.random.default_rng(0)
+    # Colours at the centres of the lookup table bins quantize exactly.
+    colours = (rng.integers(0, 32, (100, 3)) * 8 + 4).astype(numpy.uint8)
+    dists = ((colours[:, None, :].astype(int) - palette.colours[None, :, :]) ** 2).sum(axis=-1)
+    expected = numpy.argmin(dists, axis=1) + palette.first_index
+    numpy.testing.assert_array_equal(palette.quantize(colours), expected)
+    assert palette.quantize(numpy.array([0, 0, 0], dtype=numpy.uint8)) == palette.first_index
@@ -0,0 +1,141 @@
+import io
+import os
+import pty
+import re
+import numpy
+import pytest
+from tcod.console import Console
+from tcod_ansi_terminal.context import NaivePresenter, SparsePresenter, RenderStats, \
+    VirtualTerminal
+from tcod_ansi_terminal._internal_context import make_terminal_context
+
+@pytest.fixture
+def make_context():
+    master_fd, slave_fd = pty.openpty()
+    in_file = os.fdopen(slave_fd, 'rb', buffering=0)
+    contexts = []
+
+    def make(**kwargs):
+        out_file = io.BytesIO()
+        kwargs.setdefault('synchronized_output', False)
+        context = make_terminal_context(
+            in_file=in_file,
+            out_file=out_file,
+            **kwargs
+        )
+        context._on_resize((20, 10))
+        contexts.append(context)
+        return context, out_file
+
+    yield make
+    for context in contexts:
+        context.close()
+    in_file.close()
+    os.close(master_fd)
+
+def test_context_paces_frames(make_context):
+    context, out_file = make_context(target_fps=10)
+    presenter = SparsePresenter()
+    console = Console(20, 10)
+    for i in range(5):
+        console.rgba['ch'][0, 0] = ord('a') + i
+        context.present(console, presenter=presenter)
+        context.present(console, presenter=presenter)
+    assert context.wait_presented(5.0)
+    counts = context.frame_counts
+    assert counts.unchanged == 5
+    # At most the first frame is written straight away, and the rest within
+    # the next frame interval are coalesced into the last.
+    assert counts.presented <= 2
+    assert counts.presented + counts.coalesced == 5
+    assert re.findall(rb"[a-e]", out_file.getvalue())[-1] == b"e"
+
+def test_context_rejects_bad_target_fps(make_context):
+    context, _ = make_context()
+    for value in (0, -30):
+        with pytest.raises(ValueError):
+            context.target_fps = value
+        with pytest.raises(ValueError):
+            make_context(target_fps=value)
+    # The context is left as it was.
+    assert context.target_fps is None
+    assert context._render_thread is None
+    context.target_fps = 30
+    assert context.target_fps == 30
+
+def test_context_without_pacing_presents_every_frame(make_context):
+    context, _ = make_context()
+    console = Console(20, 10)
+    for _ in range(3):
+        context.present(console)
+    assert context.frame_counts.presented == 3
+    assert context.frame_counts.unchanged == 0
+
+class _FailingPresenter(NaivePresenter):
+    def present(self, **kwargs):
+        kwargs['out_file'].write(b"partial")
+        raise RuntimeError("presenter failed")
+
+def test_context_wraps_frames_in_synchronized_updates(make_context):
+    context, out_file = make_context(synchronized_output=True)
+    console = Console(20, 10)
+    for presenter in (NaivePresenter(), _FailingPresenter()):
+        start = len(out_file.getvalue())
+        if isinstance(presenter, _FailingPresenter):
+            with pytest.raises(RuntimeError):
+                context.present(console, presenter=presenter)
+        else:
+            context.present(console, presenter=presenter)
+        output = out_file.getvalue()[start:]
+        # Each frame is one balanced update, even if the presenter fails.
+        assert output.count(b"\x1b[?2026h") == 1
+        assert output.count(b"\x1b[?2026l") == 1
+        assert output.startswith(b"\x1b[?2026h")
+        assert output.endswith(b"\x1b[?2026l")
+
+def test_context_collects_render_stats(make_context):
+    collected = []
+    stats = RenderStats(window=2, callback=collected.append)
+    context, out_file = make_context(render_stats=stats)
+    presenter = SparsePresenter()
+    console = Console(20, 10)
+    console.rgba['fg'] = (255, 255, 255, 255)
+    start = len(out_file.getvalue())
+    context.present(console, presenter=presenter)
+    for i in range(2):
+        console.rgba['ch'][i, 0:3] = ord('x')
+        context.present(console, presenter=presenter)
+    assert len(collected) == 3
+    assert len(stats.frames) == 2
+    full, diff = collected[0], collected[1]
+    assert full.cells_written == 200
+    # A cursor move for each row and to leave the cursor in place.
+    assert full.cursor_moves == 11
+    assert full.sgr_sequences == 2
+    assert diff.cells_written == 3
+    assert diff.cursor_moves == 2
+    assert sum(frame.bytes_written for frame in collected) == len(out_file.getvalue()) - start
+    summary = stats.summary('cells_written')
+    assert summary.min == summary.max == summary.p50 == 3
+    assert stats.summary('write_time').min >= 0
+
+def test_context_switches_mouse_tracking(make_context):
+    context, out_file = make_context(mouse_tracking='click')
+    terminal = VirtualTerminal((20, 10))
+
+    def tracking_modes():
+        terminal.write(out_file.getvalue())
+        out_file.seek(0)
+        out_file.truncate()
+        return {mode for mode in (1000, 1002, 1003, 1006) if terminal.modes.get(mode)}
+
+    assert tracking_modes() == {1000, 1006}
+    context.mouse_tracking = 'motion'
+    assert tracking_modes() == {1003, 1006}
+    context.mouse_tracking = 'none'
+    assert tracking_modes() == set()
+    context.mouse_tracking = 'drag'
+    assert context.mouse_tracking == 'drag'
+    assert tracking_modes() == {1002, 1006}
+    with pytest.raises(ValueError):
+        context.mouse_tracking = 'wheel'
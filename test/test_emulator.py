@@ -0,0 +1,60 @@
+import numpy
+from tcod.console import Console
+from tcod_ansi_terminal import _ansi
+from tcod_ansi_terminal.context import VirtualTerminal, SparsePresenter
+
+def test_virtual_terminal_interprets_ansi_output():
+    screen = VirtualTerminal((6, 3))
+    _ansi.clear_screen(screen)
+    _ansi.set_cursor_pos((2, 2), screen)
+    screen.write(_ansi.make_set_colours_true((1, 2, 3), (4, 5, 6)) + "ab".encode('utf8'))
+    _ansi.save_cursor_pos(screen)
+    _ansi.set_cursor_pos((1, 3), screen)
+    # Sequences split between writes are kept until the rest arrives.
+    screen.write(b"c\x1b[4")
+    screen.write(b"8;5;1md")
+    _ansi.restore_cursor_pos(screen)
+    screen.write("日".encode('utf8')[:2])
+    screen.write("日".encode('utf8')[2:])
+    assert screen.ch[1].tolist() == [32, ord('a'), ord('b'), ord('日'), -2, 32]
+    assert screen.ch[2, :2].tolist() == [ord('c'), ord('d')]
+    assert screen.fg[1, 1].tolist() == [1, 2, 3]
+    assert screen.bg[2, 1].tolist() == [205, 0, 0]
+    assert screen.bg[0, 0].tolist() == [-1, -1, -1]
+    assert screen.cursor == (5, 1)
+    assert screen.sequence_counts['CUP'] == 2
+    assert screen.sequence_counts['SGR'] == 3
+    assert screen.glyphs_written == 5
+
+    _ansi.begin_synchronized_update(screen)
+    assert screen.in_synchronized_update
+    screen.write(_ansi.make_set_scroll_region(1, 3) + _ansi.make_scroll_up(1))
+    _ansi.end_synchronized_update(screen)
+    assert not screen.in_synchronized_update
+    assert screen.synchronized_updates == 1
+    assert screen.ch[0, 0] == 32
+    assert screen.ch[1, :2].tolist() == [ord('c'), ord('d')]
+    assert screen.ch[2].tolist() == [32] * 6
+
+def test_virtual_terminal_narrow_wide_glyphs():
+    screen = VirtualTerminal((1, 2))
+    screen.write("日a".encode('utf8'))
+    assert screen.ch.tolist() == [[ord('日')], [ord('a')]]
+    assert screen.cursor == (0, 1)
+
+def test_virtual_terminal_counts_presenter_output():
+    console = Console(8, 4, order='C')
+    console.rgba['ch'] = ord('x')
+    screen = VirtualTerminal((8, 4))
+    presenter = SparsePresenter()
+    present_kwargs = dict(term_dim=screen.dim, out_file=screen, clear_colour=(0, 0, 0), align=(0, 0))
+    presenter.present(console=console, **present_kwargs)
+    numpy.testing.assert_array_equal(screen.ch, console.rgba['ch'])
+
+    screen.sequence_counts.clear()
+    screen.glyphs_written = 0
+    console.rgba['ch'][2, 5] = ord('y')
+    presenter.present(console=console, **present_kwargs)
+    assert screen.ch[2, 5] == ord('y')
+    assert screen.glyphs_written == 1
+    assert screen.sequence_counts['CUP'] == 1
@@ -0,0 +1,106 @@
+import os
+import select
+import threading
+from tcod.event import MouseButton, MouseButtonDown, MouseButtonUp, MouseMotion
+from tcod_ansi_terminal._input_buffer import InputBuffer
+from tcod_ansi_terminal._internal_event import EventsManager
+from tcod_ansi_terminal._output import OutputWriter
+
+class _Platform:
+    def __init__(self):
+        self.input_buffer = InputBuffer()
+        self.chunks = []
+
+    def read_input(self, timeout=None, output_fd=None):
+        if not self.chunks:
+            if output_fd is not None:
+                select.select((), (output_fd,), (), timeout)
+            return False
+        self.input_buffer.write(self.chunks.pop(0))
+        return True
+
+    def watch_resize(self, callback):
+        pass
+
+    def watch_quit(self, callback):
+        pass
+
+class _Output:
+    def write(self, data):
+        return len(data)
+
+    def flush(self):
+        pass
+
+def _make_manager(**kwargs):
+    platform = _Platform()
+    return platform, EventsManager(platform, _Output(), lambda dim: None, threading.RLock(), **kwargs)
+
+def _wait(platform, manager, *chunks):
+    platform.chunks += chunks
+    events = []
+    while platform.chunks:
+        events += manager.wait(0)
+    return events
+
+def test_sgr_mouse_buttons():
+    platform, manager = _make_manager()
+    events = _wait(platform, manager, b"\x1b[<35;300;2M\x1b[<2;301;2", b"M\x1b[<2;302;3m")
+    assert [type(event) for event in events] == [MouseMotion, MouseButtonDown, MouseButtonUp]
+    assert events[0].position == (299, 1)
+    assert events[1].button == MouseButton.RIGHT
+    assert events[1].position == (300, 1)
+    assert events[2].button == MouseButton.RIGHT
+    assert events[2].position == (301, 2)
+
+def test_mouse_motion_coalescing():
+    platform, manager = _make_manager()
+    manager.coalesce_mouse_motion = True
+    events = _wait(
+        platform,
+        manager,
+        b"\x1b[<35;1;1M\x1b[<35;2;1M\x1b[<35;4;3M\x1b[<0;4;3Mq\x1b[<32;5;3M\x1b[<32;6;4M",
+        b"\x1b[<35;7;4M\x1b[<35;6;4M",
+    )
+    types = [type(event).__name__ for event in events]
+    assert types == [
+        'MouseMotion', 'MouseButtonDown', 'KeyDown', 'TextInput', 'KeyUp', 'MouseMotion'
+    ]
+    assert events[0].position == (3, 2)
+    assert events[0].motion == (3, 2)
+    assert events[5].position == (5, 3)
+    assert events[5].motion == (2, 1)
+    # The last run goes nowhere, so is dropped.
+    assert manager.mouse_motions_merged == 4
+    assert manager.mouse_motions_dropped == 1
+
+def test_wait_sends_waiting_output():
+    read_fd, write_fd = os.pipe()
+    writer = OutputWriter(write_fd, blocking=False)
+    platform = _Platform()
+    manager = EventsManager(platform, writer, lambda dim: None, threading.RLock())
+    frame = b"x" * 200000
+    writer.begin_frame()
+    writer.write(frame)
+    writer.end_frame()
+    assert writer.backlogged
+    chunks = []
+
+    def read():
+        num = len(frame)
+        while num > 0:
+            chunks.append(os.read(read_fd, num))
+            num -= len(chunks[-1])
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    try:
+        assert not list(manager.wait(5.0))
+        reader.join(5.0)
+        assert not writer.backlogged
+        assert b"".join(chunks) == frame
+    finally:
+        # With the reader gone, anything left fails to send rather than waits.
+        os.close(read_fd)
+        writer.close()
+        os.close(write_fd)
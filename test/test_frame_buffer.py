@@ -0,0 +1,43 @@
+import numpy
+from tcod_ansi_terminal._frame_buffer import FrameBuffer
+from tcod_ansi_terminal._encoding import encode_cells, make_colour_encoder
+from tcod_ansi_terminal._colours import pack_colours
+
+def test_frame_buffer_grows_and_keeps_memory():
+    buffer = FrameBuffer()
+    for i in range(100):
+        buffer.write(bytes([ord('a') + i % 26]) * 10)
+    view = buffer.view()
+    assert bytes(view) == b"".join(bytes([ord('a') + i % 26]) * 10 for i in range(100))
+    capacity = buffer.capacity
+    buffer.clear()
+    buffer.write(b"xyz")
+    buffer.reserve(2)[...] = ord('!')
+    assert bytes(buffer.view()) == b"xyz!!"
+    assert buffer.capacity == capacity
+
+def test_encode_cells_into_frame_buffer():
+    rng = numpy.random.default_rng(0)
+    cells = numpy.zeros(5000, dtype=[('ch', numpy.int32), ('fg', '4u1'), ('bg', '4u1')])
+    cells['ch'] = rng.integers(ord(' '), ord('~') + 1, len(cells))
+    cells['fg'] = rng.integers(0, 4, (len(cells), 4))
+    cells['bg'] = rng.integers(0, 4, (len(cells), 4))
+    previous_fg = numpy.roll(pack_colours(cells['fg']), 1)
+    previous_bg = numpy.roll(pack_colours(cells['bg']), 1)
+    skip = rng.random(len(cells)) < 0.1
+    encoder = make_colour_encoder('true')
+    data, cell_ends = encode_cells(cells, previous_fg, previous_bg, encoder, skip=skip)
+
+    buffer = FrameBuffer()
+    buffer.write(b"before")
+    buffered_data, buffered_cell_ends = encode_cells(
+        cells,
+        previous_fg,
+        previous_bg,
+        encoder,
+        skip=skip,
+        out=buffer
+    )
+    assert bytes(buffered_data) == bytes(data)
+    assert numpy.array_equal(buffered_cell_ends, cell_ends)
+    assert bytes(buffer.view()) == b"before" + bytes(data)
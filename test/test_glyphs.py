@@ -0,0 +1,21 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+import numpy
+from tcod_ansi_terminal._glyphs import GlyphTable, _sparse_cache_size
+
+def test_glyph_table_shared_between_threads():
+    # Each batch has more distinct sparse glyphs than the cache holds, so
+    # threads evict each other's entries.
+    rng = numpy.random.default_rng(0)
+    batches = [rng.integers(0x4e00, 0x9fff, 3 * _sparse_cache_size) for _ in range(24)]
+    table = GlyphTable()
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(4) as pool:
+            results = list(pool.map(table.widths, batches))
+    finally:
+        sys.setswitchinterval(switch_interval)
+    expected = GlyphTable()
+    for batch, widths in zip(batches, results):
+        numpy.testing.assert_array_equal(widths, expected.widths(batch))
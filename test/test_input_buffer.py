@@ -0,0 +1,30 @@
+import os
+from tcod_ansi_terminal._input_buffer import InputBuffer
+
+def test_input_buffer_wraps_around():
+    buffer = InputBuffer(8)
+    buffer.write(b"abcdef")
+    buffer.consume(4)
+    buffer.write(b"ghijk")
+    assert buffer.peek() == b"efghijk"
+    assert buffer.capacity == 8
+    buffer.write(b"lmn")
+    assert buffer.peek() == b"efghijklmn"
+    buffer.consume(10)
+    assert len(buffer) == 0
+
+def test_input_buffer_reads_from_file_descriptor():
+    read_fd, write_fd = os.pipe()
+    try:
+        buffer = InputBuffer(8)
+        buffer.write(b"abcdef")
+        buffer.consume(5)
+        os.write(write_fd, b"0123456789")
+        # One read fills the space at both ends of the buffer.
+        assert buffer.read_from(read_fd) == 7
+        assert buffer.peek() == b"f0123456"
+        assert buffer.read_from(read_fd) == 3
+        assert buffer.peek() == b"f0123456789"
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
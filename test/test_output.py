@@ -0,0 +1,92 @@
+import os
+import pty
+import threading
+import pytest
+from tcod_ansi_terminal._output import OutputWriter
+from tcod_ansi_terminal._recording import OutputRecorder, read_recording
+
+@pytest.fixture
+def pipe():
+    read_fd, write_fd = os.pipe()
+    yield read_fd, write_fd
+    os.close(read_fd)
+    os.close(write_fd)
+
+def _read(read_fd, num, chunks):
+    while num > 0:
+        chunks.append(os.read(read_fd, num))
+        num -= len(chunks[-1])
+
+def test_output_writer_sends_frames_whole(pipe):
+    read_fd, write_fd = pipe
+    writer = OutputWriter(write_fd)
+    writer.begin_frame()
+    for _ in range(100):
+        writer.write(b"x" * 100)
+    writer.end_frame()
+    assert writer.write_calls == 1
+    assert os.read(read_fd, 20000) == b"x" * 10000
+    writer.close()
+
+def test_output_writer_drops_waiting_frames(pipe):
+    read_fd, write_fd = pipe
+    writer = OutputWriter(write_fd, blocking=False)
+    frames = [bytes([ord('a') + i]) * 100000 for i in range(3)]
+    for frame in frames:
+        writer.begin_frame()
+        writer.write(frame)
+        writer.end_frame(complete=True)
+    assert writer.backlogged
+    assert writer.frames_dropped == 1
+    # The first write fills the pipe and the rest find it full.
+    assert writer.write_calls == 1
+    assert writer.writes_blocked == 3
+
+    # Output written outside frames is never dropped.
+    writer.write(b"y")
+    writer.begin_frame()
+    writer.write(b"z")
+    writer.end_frame(complete=True)
+    assert writer.frames_dropped == 2
+
+    expected = frames[0] + b"yz"
+    chunks = []
+    reader = threading.Thread(target=_read, args=(read_fd, len(expected), chunks))
+    reader.start()
+    writer.close()
+    reader.join()
+    assert b"".join(chunks) == expected
+    assert os.get_blocking(write_fd)
+
+def test_output_writer_leaves_terminal_blocking():
+    master_fd, slave_fd = pty.openpty()
+    try:
+        writer = OutputWriter(slave_fd, blocking=False)
+        # Other files on the terminal, such as stdin, stay blocking.
+        assert os.get_blocking(slave_fd)
+        assert not os.get_blocking(writer.fileno())
+        writer.write(b"abc")
+        writer.flush()
+        assert os.read(master_fd, 10) == b"abc"
+        writer.close()
+        assert os.get_blocking(slave_fd)
+    finally:
+        os.close(master_fd)
+        os.close(slave_fd)
+
+def test_output_writer_records_what_is_sent(pipe, tmp_path):
+    read_fd, write_fd = pipe
+    writer = OutputWriter(write_fd)
+    path = tmp_path / "output.rec.gz"
+    writer.recorder = OutputRecorder(path)
+    for i in range(3):
+        writer.begin_frame()
+        writer.write(bytes([ord('a') + i]) * 1000)
+        writer.end_frame()
+        assert os.read(read_fd, 2000) == bytes([ord('a') + i]) * 1000
+    writer.close()
+    writer.recorder.close()
+    chunks = list(read_recording(path))
+    assert [chunk.data for chunk in chunks] == [bytes([ord('a') + i]) * 1000 for i in range(3)]
+    assert chunks[0].time <= chunks[1].time <= chunks[2].time
+    assert writer.recorder.bytes_recorded == 3000
@@ -0,0 +1,341 @@
+import io
+import re
+import numpy
+import pytest
+from tcod.console import Console
+from tcod_ansi_terminal.context import NaivePresenter, SparsePresenter, AdaptivePresenter, \
+    BandEncoder
+from tcod_ansi_terminal.context import VirtualTerminal
+from tcod_ansi_terminal._colours import xterm_16_palette, xterm_256_palette
+
+_sequence_re = re.compile(rb"\x1b\[([0-9;]*)([A-Za-z])")
+
+_indexed_colours = numpy.concatenate((xterm_16_palette.colours, xterm_256_palette.colours))
+
+def _make_console(dim, order, seed=0):
+    rng = numpy.random.default_rng(seed)
+    console = Console(dim[0], dim[1], order=order)
+    shape = console.rgba.shape
+    console.rgba['ch'] = rng.integers(ord('a'), ord('e'), shape)
+    console.rgba['fg'] = rng.integers(0, 3, shape + (4,))
+    console.rgba['bg'] = rng.integers(0, 3, shape + (4,))
+    return console
+
+def _present(presenter, console, screen, align=(0.5, 0.5), clear_colour=(9, 8, 7)):
+    out_file = io.BytesIO()
+    presenter.present(
+        console=console,
+        term_dim=screen.dim,
+        out_file=out_file,
+        clear_colour=clear_colour,
+        align=align,
+    )
+    screen.write(out_file.getvalue())
+    return out_file.getvalue()
+
+def _check_screen(
+    screen,
+    console,
+    align=(0.5, 0.5),
+    colours=lambda c: c[..., :3],
+    clear_colour=(9, 8, 7),
+):
+    rows = console.rgba if console.rgba.flags['C_CONTIGUOUS'] else console.rgba.T
+    height = min(rows.shape[0], screen.dim[1])
+    width = min(rows.shape[1], screen.dim[0])
+    left = int((screen.dim[0] - width) * align[0])
+    top = int((screen.dim[1] - height) * align[1])
+    cells = rows[:height, :width]
+    drawn = (slice(top, top + height), slice(left, left + width))
+    numpy.testing.assert_array_equal(screen.ch[drawn], cells['ch'])
+    numpy.testing.assert_array_equal(screen.fg[drawn], colours(cells['fg']))
+    numpy.testing.assert_array_equal(screen.bg[drawn], colours(cells['bg']))
+    padding = numpy.ones((screen.dim[1], screen.dim[0]), dtype=bool)
+    padding[drawn] = False
+    assert (screen.ch[padding] == ord(' ')).all()
+    assert (screen.bg[padding] == colours(numpy.array(clear_colour, dtype=numpy.uint8))).all()
+
+@pytest.mark.parametrize('order', ['C', 'F'])
+@pytest.mark.parametrize('term_dim', [(6, 4), (9, 7), (4, 2), (3, 6)])
+@pytest.mark.parametrize('align', [(0.5, 0.5), (0.0, 1.0)])
+def test_naive_presenter(order, term_dim, align):
+    console = _make_console((6, 4), order)
+    screen = VirtualTerminal(term_dim)
+    _present(NaivePresenter(), console, screen, align)
+    _check_screen(screen, console, align)
+
+@pytest.mark.parametrize('order', ['C', 'F'])
+@pytest.mark.parametrize('term_dim', [(6, 4), (9, 7)])
+def test_sparse_presenter(order, term_dim):
+    presenter = SparsePresenter()
+    screen = VirtualTerminal(term_dim)
+    for seed in range(3):
+        console = _make_console((6, 4), order, seed)
+        _present(presenter, console, screen)
+        _check_screen(screen, console)
+
+def test_naive_presenter_sets_colours_only_on_change():
+    console = Console(5, 3, order='C')
+    console.rgba['fg'] = (1, 2, 3, 255)
+    console.rgba['bg'] = (4, 5, 6, 255)
+    console.rgba['bg'][1, 2] = (7, 8, 9, 255)
+    out_file = io.BytesIO()
+    NaivePresenter().present(
+        console=console,
+        term_dim=(5, 3),
+        out_file=out_file,
+        clear_colour=(0, 0, 0),
+        align=(0.5, 0.5),
+    )
+    output = out_file.getvalue()
+    assert output.count(b"\x1b[38;2;") == 1
+    assert output.count(b"\x1b[48;2;4;5;6m") == 2
+    assert output.count(b"\x1b[48;2;7;8;9m") == 1
+
+@pytest.mark.parametrize('order', ['C', 'F'])
+@pytest.mark.parametrize('term_dim', [(20, 6), (24, 9)])
+def test_sparse_presenter_spans(order, term_dim):
+    presenter = SparsePresenter()
+    screen = VirtualTerminal(term_dim)
+    console = _make_console((20, 6), order)
+    _present(presenter, console, screen)
+    rng = numpy.random.default_rng(1)
+    for _ in range(5):
+        changed = rng.random(console.rgba.shape) < 0.2
+        console.rgba['ch'][changed] = ord('z')
+        _present(presenter, console, screen)
+        _check_screen(screen, console)
+
+def test_sparse_presenter_bridges_short_gaps():
+    presenter = SparsePresenter()
+    console = Console(10, 2, order='C')
+    out_file = io.BytesIO()
+    present_kwargs = dict(term_dim=(10, 2), clear_colour=(0, 0, 0), align=(0, 0))
+    presenter.present(console=console, out_file=io.BytesIO(), **present_kwargs)
+    console.rgba['ch'][0, 1] = ord('a')
+    console.rgba['ch'][0, 3] = ord('b')
+    console.rgba['ch'][1, 0] = ord('c')
+    presenter.present(console=console, out_file=out_file, **present_kwargs)
+    output = out_file.getvalue()
+    assert output.count(b"H") == 2
+    screen = VirtualTerminal((10, 2))
+    screen.write(output)
+    assert screen.ch[0, 1:4].tolist() == [ord('a'), ord(' '), ord('b')]
+    assert screen.ch[1, 0] == ord('c')
+
+@pytest.mark.parametrize('order', ['C', 'F'])
+@pytest.mark.parametrize('granularity', ['frame', 'row'])
+def test_adaptive_presenter(order, granularity):
+    presenter = AdaptivePresenter(granularity=granularity)
+    screen = VirtualTerminal((24, 9))
+    console = _make_console((20, 6), order)
+    _present(presenter, console, screen)
+    assert presenter.last_choice.strategy == 'full'
+    rng = numpy.random.default_rng(1)
+    for density in (0.05, 1.0, 0.5, 0.0):
+        changed = rng.random(console.rgba.shape) < density
+        console.rgba['ch'][changed] = rng.integers(ord('a'), ord('z'), changed.sum())
+        _present(presenter, console, screen)
+        _check_screen(screen, console)
+
+def test_adaptive_presenter_choices():
+    presenter = AdaptivePresenter(granularity='frame')
+    screen = VirtualTerminal((20, 6))
+    console = _make_console((20, 6), 'C')
+    _present(presenter, console, screen)
+    console.rgba['ch'][2, 3] = ord('z')
+    _present(presenter, console, screen)
+    assert presenter.last_choice.strategy == 'diff'
+    console.rgba['ch'] = ord('y')
+    _present(presenter, console, screen)
+    assert presenter.last_choice.strategy == 'full'
+
+    presenter = AdaptivePresenter(granularity='row')
+    _present(presenter, console, screen)
+    console.rgba['ch'][1, ::2] = ord('x')
+    console.rgba['ch'][3, 5] = ord('x')
+    _present(presenter, console, screen)
+    assert presenter.last_choice.strategy == 'diff'
+    assert presenter.last_choice.full_rows <= 2
+    _check_screen(screen, console)
+
+@pytest.mark.parametrize('pool', ['thread', 'process'])
+@pytest.mark.parametrize('order', ['C', 'F'])
+@pytest.mark.parametrize('colours', ['true', '256'])
+def test_naive_presenter_bands(pool, order, colours):
+    console = _make_console((20, 9), order)
+    console.rgba['ch'][0, :2] = [0x65e5, 0x672c]
+    expected = _present(NaivePresenter(colours=colours), console, VirtualTerminal((24, 11)))
+    band_encoder = BandEncoder(3, pool=pool, min_band_cells=1)
+    try:
+        presenter = NaivePresenter(colours=colours, band_encoder=band_encoder)
+        for _ in range(2):
+            assert _present(presenter, console, VirtualTerminal((24, 11))) == expected
+    finally:
+        band_encoder.close()
+
+@pytest.mark.parametrize('presenter_type', [NaivePresenter, SparsePresenter, AdaptivePresenter])
+def test_presenter_glyph_widths(presenter_type):
+    presenter = presenter_type()
+    screen = VirtualTerminal((8, 2))
+    console = Console(8, 2, order='C')
+    console.rgba['ch'][0, :6] = [ord('a'), 0x65e5, 0x672c, ord('b'), 0x0301, ord('c')]
+    console.rgba['ch'][1, 0] = 0
+    console.rgba['ch'][1, 1] = 0x2588
+    _present(presenter, console, screen, align=(0, 0))
+    assert screen.ch[0].tolist() == [ord('a'), 0x65e5, -2, ord('b'), ord(' '), ord('c'), 32, 32]
+    assert screen.ch[1, :3].tolist() == [ord(' '), 0x2588, ord(' ')]
+
+    console.rgba['ch'][0, 1] = ord('x')
+    _present(presenter, console, screen, align=(0, 0))
+    assert screen.ch[0, :4].tolist() == [ord('a'), ord('x'), 0x672c, -2]
+
+@pytest.mark.parametrize('presenter_type', [NaivePresenter, SparsePresenter, AdaptivePresenter])
+@pytest.mark.parametrize('term_dim', [(4, 2), (6, 2)])
+def test_presenter_wide_glyph_at_edge(presenter_type, term_dim):
+    presenter = presenter_type()
+    screen = VirtualTerminal(term_dim)
+    console = Console(4, 2, order='C')
+    console.rgba['ch'] = ord('a')
+    console.rgba['ch'][0, 3] = 0x4e00
+    _present(presenter, console, screen, align=(0, 0))
+    # The glyph would wrap or spill into the padding, so a space is drawn.
+    assert screen.ch[0, :4].tolist() == [ord('a')] * 3 + [ord(' ')]
+    assert screen.ch[1, :4].tolist() == [ord('a')] * 4
+    assert (screen.ch[:, 4:] == ord(' ')).all()
+
+    console.rgba['ch'][0, 2:] = [0x65e5, 0x672c]
+    _present(presenter, console, screen, align=(0, 0))
+    assert screen.ch[0, :4].tolist() == [ord('a')] * 2 + [0x65e5, -2]
+    assert (screen.ch[:, 4:] == ord(' ')).all()
+
+@pytest.mark.parametrize('presenter_type', [NaivePresenter, SparsePresenter, AdaptivePresenter])
+@pytest.mark.parametrize('colours, palette', [('256', xterm_256_palette), ('16', xterm_16_palette)])
+def test_quantizing_presenters(presenter_type, colours, palette):
+    presenter = presenter_type(colours=colours)
+    screen = VirtualTerminal((24, 9))
+    rng = numpy.random.default_rng(0)
+    console = _make_console((20, 6), 'F')
+    for _ in range(3):
+        console.rgba['fg'] = rng.integers(0, 256, console.rgba.shape + (4,))
+        console.rgba['bg'][rng.random(console.rgba.shape) < 0.3] = rng.integers(0, 256, 4)
+        out_file = io.BytesIO()
+        presenter.present(
+            console=console,
+            term_dim=screen.dim,
+            out_file=out_file,
+            clear_colour=(9, 8, 7),
+            align=(0.5, 0.5),
+        )
+        assert b";2;" not in out_file.getvalue()
+        screen.write(out_file.getvalue())
+        _check_screen(screen, console, colours=lambda c: _indexed_colours[palette.quantize(c)])
+
+@pytest.mark.parametrize('presenter_type', [SparsePresenter, AdaptivePresenter])
+@pytest.mark.parametrize('order', ['C', 'F'])
+def test_diff_presenters_track_screen(presenter_type, order):
+    presenter = presenter_type()
+    console = _make_console((20, 6), order)
+    screen = VirtualTerminal((24, 9))
+    full_size = len(_present(presenter, console, screen))
+
+    # Changing the clear colour only rewrites the padding.
+    output = _present(presenter, console, screen, clear_colour=(1, 2, 3))
+    _check_screen(screen, console, clear_colour=(1, 2, 3))
+    assert output.count(b"\x1b[48;2;1;2;3m") <= 9
+    assert not re.search(rb"[a-d]", output)
+
+    for align in ((0.0, 0.0), (1.0, 0.5)):
+        _present(presenter, console, screen, align)
+        _check_screen(screen, console, align)
+
+    # Resizing the console alone only writes what looks different.
+    _present(presenter, console, screen, (0.0, 0.0))
+    small_console = _make_console((20, 5), order)
+    small_console.rgba[...] = console.rgba[:20, :5] if order == 'F' else console.rgba[:5, :20]
+    output = _present(presenter, small_console, screen, (0.0, 0.0))
+    _check_screen(screen, small_console, (0.0, 0.0))
+    assert len(output) < full_size / 4
+
+    # Terminals may reflow what they had when resized, so the frame is
+    # written in full.
+    screen.resize((30, 10))
+    screen.ch[...] = ord('#')
+    _present(presenter, console, screen, (0.0, 0.0))
+    _check_screen(screen, console, (0.0, 0.0))
+
+    # Resizing the console and terminal together.
+    console = _make_console((12, 5), order, seed=1)
+    screen.resize((16, 5))
+    screen.ch[...] = ord('#')
+    _present(presenter, console, screen, (0.5, 0.0))
+    _check_screen(screen, console, (0.5, 0.0))
+
+    presenter.invalidate()
+    screen = VirtualTerminal(screen.dim)
+    _present(presenter, console, screen, (0.5, 0.0))
+    _check_screen(screen, console, (0.5, 0.0))
+
+@pytest.mark.parametrize('presenter_type', [SparsePresenter, AdaptivePresenter])
+@pytest.mark.parametrize('order', ['C', 'F'])
+def test_diff_presenters_skip_unchanged_rows(presenter_type, order):
+    presenter = presenter_type()
+    console = _make_console((20, 6), order)
+    screen = VirtualTerminal((24, 9))
+    _present(presenter, console, screen)
+
+    assert _present(presenter, console, screen) == b""
+
+    changed = (3, slice(4, 7)) if order == 'C' else (slice(4, 7), 3)
+    console.rgba[changed]['ch'] = ord('?')
+    output = _present(presenter, console, screen)
+    _check_screen(screen, console)
+    # Only the changed row is written to.
+    assert re.findall(rb"\x1b\[(\d+);\d+H", output) == [b"5"]
+
+@pytest.mark.parametrize('presenter_type', [SparsePresenter, AdaptivePresenter])
+@pytest.mark.parametrize('shift', [2, -3])
+def test_diff_presenters_scroll(presenter_type, shift):
+    rng = numpy.random.default_rng(0)
+    lines = rng.integers(ord('a'), ord('z'), (30, 20))
+    console = Console(20, 10, order='C')
+    console.rgba['fg'] = (200, 200, 200, 255)
+    console.rgba['bg'][:] = (0, 0, 0, 255)
+    # A log view in the middle of the console, between fixed rows.
+    console.rgba['ch'][0] = ord('=')
+    console.rgba['ch'][9] = ord('=')
+
+    def show(start):
+        console.rgba['ch'][1:9] = lines[start:start + 8]
+
+    screen = VirtualTerminal((20, 12))
+    scrolling = presenter_type()
+    not_scrolling = presenter_type(scrolling=False)
+    show(10)
+    _present(scrolling, console, screen)
+    _present(not_scrolling, console, VirtualTerminal((20, 12)))
+    show(10 + shift)
+    output = _present(scrolling, console, screen)
+    _check_screen(screen, console)
+    assert (b"S" if shift > 0 else b"T") in output
+    # Only the rows scrolled into view are written.
+    assert len(_sequence_re.sub(b"", output).strip()) == abs(shift) * 20
+    assert len(output) < len(_present(not_scrolling, console, VirtualTerminal((20, 12))))
+
+@pytest.mark.parametrize('presenter_type', [SparsePresenter, AdaptivePresenter])
+def test_diff_presenters_scroll_without_background_colour_erase(presenter_type):
+    rng = numpy.random.default_rng(0)
+    lines = rng.choice([ord(' '), ord('x')], (30, 20), p=[0.8, 0.2])
+    console = Console(20, 10, order='C')
+    # Spaces in the clear colour look like the blanked rows of a terminal
+    # with background colour erase.
+    console.rgba['fg'] = (9, 8, 7, 255)
+    console.rgba['bg'] = (9, 8, 7, 255)
+    console.rgba['ch'] = lines[10:20]
+    screen = VirtualTerminal((20, 10), background_colour_erase=False)
+    presenter = presenter_type()
+    _present(presenter, console, screen)
+    console.rgba['ch'] = lines[13:23]
+    output = _present(presenter, console, screen)
+    assert b"S" in output
+    _check_screen(screen, console)
@@ -0,0 +1,51 @@
+import threading
+import numpy
+import pytest
+from tcod.console import Console
+from tcod_ansi_terminal._console_utils import copy_console
+from tcod_ansi_terminal._render_thread import RenderThread
+
+def test_render_thread_presents_latest_frame():
+    presented = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def present(frame):
+        started.set()
+        release.wait()
+        presented.append(frame)
+
+    thread = RenderThread(present)
+    thread.submit(0)
+    started.wait()
+    # Frames handed over while the first is being presented replace each other.
+    for frame in (1, 2, 3):
+        thread.submit(frame)
+    assert not thread.wait(0.01)
+    release.set()
+    assert thread.wait()
+    thread.close()
+    assert presented == [0, 3]
+    assert thread.frames_replaced == 2
+    assert thread.reclaim() is not None
+
+def test_render_thread_raises_errors():
+    def present(frame):
+        raise ValueError(frame)
+
+    thread = RenderThread(present)
+    thread.submit(1)
+    with pytest.raises(ValueError):
+        thread.wait()
+    thread.close()
+
+@pytest.mark.parametrize('order', ['C', 'F'])
+def test_copy_console(order):
+    console = Console(5, 3, order=order)
+    console.rgba['ch'] = numpy.arange(15).reshape(console.rgba.shape)
+    console.rgba['fg'][..., 0] = 7
+    copied = copy_console(console)
+    assert numpy.array_equal(copied.rgba, console.rgba)
+    console.rgba['ch'] = 1
+    assert copy_console(console, copied) is copied
+    assert numpy.array_equal(copied.rgba, console.rgba)
@@ -1,4 +1,5 @@
-from tcod_ansi_terminal.context import Presenter, NaivePresenter, SparsePresenter
+from tcod_ansi_terminal.context import Presenter, NaivePresenter, SparsePresenter, \
+    AdaptivePresenter
 
 def _use_presenter(presenter: Presenter) -> None:
     pass
@@ -8,3 +9,11 @@ def _use_naive_presenter(presenter: NaivePresenter) -> None:
 
 def _use_sparse_presenter(presenter: SparsePresenter) -> None:
     _use_presenter(presenter)
+
+def _use_adaptive_presenter(presenter: AdaptivePresenter) -> None:
+    _use_presenter(presenter)
+
+def _make_quantizing_presenters() -> None:
+    _use_presenter(NaivePresenter(colours='256'))
+    _use_presenter(SparsePresenter(colours='16'))
+    _use_presenter(AdaptivePresenter(granularity='frame', colours='true'))